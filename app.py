@@ -4,20 +4,42 @@ Medical Coding System - Web UI
 A clean, professional interface for medical coding automation with Amazon Bedrock AI
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 import asyncio
 import json
 import uuid
 from datetime import datetime
-import threading
+from functools import partial
 import time
 import logging
+import atexit
+import os
 
-# Import our Temporal workflow
-from temporal_medical_coding_demo import (
-    Client, 
-    MedicalCodingWorkflow
+# Load environment variables from .env file
+from dotenv import load_dotenv
+load_dotenv()
+
+# Workflows are started and queried by name, so the web tier does not import
+# the workflow module and its worker-only dependencies
+from workflow_contract import (
+    MEDICAL_CODING_WORKFLOW,
+    BATCH_MEDICAL_CODING_WORKFLOW,
+    BATCH_MAX_PARALLEL,
+    PROGRESS_QUERY,
+    WORKFLOW_MODES,
+    VALIDATION_MODES,
+    PRIORITY_LANES,
+    DEFAULT_PRIORITY,
+    BATCH_PRIORITY,
+    document_priority,
+    lane_task_queue
 )
+from temporal_dispatcher import DispatcherQueueFull, get_dispatcher
+from result_store import get_result_store
+from result_export import CONTENT_TYPES, ResultExport, parse_timestamp, serialize_rows
+from blob_store import get_blob_store, offload_content
+from document_chunking import pin_chunk_settings
+from model_metrics import get_model_metrics
 
 app = Flask(__name__)
 app.secret_key = 'medical-coding-secret-key-2025'
@@ -26,8 +48,121 @@ app.secret_key = 'medical-coding-secret-key-2025'
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global variable to store workflow results
-workflow_results = {}
+# Workflow status and results (bounded; SQLite-backed when RESULT_STORE_BACKEND=sqlite)
+result_store = get_result_store()
+
+# MinHash index of submitted notes, for copy-forward notes (NEAR_DUPLICATE_INDEX).
+# The index needs NumPy, so the module is only imported when the index is on
+near_duplicates = None
+if os.getenv("NEAR_DUPLICATE_INDEX", "off").lower() in ("memory", "file"):
+    from near_duplicates import REUSE_THRESHOLD, get_near_duplicate_detector, verify_copy_forward
+    near_duplicates = get_near_duplicate_detector()
+    atexit.register(near_duplicates.save)
+
+# Documents per BatchMedicalCodingWorkflow execution; larger batches are split
+# across several executions so no single workflow history grows unbounded
+BATCH_WORKFLOW_SIZE = 500
+MAX_BATCH_DOCUMENTS = 20000
+# Child workflow results fetched at once when a batch workflow finishes
+BATCH_RESULT_FETCH_CONCURRENCY = 20
+
+# Seconds to wait for a workflow progress query, and between checks on an SSE stream
+STATUS_QUERY_TIMEOUT = 5
+SSE_POLL_INTERVAL = 1.0
+SSE_KEEPALIVE_INTERVAL = 15
+
+# Per-document options and the values the workflow accepts for them
+DOCUMENT_OPTIONS = (('mode', WORKFLOW_MODES), ('validation_mode', VALIDATION_MODES), ('priority', PRIORITY_LANES))
+
+def option_error(data):
+    """Error message for the first invalid mode, validation_mode or priority in a submitted document, or None."""
+    for field, allowed in DOCUMENT_OPTIONS:
+        if data.get(field) and data[field] not in allowed:
+            return f"{field} must be one of {', '.join(allowed)}"
+    return None
+
+def build_document(data, document_id=None, default_priority=DEFAULT_PRIORITY):
+    """Build the workflow document dict from a submitted JSON object."""
+    document_id = document_id or f"DOC-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8]}"
+    document = {
+        "document_id": document_id,
+        "content": data.get('content', ''),
+        "document_type": data.get('document_type', 'discharge_summary'),
+        "patient_id": data.get('patient_id') or f"PAT-{str(uuid.uuid4())[:8]}",
+        "patient_name": data.get('patient_name', 'Unknown'),
+        "timestamp": datetime.now().isoformat(),
+        "bypass_cache": bool(data.get('bypass_cache', False)),
+        "mode": data.get('mode') or 'standard',
+        "validation_mode": data.get('validation_mode') or 'ai',
+        "priority": data.get('priority')
+    }
+    document["priority"] = document_priority(document, default_priority)
+    pin_chunk_settings(document)
+    # Claim check: with a blob store configured the note is stored once and the
+    # workflow (and its history) only carries a reference to it
+    blob_store = get_blob_store()
+    if blob_store is not None:
+        document = offload_content(document, blob_store)
+    return document
+
+def find_near_duplicate(content):
+    """The most similar earlier note with a completed result, checked against this one.
+
+    Returns the note's MinHash signature (for indexing it) and the match, or None.
+    """
+    started = time.perf_counter()
+    signature, matches = near_duplicates.find(content)
+    for match in matches:
+        record = result_store.get(match['workflow_id'])
+        if record is None or record['status'] != 'completed' or not record.get('result'):
+            continue
+        prior_text = near_duplicates.prior_text(match)
+        if prior_text is None:
+            continue
+        result = record['result']
+        codes = result.get('diagnosis_codes', []) + result.get('procedure_codes', [])
+        check = verify_copy_forward(prior_text, content, codes)
+        return signature, {
+            'workflow_id': match['workflow_id'],
+            'document_id': record.get('document_id'),
+            'patient_id': record.get('patient_id'),
+            'similarity': match['similarity'],
+            'check': check,
+            'check_seconds': round(time.perf_counter() - started, 4),
+            'result': result
+        }
+    return signature, None
+
+def can_reuse(near_duplicate, document):
+    """Whether a near-duplicate note's result can stand for this document as is.
+
+    Besides a close, verified match, the earlier note must belong to the same
+    patient and have been coded with the same mode and validation mode.
+    """
+    result = near_duplicate['result']
+    return (
+        near_duplicate['similarity'] >= REUSE_THRESHOLD
+        and near_duplicate['check']['verified']
+        and near_duplicate['patient_id'] == document['patient_id']
+        and result.get('workflow_mode') == document['mode']
+        and result.get('validation_mode') == document['validation_mode']
+    )
+
+def reused_result(near_duplicate, document):
+    """Copy of a near-duplicate note's result, re-addressed to this document."""
+    result = {
+        key: value for key, value in near_duplicate['result'].items()
+        if key not in ('cost_breakdown', 'activity_timings', 'queue_latency_seconds', 'near_duplicate')
+    }
+    result.update({
+        'document_id': document['document_id'],
+        'patient_id': document['patient_id'],
+        'document_type': document['document_type'],
+        'processing_timestamp': datetime.now().isoformat(),
+        'processing_time_seconds': near_duplicate['check_seconds'],
+        'near_duplicate': {key: near_duplicate[key] for key in ('workflow_id', 'document_id', 'similarity', 'check')}
+    })
+    return result
 
 @app.route('/')
 def index():
@@ -39,48 +174,87 @@ def process_document():
     """API endpoint to process medical documents with Amazon Bedrock AI."""
     try:
         data = request.get_json()
-        document_content = data.get('content', '')
-        patient_name = data.get('patient_name', 'Unknown')
-        document_type = data.get('document_type', 'discharge_summary')
         
-        if not document_content.strip():
+        if not data.get('content', '').strip():
             return jsonify({'error': 'Document content is required'}), 400
+        error = option_error(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Generate unique document ID
-        document_id = f"DOC-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8]}"
+        # Copy-forward notes: look for an earlier note that differs by a few lines
+        signature, near_duplicate = None, None
+        if near_duplicates is not None and not data.get('bypass_cache'):
+            signature, near_duplicate = find_near_duplicate(data['content'])
         
         # Create document object
-        document = {
-            "document_id": document_id,
-            "content": document_content,
-            "document_type": document_type,
-            "patient_id": f"PAT-{str(uuid.uuid4())[:8]}",
-            "patient_name": patient_name,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Start workflow in background
+        document = build_document(data)
+        document_id = document["document_id"]
         workflow_id = f"web-{document_id}-{int(time.time())}"
-        workflow_results[workflow_id] = {
-            'status': 'processing',
-            'progress': 0,
-            'message': 'Initializing Amazon Bedrock AI workflow...',
-            'result': None
-        }
         
-        logger.info(f"Starting Amazon Bedrock AI workflow {workflow_id} for document {document_id}")
+        if near_duplicate is not None and can_reuse(near_duplicate, document):
+            # The differences cannot change the coding, so the earlier result stands
+            result_store.create(
+                workflow_id,
+                {
+                    'status': 'completed',
+                    'progress': 100,
+                    'message': f"Reused coding of near-duplicate note {near_duplicate['document_id']}",
+                    'result': reused_result(near_duplicate, document)
+                },
+                document_id=document_id,
+                patient_id=document["patient_id"]
+            )
+            near_duplicates.remember(signature, data['content'], workflow_id)
+            logger.info(f"🪞 Reused coding of {near_duplicate['workflow_id']} for {document_id} (similarity {near_duplicate['similarity']})")
+            return jsonify({
+                'workflow_id': workflow_id,
+                'document_id': document_id,
+                'priority': document['priority'],
+                'status': 'completed',
+                'near_duplicate': {key: near_duplicate[key] for key in ('workflow_id', 'document_id', 'similarity')},
+                'message': 'Coding reused from a near-duplicate note'
+            })
+        if near_duplicate is not None:
+            # Close but not safely identical: the earlier codes go to the model as a reference
+            result = near_duplicate['result']
+            document['reference_codes'] = [
+                [code.get('code'), code.get('description')]
+                for code in result.get('diagnosis_codes', []) + result.get('procedure_codes', [])
+            ]
+            document['near_duplicate'] = {key: near_duplicate[key] for key in ('workflow_id', 'similarity')}
         
-        # Run workflow in background thread
-        thread = threading.Thread(
-            target=run_workflow_background,
-            args=(workflow_id, document)
+        # Queue the workflow start on the shared Temporal dispatcher
+        result_store.create(
+            workflow_id,
+            {
+                'status': 'processing',
+                'progress': 0,
+                'message': 'Queued for Amazon Bedrock AI workflow...',
+                'result': None
+            },
+            document_id=document_id,
+            patient_id=document["patient_id"]
         )
-        thread.daemon = True
-        thread.start()
+        
+        logger.info(f"Starting Amazon Bedrock AI workflow {workflow_id} for document {document_id} ({document['priority']} lane)")
+        
+        try:
+            get_dispatcher().submit(
+                partial(start_workflow_job, workflow_id, document),
+                on_error=partial(workflow_start_failed, workflow_id)
+            )
+        except DispatcherQueueFull as e:
+            result_store.delete(workflow_id)
+            logger.warning(f"Rejected workflow {workflow_id}: {str(e)}")
+            return jsonify({'error': 'Server busy, retry shortly'}), 429, {'Retry-After': '5'}
+        
+        if signature is not None:
+            near_duplicates.remember(signature, data['content'], workflow_id)
         
         return jsonify({
             'workflow_id': workflow_id,
             'document_id': document_id,
+            'priority': document['priority'],
             'status': 'processing',
             'message': 'Amazon Bedrock AI workflow started successfully'
         })
@@ -89,85 +263,480 @@ def process_document():
         logger.error(f"Error starting Amazon Bedrock AI workflow: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def run_workflow_background(workflow_id, document):
-    """Run the Temporal workflow with Amazon Bedrock AI in a background thread."""
+async def start_workflow_job(workflow_id, document, client):
+    """Start the Temporal workflow with Amazon Bedrock AI (runs on the dispatcher loop)."""
     try:
-        logger.info(f"Background thread started for Amazon Bedrock AI workflow {workflow_id}")
+        logger.info(f"Executing workflow {workflow_id} with Amazon Bedrock AI")
+        handle = await client.start_workflow(
+            MEDICAL_CODING_WORKFLOW,
+            document,
+            id=workflow_id,
+            task_queue=lane_task_queue(document['priority'])
+        )
         
-        # Update progress
-        workflow_results[workflow_id]['progress'] = 10
-        workflow_results[workflow_id]['message'] = 'Connecting to Temporal and Amazon Bedrock...'
+        result_store.update(workflow_id, started=True, message='Executing Amazon Bedrock AI workflow...')
         
-        # Run the async workflow
-        asyncio.run(run_workflow_async(workflow_id, document))
+        # Watch for the result without holding a dispatcher consumer
+        get_dispatcher().spawn(watch_workflow_result(workflow_id, handle))
         
     except Exception as e:
-        logger.error(f"Error in background workflow: {str(e)}")
-        workflow_results[workflow_id]['status'] = 'error'
-        workflow_results[workflow_id]['message'] = f'Workflow failed: {str(e)}'
+        workflow_start_failed(workflow_id, e)
+        raise
+
+def workflow_start_failed(workflow_id, error):
+    """Mark a workflow record as failed when its workflow could not be started."""
+    logger.error(f"Error starting workflow {workflow_id}: {str(error)}")
+    result_store.update(workflow_id, status='error', message=f'Workflow failed: {str(error)}')
 
-async def run_workflow_async(workflow_id, document):
-    """Execute the Temporal workflow with Amazon Bedrock AI."""
+async def watch_workflow_result(workflow_id, handle):
+    """Wait for the workflow to finish and record its result."""
     try:
-        logger.info(f"Connecting to Temporal for workflow {workflow_id}")
+        result = await handle.result()
+    except Exception as e:
+        workflow_failed(workflow_id, e)
+    else:
+        workflow_completed(workflow_id, result)
+
+def record_result_metrics(result):
+    """Count a finished workflow's model usage and queue latency in this process's metrics."""
+    get_model_metrics().record_breakdown(result.get('cost_breakdown'))
+    if result.get('priority') and result.get('queue_latency_seconds') is not None:
+        get_model_metrics().record_queue_latency(result['priority'], 'workflow', result['queue_latency_seconds'])
+
+def workflow_completed(workflow_id, result):
+    """Store a finished workflow's result and count its model usage in this process's metrics."""
+    record_result_metrics(result)
+    
+    # Update with successful result
+    result_store.update(
+        workflow_id,
+        status='completed',
+        progress=100,
+        message='Processing completed successfully',
+        result=result
+    )
+    
+    logger.info(f"Workflow {workflow_id} completed successfully")
+    logger.info(f"Result keys: {list(result.keys()) if result else 'No result'}")
+
+def workflow_failed(workflow_id, error):
+    logger.error(f"Error executing workflow {workflow_id}: {str(error)}")
+    result_store.update(workflow_id, status='error', message=f'Workflow execution failed: {str(error)}')
+
+async def query_workflow_progress(workflow_id, client):
+    """Ask the running workflow for its real progress, or fetch its outcome once it has finished.
+    
+    Returns {'progress': ...} while it runs, {'result': ...} or {'error': ...}
+    after it has closed.
+    """
+    handle = client.get_workflow_handle(workflow_id)
+    try:
+        progress = await handle.query(PROGRESS_QUERY)
+        if progress.get('status') == 'running':
+            return {'progress': progress}
+        query_error = None
+    except Exception as e:
+        progress, query_error = None, e
+    
+    description = await handle.describe()
+    if description.status is None or description.status.name == 'RUNNING':
+        if query_error is not None:
+            raise query_error
+        return {'progress': progress}
+    try:
+        return {'result': await handle.result()}
+    except Exception as e:
+        return {'error': e}
+
+def current_workflow_status(workflow_id):
+    """Stored status of a workflow, refreshed from the workflow's progress query while it runs.
+    
+    A workflow found finished is recorded here, so any web process answers for
+    workflows whose watcher ran in another process or was lost to a restart.
+    """
+    status = result_store.get(workflow_id)
+    if status is None:
+        return None
+    
+    if status['status'] == 'processing' and status.get('started'):
+        try:
+            outcome = get_dispatcher().run(
+                partial(query_workflow_progress, workflow_id),
+                timeout=STATUS_QUERY_TIMEOUT
+            )
+        except Exception as e:
+            logger.debug(f"Progress query failed for {workflow_id}: {str(e)}")
+            return status
         
-        # Update progress
-        workflow_results[workflow_id]['progress'] = 20
-        workflow_results[workflow_id]['message'] = 'Executing Amazon Bedrock AI workflow...'
+        if 'result' in outcome:
+            workflow_completed(workflow_id, outcome['result'])
+            return result_store.get(workflow_id)
+        if 'error' in outcome:
+            workflow_failed(workflow_id, outcome['error'])
+            return result_store.get(workflow_id)
+        progress = outcome['progress']
+        status.update({
+            'progress': progress['progress'],
+            'message': progress['message'],
+            'current_step': progress['current_step'],
+            'running_steps': progress.get('running_steps', []),
+            'steps': progress['steps'],
+            'partial_results': progress['partial_results']
+        })
+    return status
+
+@app.route('/api/workflow-status/<workflow_id>')
+def get_workflow_status(workflow_id):
+    """Get the status of a workflow."""
+    try:
+        status = current_workflow_status(workflow_id)
+        if status is None:
+            return jsonify({'error': 'Workflow not found'}), 404
         
-        # Connect to Temporal
-        client = await Client.connect("localhost:7233")
+        return jsonify(status)
         
-        # Execute workflow with Amazon Bedrock AI
-        logger.info(f"Executing workflow {workflow_id} with Amazon Bedrock AI")
-        result = await client.execute_workflow(
-            MedicalCodingWorkflow.run,
-            document,
-            id=workflow_id,
-            task_queue="medical-coding-task-queue"
+    except Exception as e:
+        logger.error(f"Error getting workflow status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/workflow-events/<workflow_id>')
+def stream_workflow_events(workflow_id):
+    """Server-Sent Events stream that pushes workflow status whenever it changes."""
+    if workflow_id not in result_store:
+        return jsonify({'error': 'Workflow not found'}), 404
+    
+    def events():
+        last_payload = None
+        last_sent = time.monotonic()
+        while True:
+            status = current_workflow_status(workflow_id)
+            if status is None:
+                break
+            
+            payload = json.dumps(status, default=str)
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > SSE_KEEPALIVE_INTERVAL:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            
+            if status['status'] in ('completed', 'error'):
+                break
+            time.sleep(SSE_POLL_INTERVAL)
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/results')
+def find_results():
+    """Look up workflow records by document_id and/or patient_id."""
+    document_id = request.args.get('document_id')
+    patient_id = request.args.get('patient_id')
+    if not document_id and not patient_id:
+        return jsonify({'error': 'document_id or patient_id is required'}), 400
+    
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    return jsonify(result_store.find(document_id=document_id, patient_id=patient_id, limit=limit))
+
+@app.route('/api/export')
+def export_results():
+    """Stream completed results as one row per code (NDJSON, CSV or Parquet).
+    
+    ?format= picks the format (default ndjson); ?since= and ?until= bound the
+    completion time (ISO 8601 or epoch seconds) and ?cursor= resumes after the
+    last row of an earlier export.
+    """
+    fmt = request.args.get('format', 'ndjson').lower()
+    try:
+        export = ResultExport(
+            result_store,
+            cursor=request.args.get('cursor'),
+            since=parse_timestamp(request.args['since']) if request.args.get('since') else None,
+            until=parse_timestamp(request.args['until']) if request.args.get('until') else None
         )
+        chunks = serialize_rows(export, fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=CONTENT_TYPES[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename=medical-codes.{fmt}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def parse_batch_payload():
+    """Read batch documents from a JSON array, an NDJSON body or an uploaded file."""
+    upload = request.files.get('file')
+    if upload is not None:
+        raw = upload.read().decode('utf-8')
+    else:
+        raw = request.get_data(as_text=True)
+    
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError:
+        items = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    
+    # A single object is either a wrapper {"documents": [...]} or a one-line NDJSON batch
+    if isinstance(items, dict):
+        items = items.get('documents', [items])
+    
+    if not isinstance(items, list):
+        raise ValueError('Batch must be a JSON array or NDJSON')
+    return items
+
+@app.route('/api/process-batch', methods=['POST'])
+def process_batch():
+    """API endpoint to code a batch of documents with one submission."""
+    try:
+        try:
+            items = parse_batch_payload()
+        except (ValueError, json.JSONDecodeError) as e:
+            return jsonify({'error': f'Invalid batch payload: {str(e)}'}), 400
+        
+        if not items:
+            return jsonify({'error': 'Batch contains no documents'}), 400
+        if len(items) > MAX_BATCH_DOCUMENTS:
+            return jsonify({'error': f'Batch exceeds {MAX_BATCH_DOCUMENTS} documents'}), 413
+        
+        invalid = [i for i, item in enumerate(items) if not isinstance(item, dict) or not str(item.get('content', '')).strip()]
+        if invalid:
+            return jsonify({'error': 'Document content is required', 'invalid_indexes': invalid[:100]}), 400
+        
+        # A batch-wide ?mode=, ?validation_mode= or ?priority= applies to documents that don't set their own
+        for field, _ in DOCUMENT_OPTIONS:
+            batch_value = request.args.get(field)
+            if batch_value:
+                for item in items:
+                    if not item.get(field):
+                        item[field] = batch_value
+        # Each document's own options are checked here, so a bad one fails the
+        # submission instead of its child workflow
+        invalid = [(index, option_error(item)) for index, item in enumerate(items)]
+        invalid = [(index, error) for index, error in invalid if error]
+        if invalid:
+            index, error = invalid[0]
+            return jsonify({
+                'error': f"Document {index}: {error}",
+                'index': index,
+                'invalid_indexes': [index for index, _ in invalid][:100]
+            }), 400
+        
+        # Pinned in every part, so workers never fall back to their own BATCH_MAX_PARALLEL
+        max_parallel = request.args.get('max_parallel', type=int) or BATCH_MAX_PARALLEL
+        batch_id = f"BATCH-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8]}"
+        
+        documents = []
+        seen_ids = set()
+        for item in items:
+            document_id = item.get('document_id')
+            if not document_id or document_id in seen_ids:
+                document_id = None
+            document = build_document(item, document_id, BATCH_PRIORITY)
+            seen_ids.add(document["document_id"])
+            documents.append(document)
         
-        # Update with successful result
-        workflow_results[workflow_id]['status'] = 'completed'
-        workflow_results[workflow_id]['progress'] = 100
-        workflow_results[workflow_id]['message'] = 'Processing completed successfully'
-        workflow_results[workflow_id]['result'] = result
+        parts = []
+        for offset in range(0, len(documents), BATCH_WORKFLOW_SIZE):
+            part = {
+                "batch_id": batch_id,
+                "documents": documents[offset:offset + BATCH_WORKFLOW_SIZE],
+                "max_parallel": max_parallel
+            }
+            parts.append((f"batch-{batch_id}-part-{len(parts):04d}", part))
         
-        logger.info(f"Workflow {workflow_id} completed successfully")
-        logger.info(f"Result keys: {list(result.keys()) if result else 'No result'}")
+        # Kept in the result store with the BatchMedicalCodingWorkflow executions that
+        # make it up, so any web process can report on the batch
+        workflow_ids = [workflow_id for workflow_id, _ in parts]
+        result_store.create_batch(batch_id, {
+            'status': 'submitting',
+            'total_documents': len(documents),
+            'workflow_ids': workflow_ids,
+            'message': None
+        })
+        
+        logger.info(f"Starting batch {batch_id}: {len(documents)} documents in {len(parts)} workflow(s)")
+        
+        try:
+            get_dispatcher().submit(partial(start_batch_job, batch_id, parts), on_error=partial(batch_start_failed, batch_id))
+        except DispatcherQueueFull as e:
+            result_store.delete_batch(batch_id)
+            logger.warning(f"Rejected batch {batch_id}: {str(e)}")
+            return jsonify({'error': 'Server busy, retry shortly'}), 429, {'Retry-After': '5'}
+        
+        return jsonify({
+            'batch_id': batch_id,
+            'total_documents': len(documents),
+            'workflow_ids': workflow_ids,
+            'status': 'submitting'
+        })
         
     except Exception as e:
-        logger.error(f"Error executing workflow {workflow_id}: {str(e)}")
-        workflow_results[workflow_id]['status'] = 'error'
-        workflow_results[workflow_id]['message'] = f'Workflow execution failed: {str(e)}'
+        logger.error(f"Error starting batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/api/workflow-status/<workflow_id>')
-def get_workflow_status(workflow_id):
-    """Get the status of a workflow."""
+async def start_batch_job(batch_id, parts, client):
+    """Start every batch workflow (runs on the dispatcher loop)."""
     try:
-        if workflow_id not in workflow_results:
-            return jsonify({'error': 'Workflow not found'}), 404
+        handles = []
+        for workflow_id, part in parts:
+            handles.append(await client.start_workflow(
+                BATCH_MEDICAL_CODING_WORKFLOW,
+                part,
+                id=workflow_id,
+                task_queue=lane_task_queue(BATCH_PRIORITY)
+            ))
+        result_store.update_batch(batch_id, status='processing')
+        logger.info(f"Batch {batch_id} submitted")
+    except Exception as e:
+        batch_start_failed(batch_id, e)
+        raise
+    
+    # Record the children's results once each part finishes, without holding a dispatcher consumer
+    for (workflow_id, part), handle in zip(parts, handles):
+        get_dispatcher().spawn(watch_batch_results(workflow_id, part, handle, client))
+
+async def watch_batch_results(workflow_id, part, handle, client):
+    """Wait for a batch workflow to finish and store each child workflow's outcome.
+    
+    Batch documents then have result records like single submissions, so they
+    show up in /api/workflow-status, /api/results and the export.
+    """
+    try:
+        progress = await handle.result()
+    except Exception as e:
+        logger.error(f"Batch workflow {workflow_id} failed: {str(e)}")
+        return
+    
+    patients = {document['document_id']: document.get('patient_id') for document in part['documents']}
+    semaphore = asyncio.Semaphore(BATCH_RESULT_FETCH_CONCURRENCY)
+    
+    async def record(document_id, entry):
+        child_id = entry['workflow_id']
+        if entry['status'] == 'error':
+            result_store.create(
+                child_id,
+                {'status': 'error', 'progress': 0, 'message': f"Workflow execution failed: {entry.get('error')}", 'result': None},
+                document_id=document_id,
+                patient_id=patients.get(document_id)
+            )
+            return
+        if entry['status'] != 'completed':
+            return
+        async with semaphore:
+            result = await client.get_workflow_handle(child_id).result()
+        record_result_metrics(result)
+        result_store.create(
+            child_id,
+            {'status': 'completed', 'progress': 100, 'message': 'Processing completed successfully', 'result': result},
+            document_id=document_id,
+            patient_id=patients.get(document_id)
+        )
+    
+    outcomes = await asyncio.gather(
+        *(record(document_id, entry) for document_id, entry in progress['documents'].items()),
+        return_exceptions=True
+    )
+    failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    if failures:
+        logger.error(f"Could not record {len(failures)} result(s) of batch workflow {workflow_id}: {str(failures[0])}")
+    logger.info(f"Recorded {len(outcomes) - len(failures)} result(s) of batch workflow {workflow_id}")
+
+def batch_start_failed(batch_id, error):
+    """Mark a batch as failed when its workflows could not be started."""
+    logger.error(f"Error submitting batch {batch_id}: {str(error)}")
+    result_store.update_batch(batch_id, status='error', message=f'Batch submission failed: {str(error)}')
+
+async def fetch_batch_progress(workflow_ids, client):
+    """Collect progress from each batch workflow, by query while running."""
+    async def progress(workflow_id):
+        handle = client.get_workflow_handle(workflow_id)
+        description = await handle.describe()
+        if description.status and description.status.name == 'COMPLETED':
+            return await handle.result()
+        if description.status and description.status.name != 'RUNNING':
+            return {'error': f'Batch workflow {description.status.name.lower()}'}
+        return await handle.query(PROGRESS_QUERY)
+    
+    return await asyncio.gather(*(progress(workflow_id) for workflow_id in workflow_ids), return_exceptions=True)
+
+@app.route('/api/batch-status/<batch_id>')
+def get_batch_status(batch_id):
+    """Get aggregate and per-document progress of a batch."""
+    try:
+        job = result_store.get_batch(batch_id)
+        if job is None:
+            return jsonify({'error': 'Batch not found'}), 404
+        
+        response = {
+            'batch_id': batch_id,
+            'status': job['status'],
+            'total_documents': job['total_documents'],
+            'created_at': datetime.fromtimestamp(job['created_at']).isoformat(),
+            'message': job['message'],
+            'counts': {'pending': job['total_documents'], 'processing': 0, 'completed': 0, 'error': 0}
+        }
+        if job['status'] != 'processing':
+            return jsonify(response)
         
-        result = workflow_results[workflow_id]
+        include_documents = request.args.get('documents', 'true').lower() != 'false'
+        counts = {'pending': 0, 'processing': 0, 'completed': 0, 'error': 0}
+        documents = {}
+        errors = []
         
-        # Update progress based on status
-        if result['status'] == 'processing':
-            if result['progress'] < 30:
-                result['progress'] = min(result['progress'] + 5, 30)
-                result['message'] = 'Starting document analysis with Amazon Bedrock AI...'
-            elif result['progress'] < 60:
-                result['progress'] = min(result['progress'] + 3, 60)
-                result['message'] = 'Generating ICD-10 codes with AI...'
-            elif result['progress'] < 90:
-                result['progress'] = min(result['progress'] + 2, 90)
-                result['message'] = 'Validating codes and generating report...'
+        for workflow_id, progress in zip(job['workflow_ids'], get_dispatcher().run(partial(fetch_batch_progress, job['workflow_ids']))):
+            if isinstance(progress, BaseException) or 'error' in progress:
+                errors.append({'workflow_id': workflow_id, 'error': str(progress.get('error') if isinstance(progress, dict) else progress)})
+                continue
+            for state, count in progress['counts'].items():
+                counts[state] += count
+            if include_documents:
+                documents.update(progress['documents'])
         
-        return jsonify(result)
+        # Parts we could not read are reported as still pending
+        counts['pending'] += job['total_documents'] - sum(counts.values())
+        finished = counts['completed'] + counts['error']
+        
+        response.update({
+            'status': 'completed' if finished == job['total_documents'] else 'processing',
+            'progress': round(100 * finished / job['total_documents'], 1),
+            'counts': counts,
+            'workflow_errors': errors
+        })
+        if include_documents:
+            response['documents'] = documents
+        return jsonify(response)
         
     except Exception as e:
-        logger.error(f"Error getting workflow status: {str(e)}")
+        logger.error(f"Error getting batch status: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/dispatcher-metrics')
+def get_dispatcher_metrics():
+    """Queue depth, job counters and submit latency of the Temporal dispatcher."""
+    return jsonify(get_dispatcher().stats())
+
+@app.route('/metrics')
+def get_metrics():
+    """Model calls, tokens, cost, latency, retries and cache outcomes per workflow step,
+    and workflow queue latency per priority lane.
+    
+    Prometheus text by default, JSON with ?format=json. Totals cover the documents
+    this web process has seen complete.
+    """
+    metrics = get_model_metrics()
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.stats())
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/sample-documents')
 def get_sample_documents():
     """Get sample medical documents for testing."""
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Workflow history size with and without the claim check
+For synthetic notes of growing length, adds up the payload bytes a standard
+workflow writes into Temporal history as inputs: the workflow input, every
+analysis chunk, coding and validation, and the chunk plan for offloaded notes.
+Activity results are the same either way and are left out. It also times how
+long activities take to resolve content from the blob store, cold and from the
+per-worker read cache.
+
+Usage:
+    python -m benchmarks.bench_claim_check --pages 1 5 20 50 --backend sqlite
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from temporalio.converter import DataConverter
+
+from benchmarks.bench_load import synthetic_document
+from benchmarks.fake_model_server import CANNED_RESPONSE
+from blob_store import BlobStore, FileBlobBackend, SQLiteBlobBackend, offload_content, resolve_content, set_blob_store
+from document_chunking import CHUNK_MAX_CHARS, chunk_documents
+from temporal_medical_coding_demo import plan_document_chunks
+
+ANALYSIS = {key: CANNED_RESPONSE[key] for key in ("diagnoses", "procedures", "medications", "vital_signs")}
+CODES = {key: CANNED_RESPONSE[key] for key in ("diagnosis_codes", "procedure_codes")}
+
+
+def payload_bytes(*values: Any) -> int:
+    return sum(payload.ByteSize() for payload in DataConverter.default.payload_converter.to_payloads(list(values)))
+
+
+def history_inputs(document: Dict[str, Any], chunks: List[Dict[str, Any]], chunk_plan: bool) -> int:
+    """Bytes of the workflow and activity inputs one standard execution records."""
+    total = payload_bytes(document)
+    if chunk_plan:
+        # The local activity's result (the chunk references) is recorded in a marker
+        total += payload_bytes(chunks)
+    total += sum(payload_bytes(chunk) for chunk in chunks) if chunks else payload_bytes(document)
+    total += payload_bytes(ANALYSIS, document) + payload_bytes(CODES, document)
+    return total
+
+
+def make_store(backend: str, root: str) -> BlobStore:
+    if backend == "file":
+        return BlobStore(FileBlobBackend(os.path.join(root, "blobs")))
+    return BlobStore(SQLiteBlobBackend(os.path.join(root, "blobs.db")))
+
+
+def main(pages_list: List[int], backend: str, reads: int):
+    print("🎫 Claim check benchmark")
+    print(f"   {backend} blob store, zlib compression; history bytes are workflow + activity inputs")
+    print("=" * 86)
+    print(f"{'pages':>5} {'note chars':>10} {'chunks':>6} {'inline (KB)':>12} {'claim check (KB)':>17} "
+          f"{'stored (KB)':>12} {'cold read (ms)':>15} {'cached (µs)':>12}")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = make_store(backend, root)
+        set_blob_store(store)
+        try:
+            for pages in pages_list:
+                document = synthetic_document(0, random.Random(pages), pages, "standard")
+                inline = history_inputs(document, chunk_documents(document), chunk_plan=False)
+
+                offloaded = offload_content(document, store)
+                chunks = asyncio.run(plan_document_chunks(offloaded)) if len(document["content"]) > CHUNK_MAX_CHARS else []
+                claim_check = history_inputs(offloaded, chunks, chunk_plan=bool(chunks))
+
+                cold = []
+                for _ in range(reads):
+                    # A fresh store over the same backend has an empty read cache
+                    fresh = BlobStore(store.backend)
+                    start = time.perf_counter()
+                    fresh.get_text(offloaded["content_ref"]["blob"])
+                    cold.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                for _ in range(reads):
+                    resolve_content(offloaded)
+                cached = (time.perf_counter() - start) / reads
+
+                stored = len(store.backend.get(offloaded["content_ref"]["blob"]))
+                print(f"{pages:>5} {len(document['content']):>10} {len(chunks):>6} {inline / 1024:>12.1f} "
+                      f"{claim_check / 1024:>17.1f} {stored / 1024:>12.1f} {statistics.median(cold) * 1000:>15.3f} "
+                      f"{cached * 1e6:>12.1f}")
+        finally:
+            set_blob_store(None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20, 50], help="synthetic note lengths")
+    parser.add_argument("--backend", choices=["file", "sqlite"], default="sqlite")
+    parser.add_argument("--reads", type=int, default=200, help="reads timed per note")
+    args = parser.parse_args()
+    main(args.pages, args.backend, args.reads)
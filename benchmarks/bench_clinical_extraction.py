@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Local clinical fact extraction
+Throughput of the pattern-based extractor for vital signs, dosed medications
+and lab values over a synthetic corpus, note by note and in batches (one scan
+over the joined notes). Then the analysis prompt with and without the
+extracted facts, and the response tokens the model no longer has to write.
+
+Usage:
+    python -m benchmarks.bench_clinical_extraction --documents 100000 --batch-size 1000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import List
+
+from benchmarks.bench_load import synthetic_document
+from benchmarks.bench_prompts import token_counter
+from clinical_extraction import extract_clinical_facts, extract_clinical_facts_batch
+from model_client import DEFAULT_MODEL
+from prompts import analysis_prompt, compact_json
+
+
+def throughput(texts: List[str], batch_size: int):
+    megabytes = sum(len(text) for text in texts) / 1e6
+    print(f"{'mode':>10} {'notes/s':>10} {'MB/s':>7} {'µs/note':>8} {'facts/note':>11}")
+
+    start = time.perf_counter()
+    results = [extract_clinical_facts(text) for text in texts]
+    elapsed = time.perf_counter() - start
+    facts = statistics.mean(len(r["vital_signs"]) + len(r["medications"]) + len(r["lab_results"]) for r in results)
+    print(f"{'per note':>10} {len(texts) / elapsed:>10,.0f} {megabytes / elapsed:>7.1f} {elapsed / len(texts) * 1e6:>8.1f} {facts:>11.2f}")
+
+    start = time.perf_counter()
+    batched = []
+    for offset in range(0, len(texts), batch_size):
+        batched += extract_clinical_facts_batch(texts[offset:offset + batch_size])
+    elapsed = time.perf_counter() - start
+    assert batched == results, "batch extraction disagrees with per-note extraction"
+    print(f"{'batched':>10} {len(texts) / elapsed:>10,.0f} {megabytes / elapsed:>7.1f} {elapsed / len(texts) * 1e6:>8.1f} {facts:>11.2f}")
+
+
+def prompt_savings(pages_list: List[int]):
+    count = token_counter(DEFAULT_MODEL)
+    print(f"{'pages':>5} {'prompt before':>14} {'prompt after':>13} {'response tokens saved':>22}")
+    for pages in pages_list:
+        document = synthetic_document(0, random.Random(pages), pages, "standard")
+        facts = extract_clinical_facts(document["content"])
+        before = sum(count(part) for part in analysis_prompt(document))
+        after = sum(count(part) for part in analysis_prompt(document, facts))
+        # What the model would otherwise have written for these facts, in the response format
+        saved = count(compact_json({
+            "medications": [{k: m[k] for k in ("medication", "dosage", "indication")} for m in facts["medications"]],
+            "vital_signs": facts["vital_signs"]
+        }))
+        print(f"{pages:>5} {before:>14} {after:>13} {saved:>22}")
+
+
+def main(documents: int, batch_size: int, pages_list: List[int]):
+    print("🩺 Clinical extraction benchmark")
+    texts = [synthetic_document(i, random.Random(i), 1, "standard")["content"] for i in range(documents)]
+    print(f"   {documents:,} synthetic notes, {sum(len(t) for t in texts) / 1e6:.1f} MB, batches of {batch_size}")
+    print("=" * 60)
+    throughput(texts, batch_size)
+    print()
+    prompt_savings(pages_list)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20], help="note lengths for the prompt comparison")
+    args = parser.parse_args()
+    main(args.documents, args.batch_size, args.pages)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Candidate code retrieval
+Builds the TF-IDF retriever over a CMS order file (or a synthetic table of
+similar size), times phrase queries, and compares the code-generation prompt
+with and without retrieved candidates.
+
+Usage:
+    python -m benchmarks.bench_code_retrieval
+    python -m benchmarks.bench_code_retrieval --cm-file icd10cm_order_2025.txt
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_model_server import CANNED_RESPONSE
+from code_retrieval import CodeRetriever
+from icd10_index import Icd10Index, build_index, parse_cms_file
+from prompts import candidate_coding_prompt
+from temporal_medical_coding_demo import CANDIDATES_PER_FINDING
+
+SITES = ["left", "right", "bilateral", "upper", "lower", "lumbar", "cervical", "thoracic", "abdominal", "pelvic"]
+CONDITIONS = [
+    "diabetes mellitus", "hypertension", "pneumonia", "fracture", "infection", "neoplasm",
+    "heart failure", "asthma", "kidney disease", "anemia", "osteoarthritis", "migraine",
+    "hyperlipidemia", "depression", "obesity", "ulcer", "sepsis", "embolism"
+]
+QUALIFIERS = ["acute", "chronic", "recurrent", "with complications", "without complications",
+              "initial encounter", "subsequent encounter", "sequela", "type 1", "type 2"]
+
+
+def write_synthetic_cm_file(path: str, count: int) -> int:
+    """Write a CMS-format order file of billable codes with combinatorial clinical descriptions."""
+    rng = random.Random(11)
+    with open(path, "w") as f:
+        for order in range(1, count + 1):
+            letter = "ABCDEFGHIJKLMNOPQRSTVWXYZ"[order % 25]
+            code = f"{letter}{order % 100:02d}{order // 100 % 10000:04d}"
+            description = f"{rng.choice(QUALIFIERS)} {rng.choice(CONDITIONS)} of {rng.choice(SITES)} {rng.choice(SITES)}, {rng.choice(QUALIFIERS)}"
+            f.write(f"{order:05d} {code:<7} 1 {description[:60]:<60} {description}\n")
+    return count
+
+
+def main(cm_file: str, queries: int):
+    workdir = tempfile.mkdtemp(prefix="retrieval-bench-")
+    if not cm_file:
+        cm_file = os.path.join(workdir, "icd10cm_order_synthetic.txt")
+        write_synthetic_cm_file(cm_file, 72000)
+    index_path = os.path.join(workdir, "icd10cm.idx")
+    build_index(parse_cms_file(cm_file), index_path, "CM")
+    index = Icd10Index(index_path)
+
+    print("🔎 Candidate code retrieval benchmark")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    retriever = CodeRetriever.from_index(index)
+    print(f"Build TF-IDF index:       {(time.perf_counter() - start) * 1000:10.1f} ms  ({len(retriever)} codes, {len(retriever.vocabulary)} terms)")
+
+    rng = random.Random(3)
+    phrases = [f"{rng.choice(QUALIFIERS)} {rng.choice(CONDITIONS)} {rng.choice(SITES)}" for _ in range(queries)]
+    latencies = []
+    for phrase in phrases:
+        start = time.perf_counter()
+        retriever.search(phrase, k=5)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"Query latency p50:        {statistics.median(latencies):10.3f} ms")
+    print(f"Query latency p95:        {latencies[int(len(latencies) * 0.95) - 1]:10.3f} ms")
+
+    analysis = CANNED_RESPONSE["analysis"]
+    candidates = {"diagnosis": [], "procedure": []}
+    for finding in analysis["diagnoses"]:
+        candidates["diagnosis"].append({"phrase": finding["condition"], "candidates": retriever.search(finding["condition"], CANDIDATES_PER_FINDING)})
+    prompt = "".join(candidate_coding_prompt(analysis, candidates))
+    # The prompt depends only on the findings, so its size no longer tracks document length
+    print(f"Candidate prompt:         {len(prompt):10d} chars  (~{len(prompt) // 4} tokens, independent of document length)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cm-file", help="CMS ICD-10-CM order or codes file (default: synthetic table)")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    main(args.cm_file, args.queries)
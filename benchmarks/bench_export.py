@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Streaming result export
+Fills a SQLite result store with --documents completed results (1-3 diagnosis
+codes and up to one procedure code each) and exports them in every format,
+reporting rows/s, output size and peak Python memory, which should stay flat
+as the store grows. Then times an incremental export from a cursor.
+
+Usage:
+    python -m benchmarks.bench_export --documents 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from result_export import EXPORT_FORMATS, ResultExport, make_cursor, parquet_available, serialize_rows
+from result_store import SQLiteResultStore
+
+CODES = [("E11.9", "Type 2 diabetes mellitus without complications"), ("I10", "Essential (primary) hypertension"),
+         ("I50.9", "Heart failure, unspecified"), ("N18.3", "Chronic kidney disease, stage 3"),
+         ("J44.1", "Chronic obstructive pulmonary disease with (acute) exacerbation")]
+
+
+def fill(store: SQLiteResultStore, documents: int):
+    rng = random.Random(0)
+    conn = store._connection()
+    conn.execute("BEGIN")
+    for i in range(documents):
+        chosen = rng.sample(CODES, rng.randint(1, 3))
+        result = {
+            "document_id": f"DOC-{i:07d}", "patient_id": f"PAT-{i % 5000:05d}", "requires_review": rng.random() < 0.1,
+            "diagnosis_codes": [
+                {"code": code, "description": description, "confidence": round(rng.uniform(0.7, 0.99), 2), "primary": n == 0}
+                for n, (code, description) in enumerate(chosen)
+            ],
+            "procedure_codes": [{"code": "4A023N7", "description": "Cardiac catheterization", "confidence": 0.85}] if rng.random() < 0.2 else []
+        }
+        store.create(f"wf-{i:07d}", {"status": "completed", "progress": 100, "result": result}, result["document_id"], result["patient_id"])
+    conn.execute("COMMIT")
+
+
+def run(store: SQLiteResultStore, fmt: str, cursor=None, trace: bool = False):
+    export = ResultExport(store, cursor=cursor, until=time.time() + 1)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in serialize_rows(export, fmt))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    if trace:
+        tracemalloc.stop()
+    return export, elapsed, size, peak
+
+
+def main(documents: int):
+    print("📤 Result export benchmark")
+    with tempfile.TemporaryDirectory() as root:
+        store = SQLiteResultStore(os.path.join(root, "results.db"), max_entries=documents * 2)
+        start = time.perf_counter()
+        fill(store, documents)
+        print(f"   {documents:,} completed results stored in {time.perf_counter() - start:.1f}s")
+        print("=" * 64)
+        print(f"{'format':>8} {'rows':>10} {'rows/s':>10} {'seconds':>8} {'output MB':>10} {'peak MB':>8}")
+        for fmt in EXPORT_FORMATS:
+            if fmt == "parquet" and not parquet_available():
+                print(f"{fmt:>8}   skipped (pyarrow not installed)")
+                continue
+            export, elapsed, size, _ = run(store, fmt)
+            _, _, _, peak = run(store, fmt, trace=True)
+            print(f"{fmt:>8} {export.rows:>10,} {export.rows / elapsed:>10,.0f} {elapsed:>8.2f} {size / 1e6:>10.1f} {peak / 1e6:>8.1f}")
+
+        # Incremental: resume after 99% of the results, as a periodic export would
+        record = next(record for i, record in enumerate(store.iter_completed()) if i == int(documents * 0.99))
+        export, elapsed, size, _ = run(store, "ndjson", cursor=make_cursor(record["updated_at"], record["workflow_id"]))
+        print(f"\n   incremental from a cursor: {export.records:,} results, {export.rows:,} rows in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.documents)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark - ICD-10 index load time, lookups and rule-based validation
+Indexes a CMS order file (or a synthetic table of similar size) and times
+exact lookups, prefix lookups and per-document rule checks.
+
+Usage:
+    python -m benchmarks.bench_icd10_index
+    python -m benchmarks.bench_icd10_index --cm-file icd10cm_order_2025.txt
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from code_rules import validate_codes_with_rules
+from icd10_index import Icd10Catalog, Icd10Index, build_index, format_cm_code, parse_cms_file
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTVWXYZ"
+
+
+def write_synthetic_cm_file(path: str) -> int:
+    """Write a CMS-format order file with ~77k codes: category headers, subcategories and leaves."""
+    order = 0
+    with open(path, "w") as f:
+        def write(code: str, billable: bool, description: str):
+            nonlocal order
+            order += 1
+            f.write(f"{order:05d} {code:<7} {int(billable)} {description[:60]:<60} {description}\n")
+
+        for letter in LETTERS:
+            for category in range(100):
+                base = f"{letter}{category:02d}"
+                write(base, False, f"Synthetic condition {base}")
+                for fourth in range(10):
+                    code = f"{base}{fourth}"
+                    if fourth < 5:
+                        write(code, False, f"Synthetic condition {base} type {fourth}")
+                        for fifth in range(4):
+                            write(f"{code}{fifth}", True, f"Synthetic condition {base} type {fourth} site {fifth}")
+                    else:
+                        write(code, True, f"Synthetic condition {base} type {fourth}")
+    return order
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(cm_file: str, lookups: int):
+    workdir = tempfile.mkdtemp(prefix="icd10-bench-")
+    if not cm_file:
+        cm_file = os.path.join(workdir, "icd10cm_order_synthetic.txt")
+        write_synthetic_cm_file(cm_file)
+    index_path = os.path.join(workdir, "icd10cm.idx")
+
+    print("📚 ICD-10 index benchmark")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    count = build_index(parse_cms_file(cm_file), index_path, "CM")
+    build_seconds = time.perf_counter() - start
+    print(f"Build from flat file:     {build_seconds * 1000:10.1f} ms  ({count} codes, {os.path.getsize(index_path) / 1e6:.1f} MB)")
+
+    start = time.perf_counter()
+    index = Icd10Index(index_path)
+    print(f"Open (memory-map):        {(time.perf_counter() - start) * 1e6:10.1f} µs")
+
+    rng = random.Random(7)
+    codes: List[str] = [entry[0] for entry in parse_cms_file(cm_file)]
+    sample = [rng.choice(codes) for _ in range(lookups)]
+    missing = [f"{code}Z" for code in sample]
+
+    per_lookup = timed(lambda: [index.lookup(code) for code in sample], 1) / lookups
+    print(f"Exact lookup (hit):       {per_lookup * 1e6:10.2f} µs/op")
+    per_miss = timed(lambda: [code in index for code in missing], 1) / lookups
+    print(f"Membership (miss):        {per_miss * 1e6:10.2f} µs/op")
+    prefixes = [code[:3] for code in sample[:1000]]
+    per_prefix = timed(lambda: [index.prefix(prefix, limit=20) for prefix in prefixes], 1) / len(prefixes)
+    print(f"Prefix lookup (20 rows):  {per_prefix * 1e6:10.2f} µs/op")
+
+    catalog = Icd10Catalog(cm=index)
+    documents = [
+        {"diagnosis_codes": [
+            {"code": format_cm_code(rng.choice(codes)), "primary": i == 0} for i in range(6)
+        ], "procedure_codes": []}
+        for _ in range(1000)
+    ]
+    per_document = timed(lambda: [validate_codes_with_rules(document, catalog) for document in documents], 1) / len(documents)
+    print(f"Rule validation (6 codes): {per_document * 1e6:9.2f} µs/document")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cm-file", help="CMS ICD-10-CM order or codes file (default: synthetic table)")
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    main(args.cm_file, args.lookups)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark - End-to-end load test against a fake model backend
+Runs MedicalCodingWorkflow on an in-process worker against a local Temporal
+server and a fake model endpoint, driving synthetic documents either directly
+through the workflow or through the Flask /api/process-document path, and
+reports latency percentiles, docs/sec, failures and worker memory.
+
+Without --temporal-address the SDK's local dev server is started (downloaded
+on first use). Exits non-zero when --max-p95 or --max-failure-rate is exceeded.
+
+Usage:
+    python -m benchmarks.bench_load --documents 200 --latency 0.3
+    python -m benchmarks.bench_load --distribution lognormal --spread 0.6 --failure-rate 0.05
+    python -m benchmarks.bench_load --target flask --temporal-address localhost:7233
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Use LiteLLM's bundled model cost map instead of fetching it over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from temporalio.client import Client
+
+from benchmarks.fake_model_server import LATENCY_DISTRIBUTIONS, FakeModelServer, latency_sampler
+from model_client import ModelClient, set_model_client
+from temporal_medical_coding_demo import TASK_QUEUE, MedicalCodingWorkflow, create_worker
+
+CONDITIONS = [
+    ("Type 2 diabetes mellitus", "Metformin 500mg twice daily", "A1C: {a1c}%"),
+    ("Essential hypertension", "Lisinopril 10mg daily", "Blood pressure: {sys}/{dia} mmHg"),
+    ("Community-acquired pneumonia", "Ceftriaxone 1g IV daily", "Chest X-ray shows right lower lobe infiltrate"),
+    ("Chronic obstructive pulmonary disease", "Tiotropium inhaler daily", "Oxygen saturation {spo2}%"),
+    ("Congestive heart failure", "Furosemide 40mg daily", "BNP {bnp} pg/mL"),
+    ("Acute kidney injury", "IV fluids", "Creatinine {cr} mg/dL"),
+]
+
+# One result per document: (latency seconds, result or None, error or None)
+Outcome = Tuple[float, Optional[Dict[str, Any]], Optional[str]]
+
+
+def synthetic_document(index: int, rng: random.Random, pages: int, mode: str) -> Dict[str, Any]:
+    """A clinical note with 1-3 random conditions and varying values, so no two hit the result cache."""
+    sections = []
+    for page in range(pages):
+        chosen = rng.sample(CONDITIONS, rng.randint(1, 3))
+        values = {
+            "a1c": round(rng.uniform(5.5, 11.0), 1), "sys": rng.randint(110, 180), "dia": rng.randint(60, 110),
+            "spo2": rng.randint(84, 99), "bnp": rng.randint(80, 2400), "cr": round(rng.uniform(0.7, 4.5), 1)
+        }
+        sections.append(
+            f"HPI:\nVisit {index}-{page}. Patient presents for {', '.join(c[0] for c in chosen).lower()}.\n"
+            f"Physical Exam:\n{'. '.join(c[2].format(**values) for c in chosen)}.\n"
+            f"Medications:\n{'; '.join(c[1] for c in chosen)}.\n"
+            f"Assessment:\n{'; '.join(c[0] for c in chosen)}.\n"
+            f"Plan:\nContinue current management, follow up in {rng.randint(1, 12)} weeks.\n"
+        )
+    return {
+        "document_id": f"LOAD-{index:06d}",
+        "content": "\n".join(sections),
+        "document_type": "consultation",
+        "patient_id": f"PAT-{index:06d}",
+        "patient_name": "Load Test",
+        "mode": mode
+    }
+
+
+@contextlib.asynccontextmanager
+async def temporal_client(address: Optional[str]):
+    """Client for an existing server, or for the SDK's local dev server started for this run."""
+    if address:
+        yield await Client.connect(address)
+        return
+    from temporalio.testing import WorkflowEnvironment
+    env = await WorkflowEnvironment.start_local()
+    try:
+        yield env.client
+    finally:
+        await env.shutdown()
+
+
+async def run_workflow_target(client: Client, documents: List[Dict[str, Any]], concurrency: int) -> List[Outcome]:
+    """Execute one MedicalCodingWorkflow per document, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def code(document: Dict[str, Any]) -> Outcome:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await client.execute_workflow(
+                    MedicalCodingWorkflow.run,
+                    document,
+                    id=f"load-{document['document_id']}-{uuid.uuid4().hex[:8]}",
+                    task_queue=TASK_QUEUE
+                )
+                return time.perf_counter() - start, result, None
+            except Exception as e:
+                return time.perf_counter() - start, None, str(e)
+
+    return await asyncio.gather(*(code(document) for document in documents))
+
+
+def run_flask_target(documents: List[Dict[str, Any]], concurrency: int, poll_interval: float, timeout: float) -> List[Outcome]:
+    """Submit each document through /api/process-document and poll its status until it finishes."""
+    import app as web
+
+    flask_client = web.app.test_client()
+
+    def code(document: Dict[str, Any]) -> Outcome:
+        start = time.perf_counter()
+        response = flask_client.post("/api/process-document", json=document)
+        if response.status_code != 200:
+            return time.perf_counter() - start, None, f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}"
+        workflow_id = response.get_json()["workflow_id"]
+        while time.perf_counter() - start < timeout:
+            status = flask_client.get(f"/api/workflow-status/{workflow_id}").get_json()
+            if status.get("status") == "completed":
+                return time.perf_counter() - start, status.get("result"), None
+            if status.get("status") == "error":
+                return time.perf_counter() - start, None, status.get("message")
+            time.sleep(poll_interval)
+        return time.perf_counter() - start, None, "timed out"
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(code, documents))
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(outcomes: List[Outcome], elapsed: float, server: FakeModelServer, rss_before: float) -> Dict[str, Any]:
+    latencies = sorted(latency for latency, result, error in outcomes if error is None)
+    results = [result for _, result, error in outcomes if error is None and result]
+    errors = [error for _, _, error in outcomes if error is not None]
+
+    def percentile(p: float):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+    totals = [result.get("cost_breakdown", {}).get("total", {}) for result in results]
+    return {
+        "documents": len(outcomes),
+        "completed": len(latencies),
+        "failed": len(errors),
+        "failure_rate": round(len(errors) / len(outcomes), 4) if outcomes else 0,
+        "sample_errors": errors[:3],
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "latency_seconds": {
+            "mean": round(statistics.mean(latencies), 3) if latencies else None,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": round(latencies[-1], 3) if latencies else None
+        },
+        "model_requests": {"served": server.requests_served, "failed": server.requests_failed},
+        "activity_retries": sum(total.get("retries", 0) for total in totals),
+        "tokens_per_document": round(statistics.mean(total.get("total_tokens", 0) for total in totals)) if totals else None,
+        "cost_per_document_usd": round(statistics.mean(total.get("cost_usd", 0) for total in totals), 6) if totals else None,
+        "worker_peak_rss_mb": round(peak_rss_mb(), 1),
+        "worker_rss_growth_mb": round(peak_rss_mb() - rss_before, 1)
+    }
+
+
+def print_summary(args, summary: Dict[str, Any]):
+    latency = summary["latency_seconds"]
+    print(f"🚚 Load test: {args.target} target, {args.mode} mode, concurrency {args.concurrency}")
+    print(f"   fake model latency {args.distribution} mean {args.latency * 1000:.0f} ms (spread {args.spread}), failure rate {args.failure_rate:.1%}")
+    print("=" * 60)
+    print(f"Documents:        {summary['completed']}/{summary['documents']} completed, {summary['failed']} failed")
+    print(f"Throughput:       {summary['docs_per_second']:.2f} docs/sec over {summary['elapsed_seconds']:.1f} s")
+    print(f"Latency (s):      p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"Model requests:   {summary['model_requests']['served']} served, {summary['model_requests']['failed']} injected failures, {summary['activity_retries']} activity retries")
+    print(f"Per document:     {summary['tokens_per_document']} tokens, ${summary['cost_per_document_usd']}")
+    print(f"Worker memory:    {summary['worker_peak_rss_mb']} MB peak RSS (+{summary['worker_rss_growth_mb']} MB during run)")
+    for error in summary["sample_errors"]:
+        print(f"   error: {error}")
+
+
+async def main(args) -> int:
+    rng = random.Random(args.seed)
+    documents = [synthetic_document(i, rng, args.pages, args.mode) for i in range(args.documents)]
+    sampler = latency_sampler(args.distribution, args.latency, args.spread, seed=args.seed)
+
+    suffix = " Notes: " + "x" * max(0, args.trailing_chars - 8) if args.trailing_chars else ""
+
+    with FakeModelServer(latency_seconds=sampler, failure_rate=args.failure_rate, seed=args.seed, response_suffix=suffix) as server:
+        model_client = ModelClient(
+            model="openai/fake-model",
+            max_concurrency=args.model_concurrency,
+            api_base=server.api_base,
+            api_key="fake",
+            stream_json=args.stream_json
+        )
+        set_model_client(model_client)
+
+        async with temporal_client(args.temporal_address) as client:
+            rss_before = peak_rss_mb()
+            async with create_worker(client, args.max_concurrent_activities):
+                start = time.perf_counter()
+                if args.target == "workflow":
+                    outcomes = await run_workflow_target(client, documents, args.concurrency)
+                else:
+                    # The web tier's dispatcher connects on its own, so point it at the same server
+                    os.environ["TEMPORAL_ADDRESS"] = client.service_client.config.target_host
+                    outcomes = await asyncio.to_thread(
+                        run_flask_target, documents, args.concurrency, args.poll_interval, args.timeout
+                    )
+                elapsed = time.perf_counter() - start
+        model_client.close()
+        summary = summarize(outcomes, elapsed, server, rss_before)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(args, summary)
+
+    regressions = []
+    if args.max_p95 is not None and (summary["latency_seconds"]["p95"] or 0) > args.max_p95:
+        regressions.append(f"p95 latency {summary['latency_seconds']['p95']} s > {args.max_p95} s")
+    if args.max_failure_rate is not None and summary["failure_rate"] > args.max_failure_rate:
+        regressions.append(f"failure rate {summary['failure_rate']:.2%} > {args.max_failure_rate:.2%}")
+    for regression in regressions:
+        print(f"❌ {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["workflow", "flask"], default="workflow")
+    parser.add_argument("--mode", choices=["standard", "fast"], default="standard")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=1, help="clinical note sections per document")
+    parser.add_argument("--concurrency", type=int, default=20, help="documents in flight at once")
+    parser.add_argument("--latency", type=float, default=0.3, help="mean injected latency per model call, in seconds")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--spread", type=float, default=0.0, help="uniform half-width, or lognormal sigma")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of model calls answered with HTTP 500")
+    parser.add_argument("--trailing-chars", type=int, default=0, help="commentary the fake model appends after its JSON")
+    parser.add_argument("--stream-json", action="store_true", help="stream completions and stop at the end of the JSON object")
+    parser.add_argument("--model-concurrency", type=int, default=32)
+    parser.add_argument("--max-concurrent-activities", type=int, default=100)
+    parser.add_argument("--temporal-address", help="existing Temporal server (default: start a local dev server)")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="status poll interval for the flask target")
+    parser.add_argument("--timeout", type=float, default=300, help="per-document timeout for the flask target")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--max-p95", type=float, help="fail if p95 latency exceeds this many seconds")
+    parser.add_argument("--max-failure-rate", type=float, help="fail if more than this fraction of documents fail")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("LiteLLM").setLevel(logging.WARNING)
+    sys.exit(asyncio.run(main(args)))
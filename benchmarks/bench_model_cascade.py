@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Model tier cascade
+Runs the standard pipeline (analysis, coding, validation) over synthetic notes
+against a local fake endpoint serving a fast small model and a slower large
+one: once with every step on the large model, once with the small model first
+and escalation to the large one. Routine follow-up notes get confident answers
+from the small model; the --complex-share of notes with a differential
+diagnosis get low-confidence ones and are escalated.
+
+Usage:
+    python -m benchmarks.bench_model_cascade --documents 200 --fast-latency 0.25 --strong-latency 1.0
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+# Use LiteLLM's bundled model cost map instead of fetching it over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+os.environ["RESULT_CACHE_BACKEND"] = "off"
+
+from benchmarks.bench_load import synthetic_document
+from benchmarks.fake_model_server import CANNED_RESPONSE, FakeModelServer
+from model_client import ModelClient, set_model_client
+from model_metrics import summarize_model_usage
+from model_tiers import ModelTier, TierPolicy, set_tier_policy
+from temporal_medical_coding_demo import (
+    analyze_medical_document_with_bedrock,
+    generate_icd10_codes_with_bedrock,
+    validate_coding_result
+)
+
+FAST_MODEL = "fast-model"
+STRONG_MODEL = "strong-model"
+
+# The small model is unsure of notes weighing a differential diagnosis
+UNSURE_RESPONSE = copy.deepcopy(CANNED_RESPONSE)
+for finding in UNSURE_RESPONSE["diagnoses"] + UNSURE_RESPONSE["analysis"]["diagnoses"]:
+    finding["confidence"] = 0.55
+
+
+class TieredModelServer(FakeModelServer):
+    """Fake endpoint whose small model answers complex notes with low confidence."""
+
+    def completion_content(self, request: Optional[Dict[str, Any]] = None) -> str:
+        request = request or {}
+        if request.get("model") == FAST_MODEL and "differential diagnosis" in json.dumps(request.get("messages", [])).lower():
+            return json.dumps(UNSURE_RESPONSE)
+        return super().completion_content(request)
+
+
+def documents(count: int, complex_share: float) -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+    notes = []
+    for i in range(count):
+        note = synthetic_document(i, rng, 1, "standard")
+        note["document_type"] = "follow_up"
+        if rng.random() < complex_share:
+            note["content"] += "Differential diagnosis:\nAtypical presentation, consider alternative causes.\n"
+        notes.append(note)
+    return notes
+
+
+async def process(document: Dict[str, Any]) -> Dict[str, Any]:
+    """One document through the standard pipeline; returns its latency and per-step model usage."""
+    started = time.perf_counter()
+    analysis = await analyze_medical_document_with_bedrock(document)
+    usages = [analysis.pop("model_usage")]
+    codes = await generate_icd10_codes_with_bedrock(analysis, document)
+    usages.append(codes.pop("model_usage"))
+    validation = await validate_coding_result(codes, document)
+    usages.append(validation.pop("model_usage"))
+    return {"seconds": time.perf_counter() - started, "usage": summarize_model_usage(usages)}
+
+
+async def run(server: FakeModelServer, policy: TierPolicy, notes: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    set_model_client(ModelClient(model=f"openai/{STRONG_MODEL}", max_concurrency=concurrency, api_base=server.api_base, api_key="fake"))
+    set_tier_policy(policy)
+    await process(notes[0])  # warm up the client before timing
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(document):
+        async with semaphore:
+            return await process(document)
+
+    return await asyncio.gather(*(bounded(document) for document in notes))
+
+
+def report(name: str, results: List[Dict[str, Any]], baseline: Optional[float] = None) -> float:
+    seconds = sorted(result["seconds"] for result in results)
+    p50 = seconds[len(seconds) // 2]
+    p95 = seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))]
+    versus = f"{p50 / baseline:>8.0%}" if baseline else f"{'':>8}"
+    print(f"{name:<10} {statistics.mean(seconds):>9.3f} {p50:>9.3f} {p95:>9.3f} {versus}")
+    return p50
+
+
+def tier_report(results: List[Dict[str, Any]]):
+    totals = summarize_model_usage(
+        {**entry, "step": step} for result in results for step, entry in result["usage"]["steps"].items()
+    )
+    print(f"{'step':<11} {'tier':<7} {'passes':>7} {'escalated':>10} {'rate':>7} {'mean s':>8}")
+    for step, entry in totals["steps"].items():
+        for tier, counts in entry["tiers"].items():
+            print(f"{step:<11} {tier:<7} {counts['attempts']:>7} {counts['escalations']:>10} "
+                  f"{counts['escalations'] / counts['attempts']:>7.1%} {counts['latency_seconds'] / counts['attempts']:>8.3f}")
+
+
+async def main(count: int, concurrency: int, fast_latency: float, strong_latency: float, complex_share: float):
+    logging.disable(logging.INFO)
+    notes = documents(count, complex_share)
+    server = TieredModelServer(model_latency={FAST_MODEL: fast_latency, STRONG_MODEL: strong_latency}).start()
+    try:
+        print("🪜 Model cascade benchmark")
+        print(f"   {count} follow-up notes ({sum('Differential' in n['content'] for n in notes)} with a differential diagnosis), "
+              f"concurrency {concurrency}, small model {fast_latency}s, large model {strong_latency}s per call")
+        print("=" * 60)
+        single = await run(server, TierPolicy([ModelTier("strong", f"openai/{STRONG_MODEL}")]), notes, concurrency)
+        cascade = await run(
+            server, TierPolicy([ModelTier("fast", f"openai/{FAST_MODEL}"), ModelTier("strong", f"openai/{STRONG_MODEL}")]),
+            notes, concurrency
+        )
+        print(f"{'policy':<10} {'mean s':>9} {'p50 s':>9} {'p95 s':>9} {'p50 vs':>8}")
+        baseline = report("large only", single)
+        report("cascade", cascade, baseline)
+        print()
+        tier_report(cascade)
+    finally:
+        server.stop()
+        set_tier_policy(None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--fast-latency", type=float, default=0.25, help="seconds per small-model call")
+    parser.add_argument("--strong-latency", type=float, default=1.0, help="seconds per large-model call")
+    parser.add_argument("--complex-share", type=float, default=0.1, help="share of notes the small model is unsure of")
+    args = parser.parse_args()
+    asyncio.run(main(args.documents, args.concurrency, args.fast_latency, args.strong_latency, args.complex_share))
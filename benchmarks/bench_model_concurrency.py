@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Documents/sec versus model-call concurrency
+Drives the four medical coding activities against a local fake model endpoint
+with injected latency, once per concurrency level.
+
+Usage:
+    python -m benchmarks.bench_model_concurrency --documents 64 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import List
+
+# Use LiteLLM's bundled model cost map instead of fetching it over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from benchmarks.fake_model_server import FakeModelServer
+from model_client import ModelClient, set_model_client
+from temporal_medical_coding_demo import (
+    analyze_medical_document_with_bedrock,
+    generate_icd10_codes_with_bedrock,
+    validate_coding_result,
+    generate_final_report
+)
+
+SAMPLE_CONTENT = (
+    "Follow-up visit for Type 2 diabetes mellitus. Patient reports improved blood glucose control. "
+    "Current medications: Metformin 500mg twice daily, Glipizide 5mg daily. Blood pressure: 140/90 mmHg. "
+    "A1C: 7.2%. Plan: Continue current medications, lifestyle modifications."
+)
+
+
+async def process_document(index: int) -> None:
+    """Run the same activity sequence as MedicalCodingWorkflow for one document."""
+    document = {
+        "document_id": f"BENCH-{index:06d}",
+        "content": SAMPLE_CONTENT,
+        "document_type": "follow_up",
+        "patient_id": f"PAT-{index:06d}"
+    }
+    analysis = await analyze_medical_document_with_bedrock(document)
+    codes = await generate_icd10_codes_with_bedrock(analysis, document)
+    validation = await validate_coding_result(codes, document)
+    await generate_final_report(document, analysis, codes, validation)
+
+
+async def run_level(server: FakeModelServer, concurrency: int, documents: int, mode: str) -> float:
+    client = ModelClient(
+        model="openai/fake-model",
+        max_concurrency=concurrency,
+        api_base=server.api_base,
+        api_key="fake",
+        mode=mode
+    )
+    set_model_client(client)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(process_document(i) for i in range(documents)))
+        return time.perf_counter() - start
+    finally:
+        client.close()
+        set_model_client(None)
+
+
+async def main(levels: List[int], documents: int, latency: float, mode: str):
+    print(f"📈 Model client concurrency benchmark ({mode} mode)")
+    print(f"   {documents} documents x 3 model calls, {latency * 1000:.0f} ms injected latency per call")
+    print("=" * 60)
+    print(f"{'concurrency':>12} {'elapsed (s)':>12} {'docs/sec':>10} {'speedup':>8}")
+
+    baseline = None
+    with FakeModelServer(latency_seconds=latency) as server:
+        # Warm up imports and the HTTP connection pool outside the timed runs
+        await run_level(server, 1, 1, mode)
+
+        for concurrency in levels:
+            elapsed = await run_level(server, concurrency, documents, mode)
+            throughput = documents / elapsed
+            baseline = baseline or throughput
+            print(f"{concurrency:>12} {elapsed:>12.2f} {throughput:>10.2f} {throughput / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.5, help="injected latency per model call, in seconds")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--mode", choices=["async", "executor"], default="async")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("LiteLLM").setLevel(logging.WARNING)
+    asyncio.run(main(args.levels, args.documents, args.latency, args.mode))
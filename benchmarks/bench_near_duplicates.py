@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Near-duplicate index at scale
+Grows a MinHash LSH index to --documents synthetic notes (the load test's
+notes with a random patient narrative) and, at each size checkpoint, times
+inserts (amortized, merges included) and queries. Queries are copy-forward
+variants of indexed notes (a few sentences rewritten), which should find their
+source, and notes never indexed. Finally saves and reloads the index.
+
+Usage:
+    python -m benchmarks.bench_near_duplicates --documents 1000000
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+from benchmarks.bench_load import synthetic_document
+from near_duplicates import REFERENCE_THRESHOLD, MinHashLSHIndex
+
+
+NARRATIVE_WORDS = (
+    "patient reports denies mild moderate severe intermittent persistent worsening improving pain swelling "
+    "fatigue nausea dizziness cough wheezing fever chills appetite sleep exercise walking stairs diet "
+    "adherence missed doses home readings morning evening after meals since last visit two three weeks "
+    "months ago daughter wife husband lives alone works retired smoker former alcohol occasional no "
+    "chest abdomen legs back knee shoulder left right bilateral ankle edema shortness breath orthopnea "
+    "palpitations headache vision numbness tingling feet hands glucose log blood pressure cuff pharmacy "
+    "refill insurance transport clinic emergency visit hospital discharge follow labs ordered reviewed"
+).split()
+
+
+def note(index: int, pages: int) -> str:
+    """A synthetic note with a patient-specific narrative, so notes are not near-identical by construction."""
+    rng = random.Random(index)
+    narrative = " ".join(
+        " ".join(rng.choice(NARRATIVE_WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        for _ in range(4 * pages)
+    )
+    return f"Narrative:\n{narrative}\n" + synthetic_document(index, rng, pages, "standard")["content"]
+
+
+def copy_forward(text: str, rng: random.Random) -> str:
+    """A later note copied from ``text``: new visit number and follow-up interval."""
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        if line.startswith("Visit "):
+            lines[i] = f"Visit {rng.randint(100, 999)}-0. " + line.split(". ", 1)[-1]
+        elif line.startswith("Continue current management"):
+            lines[i] = f"Continue current management, follow up in {rng.randint(13, 52)} weeks."
+    return "\n".join(lines)
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main(documents: int, checkpoints: List[int], queries: int, pages: int):
+    print("🪞 Near-duplicate index benchmark")
+    print(f"   synthetic {pages}-page notes with narrative, {queries} copy-forward + {queries} unseen queries per checkpoint, "
+          f"min similarity {REFERENCE_THRESHOLD}")
+    print("=" * 96)
+    print(f"{'notes':>9} {'insert µs':>10} {'insert p99':>11} {'query p50 µs':>13} {'query p99 µs':>13} "
+          f"{'recall':>7} {'unseen hits':>12} {'memory MB':>10}")
+
+    index = MinHashLSHIndex()
+    signature_seconds = []
+    insert_seconds: List[float] = []
+    rng = random.Random(0)
+    # Notes are regenerated from their number when queried, so none are kept in memory
+    for n in range(documents):
+        text = note(n, pages)
+        start = time.perf_counter()
+        signature = index.signature(text)
+        signature_seconds.append(time.perf_counter() - start)
+        blob_key = f"sha256:{hashlib.sha256(text.encode()).hexdigest()}"
+        start = time.perf_counter()
+        index.add(signature, f"wf-{n}", blob_key)
+        insert_seconds.append(time.perf_counter() - start)
+
+        if n + 1 not in checkpoints:
+            continue
+        sources = rng.sample(range(n + 1), min(queries, n + 1))
+        query_seconds, found, unseen_hits = [], 0, 0
+        for source in sources:
+            variant = copy_forward(note(source, pages), rng)
+            signature = index.signature(variant)
+            start = time.perf_counter()
+            matches = index.query(signature, REFERENCE_THRESHOLD)
+            query_seconds.append(time.perf_counter() - start)
+            found += any(match["workflow_id"] == f"wf-{source}" for match in matches)
+        for i in range(queries):
+            unseen = note(documents + 1 + i, pages)
+            signature = index.signature(unseen)
+            start = time.perf_counter()
+            matches = index.query(signature, REFERENCE_THRESHOLD)
+            query_seconds.append(time.perf_counter() - start)
+            unseen_hits += bool(matches)
+        print(f"{n + 1:>9,} {statistics.mean(insert_seconds) * 1e6:>10.1f} {percentile(insert_seconds, 0.99) * 1e6:>11.1f} "
+              f"{percentile(query_seconds, 0.5) * 1e6:>13.1f} {percentile(query_seconds, 0.99) * 1e6:>13.1f} "
+              f"{found / len(sources):>7.1%} {unseen_hits / queries:>12.1%} {index.stats()['memory_bytes'] / 1e6:>10.1f}")
+        insert_seconds = []
+
+    print(f"\n   signature: {statistics.mean(signature_seconds) * 1e6:.0f} µs per note (p99 {percentile(signature_seconds, 0.99) * 1e6:.0f} µs)")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "index.npz")
+        start = time.perf_counter()
+        index.save(path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = MinHashLSHIndex.load(path)
+        load_seconds = time.perf_counter() - start
+        print(f"   save {saved:.2f}s, load {load_seconds:.2f}s, {os.path.getsize(path) / 1e6:.0f} MB on disk, {len(loaded):,} notes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=500, help="queries of each kind per checkpoint")
+    parser.add_argument("--pages", type=int, default=1)
+    args = parser.parse_args()
+    checkpoints = sorted({size for size in (10000, 100000, args.documents) if size <= args.documents})
+    main(args.documents, checkpoints, args.queries, args.pages)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Urgent latency behind a bulk backlog
+Submits a bulk backlog of documents at once, then urgent documents at a steady
+interval while the backlog drains, and runs the model activities against the fake
+endpoint with a small model concurrency limit. Compares one shared FIFO queue
+for model calls with weighted priority lanes (PRIORITY_LANE_WEIGHTS),
+reporting urgent and bulk latency and the time to drain the whole backlog.
+
+Temporal task queues are not involved here: with lanes, each lane's workers
+have their own slots, so the model client's limiter is where lanes compete.
+
+Usage:
+    python -m benchmarks.bench_priority_lanes --bulk 60 --urgent 10 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+from typing import Any, Dict, Optional
+
+# Use LiteLLM's bundled model cost map instead of fetching it over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+# Every model call should reach the endpoint
+os.environ.setdefault("RESULT_CACHE_BACKEND", "off")
+
+from benchmarks.bench_load import synthetic_document
+from benchmarks.fake_model_server import FakeModelServer
+from model_client import ModelClient, call_priority, set_model_client
+from temporal_medical_coding_demo import (
+    analyze_medical_document_with_bedrock,
+    generate_icd10_codes_with_bedrock,
+    validate_coding_result
+)
+from workflow_contract import LANE_WEIGHTS
+
+
+async def code_document(document: Dict[str, Any], lane: Optional[str]) -> float:
+    start = time.perf_counter()
+    with call_priority(lane):
+        analysis = await analyze_medical_document_with_bedrock(document)
+        codes = await generate_icd10_codes_with_bedrock(analysis, document)
+        await validate_coding_result(codes, document)
+    return time.perf_counter() - start
+
+
+async def run_config(lanes: bool, bulk: int, urgent: int, interval: float) -> Dict[str, Any]:
+    start = time.perf_counter()
+    bulk_tasks = [
+        asyncio.create_task(code_document(synthetic_document(i, random.Random(i), 1, "standard"), "bulk" if lanes else None))
+        for i in range(bulk)
+    ]
+    urgent_tasks = []
+    for i in range(urgent):
+        await asyncio.sleep(interval)
+        document = {**synthetic_document(bulk + i, random.Random(bulk + i), 1, "standard"), "document_type": "emergency_note"}
+        urgent_tasks.append(asyncio.create_task(code_document(document, "urgent" if lanes else None)))
+    urgent_latencies = sorted(await asyncio.gather(*urgent_tasks))
+    bulk_latencies = sorted(await asyncio.gather(*bulk_tasks))
+    return {
+        "urgent_p50": statistics.median(urgent_latencies),
+        "urgent_max": urgent_latencies[-1],
+        "bulk_p50": statistics.median(bulk_latencies),
+        "drained": time.perf_counter() - start
+    }
+
+
+async def main(bulk: int, urgent: int, interval: float, latency: float, concurrency: int):
+    print("🚑 Priority lane benchmark")
+    print(f"   {bulk} bulk documents at once, then {urgent} urgent documents every {interval:g}s, "
+          f"3 model calls each, {latency * 1000:.0f} ms latency, {concurrency} concurrent calls")
+    print(f"   lane weights: {', '.join(f'{lane}={weight:g}' for lane, weight in LANE_WEIGHTS.items())}")
+    print("=" * 78)
+    print(f"{'model calls':>12} {'urgent p50 (s)':>15} {'urgent max (s)':>15} {'bulk p50 (s)':>13} {'drained (s)':>12}")
+
+    with FakeModelServer(latency_seconds=latency) as server:
+        for name, lanes in (("single FIFO", False), ("lanes", True)):
+            client = ModelClient(model="openai/fake-model", max_concurrency=concurrency, api_base=server.api_base, api_key="fake")
+            client.warm_up()
+            set_model_client(client)
+            try:
+                result = await run_config(lanes, bulk, urgent, interval)
+            finally:
+                client.close()
+                set_model_client(None)
+            print(f"{name:>12} {result['urgent_p50']:>15.2f} {result['urgent_max']:>15.2f} "
+                  f"{result['bulk_p50']:>13.2f} {result['drained']:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bulk", type=int, default=60, help="documents in the bulk backlog")
+    parser.add_argument("--urgent", type=int, default=10, help="urgent documents submitted while it drains")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between urgent documents")
+    parser.add_argument("--latency", type=float, default=0.3, help="injected latency per model call, in seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent model calls")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("LiteLLM").setLevel(logging.WARNING)
+    asyncio.run(main(args.bulk, args.urgent, args.interval, args.latency, args.concurrency))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Prompt token report
+Token counts of every model step's prompt for synthetic documents: the static
+prefix (sent as the cacheable system message) and the per-document payload.
+Then one pass of the model activities against the fake endpoint with prompt
+caching on, reporting prompt tokens served from the cache.
+
+Usage:
+    python -m benchmarks.bench_prompts --pages 1 3 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+from typing import Callable
+
+# Use LiteLLM's bundled model cost map instead of fetching it over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+os.environ.setdefault("RESULT_CACHE_BACKEND", "off")
+
+from benchmarks.bench_load import synthetic_document
+from benchmarks.fake_model_server import CANNED_RESPONSE, FakeModelServer
+from model_client import DEFAULT_MODEL, ModelClient, set_model_client
+from model_metrics import get_model_metrics
+from prompts import analysis_prompt, coding_prompt, fast_coding_prompt, validation_prompt
+from temporal_medical_coding_demo import (
+    analyze_medical_document_with_bedrock,
+    generate_icd10_codes_with_bedrock,
+    validate_coding_result
+)
+
+# Anthropic models cache a prefix only from this many tokens (2048 for Haiku)
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    try:
+        import litellm
+        litellm.token_counter(model=model, text="warm up")
+        return lambda text: litellm.token_counter(model=model, text=text)
+    except Exception:
+        return lambda text: len(text) // 4
+
+
+def prompt_report(pages_list, model: str):
+    count = token_counter(model)
+    analysis = {key: CANNED_RESPONSE[key] for key in ("diagnoses", "procedures", "medications", "vital_signs")}
+    codes = {key: CANNED_RESPONSE[key] for key in ("diagnosis_codes", "procedure_codes")}
+
+    print(f"{'pages':>5} {'step':>11} {'static':>7} {'payload':>8} {'total':>6} {'static %':>9}")
+    for pages in pages_list:
+        document = synthetic_document(0, random.Random(pages), pages, "standard")
+        builders = {
+            "analysis": lambda: analysis_prompt(document),
+            "coding": lambda: coding_prompt(analysis),
+            "validation": lambda: validation_prompt(codes),
+            "extraction": lambda: fast_coding_prompt(document),
+        }
+        for step, build in builders.items():
+            static, payload = build()
+            static_tokens, payload_tokens = count(static), count(payload)
+            total = static_tokens + payload_tokens
+            print(f"{pages:>5} {step:>11} {static_tokens:>7} {payload_tokens:>8} {total:>6} {static_tokens / total:>8.0%}")
+    print(f"   Prefixes below {MIN_CACHEABLE_TOKENS} tokens are not cached by Anthropic models; providers with automatic")
+    print("   prefix caching still reuse them, and they are identical across documents either way.")
+
+
+async def cache_pass(documents: int):
+    with FakeModelServer(latency_seconds=0.01) as server:
+        client = ModelClient(model="openai/fake-model", api_base=server.api_base, api_key="fake", prompt_caching="on")
+        set_model_client(client)
+        try:
+            for index in range(documents):
+                document = synthetic_document(index, random.Random(index), 1, "standard")
+                analysis = await analyze_medical_document_with_bedrock(document)
+                codes = await generate_icd10_codes_with_bedrock(analysis, document)
+                await validate_coding_result(codes, document)
+        finally:
+            client.close()
+            set_model_client(None)
+
+    total = get_model_metrics().stats()["total"]
+    print(f"{documents} documents x 3 calls with prompt caching: {total['prompt_tokens']} prompt tokens, "
+          f"{total['cached_prompt_tokens']} from cache ({total['cached_prompt_tokens'] / max(total['prompt_tokens'], 1):.0%}), "
+          f"${total['cost_usd']:.4f} estimated")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 3, 10], help="synthetic document lengths to report")
+    parser.add_argument("--model", default=os.getenv("BEDROCK_MODEL_ID", DEFAULT_MODEL), help="model whose tokenizer counts the prompts")
+    parser.add_argument("--documents", type=int, default=20, help="documents in the prompt caching pass")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("LiteLLM").setLevel(logging.WARNING)
+    print("🧾 Prompt token report")
+    print("=" * 60)
+    prompt_report(args.pages, args.model)
+    print()
+    asyncio.run(cache_pass(args.documents))
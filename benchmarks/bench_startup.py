@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Cold start of the web and worker entry points
+Times each entry point from a fresh interpreter to ready, over several runs:
+the web tier up to its first served request, and the worker up to a warmed
+model client (the point where it would start polling Temporal). It also
+reports peak memory and which heavy modules each entry point loaded.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Each probe runs in its own interpreter and prints one JSON line
+PROBES = {
+    "web": """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/')
+ready = time.perf_counter()
+""",
+    "worker": """
+import time
+start = time.perf_counter()
+import temporal_medical_coding_demo
+imported = time.perf_counter()
+temporal_medical_coding_demo.get_model_client().warm_up()
+ready = time.perf_counter()
+""",
+}
+
+REPORT = """
+import json, resource, sys
+heavy = ("litellm", "numpy", "temporalio.worker", "temporal_medical_coding_demo", "flask")
+print(json.dumps({
+    "import": imported - start,
+    "ready": ready - start,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in heavy if name in sys.modules]
+}))
+"""
+
+
+def run_probe(name: str) -> dict:
+    env = {**os.environ, "LITELLM_LOCAL_MODEL_COST_MAP": "True", "PYTHONDONTWRITEBYTECODE": "1"}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBES[name] + REPORT],
+        capture_output=True, text=True, env=env, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int):
+    print("🧊 Cold start benchmark")
+    print(f"   {runs} fresh interpreters per entry point")
+    print("=" * 78)
+    print(f"{'entry point':>12} {'import (s)':>11} {'ready (s)':>10} {'max RSS (MB)':>13}  loaded")
+    for name in PROBES:
+        results = [run_probe(name) for _ in range(runs)]
+        print(f"{name:>12} {statistics.median(r['import'] for r in results):>11.2f} "
+              f"{statistics.median(r['ready'] for r in results):>10.2f} "
+              f"{statistics.median(r['max_rss_mb'] for r in results):>13.0f}  {', '.join(results[-1]['loaded'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(args.runs)
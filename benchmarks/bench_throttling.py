@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Throughput under provider throttling
+Drives the model activities against a fake endpoint that rejects requests above
+a per-second quota with 429s, comparing a fixed concurrency limit against the
+adaptive limiter with jittered retries, and optionally client-side pacing.
+
+Activity failures are retried the way Temporal would: up to three attempts,
+honouring a non-retryable error or an explicit next retry delay.
+
+Usage:
+    python -m benchmarks.bench_throttling --documents 40 --qps 20 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+# Use LiteLLM's bundled model cost map instead of fetching it over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+# Every document is identical; the result cache would hide the model calls
+os.environ.setdefault("RESULT_CACHE_BACKEND", "off")
+
+from temporalio.exceptions import ApplicationError
+
+from benchmarks.fake_model_server import FakeModelServer
+from model_client import ModelClient, set_model_client
+from temporal_medical_coding_demo import (
+    analyze_medical_document_with_bedrock,
+    generate_icd10_codes_with_bedrock,
+    validate_coding_result
+)
+
+SAMPLE_CONTENT = (
+    "Follow-up visit for Type 2 diabetes mellitus. Patient reports improved blood glucose control. "
+    "Current medications: Metformin 500mg twice daily, Glipizide 5mg daily. Blood pressure: 140/90 mmHg. "
+    "A1C: 7.2%. Plan: Continue current medications, lifestyle modifications."
+)
+
+# Temporal's default retry policy as configured by the workflows: 1 s, then doubling
+ACTIVITY_MAX_ATTEMPTS = 3
+ACTIVITY_INITIAL_INTERVAL = 1.0
+
+
+async def run_activity(fn, *args, stats: Dict[str, int]):
+    for attempt in range(1, ACTIVITY_MAX_ATTEMPTS + 1):
+        try:
+            return await fn(*args)
+        except Exception as e:
+            if attempt == ACTIVITY_MAX_ATTEMPTS or (isinstance(e, ApplicationError) and e.non_retryable):
+                raise
+            delay = ACTIVITY_INITIAL_INTERVAL * 2 ** (attempt - 1)
+            if isinstance(e, ApplicationError) and e.next_retry_delay is not None:
+                delay = e.next_retry_delay.total_seconds()
+            stats["activity_retries"] += 1
+            await asyncio.sleep(delay)
+
+
+async def process_document(index: int, stats: Dict[str, int], latencies: List[float]):
+    document = {
+        "document_id": f"THROTTLE-{index:06d}",
+        "content": SAMPLE_CONTENT,
+        "document_type": "follow_up",
+        "patient_id": f"PAT-{index:06d}"
+    }
+    start = time.perf_counter()
+    try:
+        analysis = await run_activity(analyze_medical_document_with_bedrock, document, stats=stats)
+        codes = await run_activity(generate_icd10_codes_with_bedrock, analysis, document, stats=stats)
+        await run_activity(validate_coding_result, codes, document, stats=stats)
+    except Exception:
+        stats["failed"] += 1
+        return
+    stats["completed"] += 1
+    latencies.append(time.perf_counter() - start)
+
+
+async def run_config(name: str, documents: int, latency: float, qps: float, concurrency: int, **client_options) -> Dict[str, Any]:
+    stats = {"completed": 0, "failed": 0, "activity_retries": 0}
+    latencies: List[float] = []
+    with FakeModelServer(latency_seconds=latency, max_qps=qps) as server:
+        client = ModelClient(
+            model="openai/fake-model",
+            max_concurrency=concurrency,
+            api_base=server.api_base,
+            api_key="fake",
+            **client_options
+        )
+        set_model_client(client)
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(*(process_document(i, stats, latencies) for i in range(documents)))
+            elapsed = time.perf_counter() - start
+        finally:
+            client.close()
+            set_model_client(None)
+
+    latencies.sort()
+    return {
+        "name": name,
+        "elapsed": elapsed,
+        "throughput": stats["completed"] / elapsed,
+        "throttled": server.requests_throttled,
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+        "final_limit": client.limiter.stats()["limit"],
+        **stats
+    }
+
+
+async def main(documents: int, latency: float, qps: float, concurrency: int):
+    print("🚦 Throttling benchmark")
+    print(f"   {documents} documents x 3 model calls, {latency * 1000:.0f} ms latency, "
+          f"endpoint quota {qps:g} requests/sec, max {concurrency} concurrent calls")
+    print("=" * 96)
+    print(f"{'config':>14} {'done':>5} {'failed':>6} {'elapsed (s)':>11} {'docs/sec':>9} "
+          f"{'429s':>6} {'act retries':>11} {'p95 (s)':>8} {'limit':>6}")
+
+    configs = [
+        ("fixed", {"adaptive": False, "throttle_retries": 0}),
+        ("adaptive", {"adaptive": True}),
+        ("adaptive+qps", {"adaptive": True, "max_qps": qps * 0.9}),
+    ]
+    for name, options in configs:
+        result = await run_config(name, documents, latency, qps, concurrency, **options)
+        p95 = f"{result['p95']:.2f}" if result["p95"] is not None else "-"
+        print(f"{name:>14} {result['completed']:>5} {result['failed']:>6} {result['elapsed']:>11.2f} "
+              f"{result['throughput']:>9.2f} {result['throttled']:>6} {result['activity_retries']:>11} "
+              f"{p95:>8} {result['final_limit']:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="injected latency per model call, in seconds")
+    parser.add_argument("--qps", type=float, default=20, help="requests/sec the fake endpoint accepts before returning 429")
+    parser.add_argument("--concurrency", type=int, default=32, help="starting (and maximum) concurrent model calls")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    logging.getLogger("LiteLLM").setLevel(logging.CRITICAL)
+    # The 429s are expected here; keep litellm from printing a help banner for each
+    import litellm
+    litellm.suppress_debug_info = True
+    asyncio.run(main(args.documents, args.latency, args.qps, args.concurrency))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Sequential vs dependency-graph workflow schedule
+Runs the real activities of each workflow mode against the fake model endpoint
+in two schedules: one step after another (executions started before the
+"parallel-checks" patch) and the dependency graph the workflow now uses, where
+the rule checks run alongside AI validation. Reports per-document latency.
+
+Every step first waits ``--task-overhead`` seconds, standing in for the workflow
+task round trip Temporal needs before it can schedule the next step.
+
+Usage:
+    python -m benchmarks.bench_workflow_graph --documents 20 --latency 0.3 --task-overhead 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+# Use LiteLLM's bundled model cost map instead of fetching it over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+# Both schedules code the same documents; the result cache would hide the second run
+os.environ.setdefault("RESULT_CACHE_BACKEND", "off")
+
+from benchmarks.bench_load import synthetic_document
+from benchmarks.fake_model_server import FakeModelServer
+from model_client import ModelClient, set_model_client
+from temporal_medical_coding_demo import (
+    analyze_medical_document_with_bedrock,
+    check_codes_with_rules,
+    extract_and_code_with_bedrock,
+    generate_final_report,
+    generate_icd10_codes_with_bedrock,
+    merge_validation,
+    validate_coding_result
+)
+
+
+async def run_graph(nodes: Dict[str, Callable[..., Awaitable[Any]]]) -> Dict[str, Any]:
+    """Same scheduling as MedicalCodingWorkflow._run_graph."""
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def get(name: str) -> Any:
+        return await tasks[name]
+
+    for name, node in nodes.items():
+        tasks[name] = asyncio.create_task(node(get))
+    await asyncio.gather(*tasks.values())
+    return {name: task.result() for name, task in tasks.items()}
+
+
+def workflow_nodes(document: Dict[str, Any], parallel: bool, overhead: float) -> Dict[str, Callable[..., Awaitable[Any]]]:
+    async def step(fn, *args):
+        await asyncio.sleep(overhead)
+        return await fn(*args)
+
+    async def rules(get):
+        return await step(check_codes_with_rules, (await get("extraction"))["codes"])
+
+    async def validate(get):
+        if not parallel:
+            await get("rules")
+        return await step(validate_coding_result, (await get("extraction"))["codes"], document)
+
+    async def report(get):
+        extraction = await get("extraction")
+        validation = merge_validation(await get("validation"), await get("rules"))
+        return await step(generate_final_report, document, extraction["analysis"], extraction["codes"], validation)
+
+    if document["mode"] == "fast":
+        async def extract(get):
+            return await step(extract_and_code_with_bedrock, document)
+    else:
+        async def extract(get):
+            analysis = await step(analyze_medical_document_with_bedrock, document)
+            codes = await step(generate_icd10_codes_with_bedrock, analysis, document)
+            return {"analysis": analysis, "codes": codes}
+
+    return {"extraction": extract, "rules": rules, "validation": validate, "report": report}
+
+
+async def run_schedule(documents: List[Dict[str, Any]], parallel: bool, overhead: float) -> List[float]:
+    async def code(document: Dict[str, Any]) -> float:
+        start = time.perf_counter()
+        await run_graph(workflow_nodes(document, parallel, overhead))
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(code(document) for document in documents)))
+
+
+async def main(documents: int, latency: float, overhead: float, rounds: int):
+    print("🕸️  Workflow schedule benchmark")
+    print(f"   {documents} documents per mode x {rounds} rounds, {latency * 1000:.0f} ms per model call, "
+          f"{overhead * 1000:.0f} ms scheduling overhead per step")
+    print("=" * 78)
+    print(f"{'mode':>9} {'schedule':>11} {'p50 (s)':>8} {'p95 (s)':>8} {'mean (s)':>9} {'saved':>7}")
+
+    with FakeModelServer(latency_seconds=latency) as server:
+        client = ModelClient(model="openai/fake-model", api_base=server.api_base, api_key="fake")
+        client.warm_up()
+        set_model_client(client)
+        try:
+            for mode in ("standard", "fast"):
+                # Fast mode validates low-confidence codes; force that path so both schedules compare it
+                batch = [
+                    {**synthetic_document(i, random.Random(i), 1, mode), "validation_threshold": 1.01}
+                    for i in range(documents)
+                ]
+                # Untimed pass so neither schedule pays for the client's connection and thread start-up
+                await run_schedule(batch, True, overhead)
+                latencies: Dict[str, List[float]] = {"sequential": [], "graph": []}
+                for _ in range(rounds):
+                    for name, parallel in (("sequential", False), ("graph", True)):
+                        latencies[name] += await run_schedule(batch, parallel, overhead)
+                for name, values in latencies.items():
+                    values.sort()
+                    saved = "-" if name == "sequential" else f"{1 - statistics.mean(values) / statistics.mean(latencies['sequential']):.0%}"
+                    print(f"{mode:>9} {name:>11} {statistics.median(values):>8.3f} "
+                          f"{values[min(len(values) - 1, int(0.95 * len(values)))]:>8.3f} "
+                          f"{statistics.mean(values):>9.3f} {saved:>7}")
+        finally:
+            client.close()
+            set_model_client(None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="injected latency per model call, in seconds")
+    parser.add_argument("--rounds", type=int, default=3, help="alternating rounds of both schedules")
+    parser.add_argument("--task-overhead", type=float, default=0.05,
+                        help="seconds each step waits before it starts, standing in for the workflow task round trip")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("LiteLLM").setLevel(logging.WARNING)
+    asyncio.run(main(args.documents, args.latency, args.task_overhead, args.rounds))
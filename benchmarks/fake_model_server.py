@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Fake Model Endpoint - Local OpenAI-compatible server for benchmarks
+Returns canned medical-coding JSON after an injected latency, so the real
+activities and model client can be exercised without calling Amazon Bedrock.
+Latency can follow a distribution and a fraction of requests can fail.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Union
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+# One canned payload carrying the keys every activity looks for.
+CANNED_RESPONSE: Dict[str, Any] = {
+    "diagnoses": [
+        {"condition": "Type 2 diabetes mellitus", "confidence": 0.93, "evidence": "Follow-up visit for Type 2 diabetes mellitus", "severity": "moderate"},
+        {"condition": "Essential hypertension", "confidence": 0.88, "evidence": "Blood pressure: 140/90 mmHg", "severity": "mild"}
+    ],
+    "procedures": [
+        {"procedure": "Hemoglobin A1C test", "confidence": 0.85, "evidence": "A1C: 7.2%", "type": "diagnostic"}
+    ],
+    "medications": [
+        {"medication": "Metformin", "dosage": "500mg twice daily", "indication": "diabetes"},
+        {"medication": "Glipizide", "dosage": "5mg daily", "indication": "diabetes"}
+    ],
+    "vital_signs": {
+        "blood_pressure": "140/90 mmHg",
+        "heart_rate": "",
+        "temperature": "",
+        "oxygen_saturation": ""
+    },
+    "diagnosis_codes": [
+        {"code": "E11.9", "description": "Type 2 diabetes mellitus without complications", "confidence": 0.93, "evidence": "Type 2 diabetes mellitus", "primary": True, "category": "Endocrine"},
+        {"code": "I10", "description": "Essential (primary) hypertension", "confidence": 0.88, "evidence": "Blood pressure: 140/90 mmHg", "primary": False, "category": "Circulatory"}
+    ],
+    "procedure_codes": [],
+    "is_valid": True,
+    "confidence_score": 0.9,
+    "compliance_score": 95,
+    "validation_checks_passed": 4,
+    "errors": [],
+    "warnings": [],
+    "recommendations": ["Document hypertension stage"],
+    "analysis_summary": {
+        "total_diagnoses": 2,
+        "total_procedures": 1,
+        "medications_found": 2,
+        "vital_signs_captured": 1
+    },
+    "quality_metrics": {
+        "code_accuracy": 95.0,
+        "completeness_score": 85.0,
+        "compliance_score": 95.0,
+        "processing_efficiency": 0.8
+    },
+    "requires_review": False
+}
+
+# Fast mode asks for findings and codes nested under "analysis" and "codes"
+CANNED_RESPONSE["analysis"] = {
+    key: CANNED_RESPONSE[key] for key in ("diagnoses", "procedures", "medications", "vital_signs")
+}
+CANNED_RESPONSE["codes"] = {
+    key: CANNED_RESPONSE[key] for key in ("diagnosis_codes", "procedure_codes")
+}
+
+
+def latency_sampler(distribution: str = "fixed", mean: float = 0.5, spread: float = 0.0, seed: Optional[int] = None) -> Callable[[], float]:
+    """Callable returning one injected latency in seconds.
+
+    ``uniform`` draws from mean +/- spread; ``lognormal`` has the given mean and a
+    long right tail controlled by spread (the sigma of the underlying normal).
+    """
+    rng = random.Random(seed)
+    if distribution == "fixed" or mean <= 0:
+        return lambda: mean
+    if distribution == "uniform":
+        return lambda: max(0.0, rng.uniform(mean - spread, mean + spread))
+    if distribution == "lognormal":
+        mu = math.log(mean) - spread * spread / 2
+        return lambda: rng.lognormvariate(mu, spread)
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+class FakeModelServer:
+    """OpenAI-compatible ``/v1/chat/completions`` endpoint running on a background thread.
+
+    ``latency_seconds`` is a fixed delay or a callable sampling one (see
+    ``latency_sampler``), and ``model_latency`` overrides it per requested model
+    (to stand in for a small and a large model); ``failure_rate`` of requests get ``failure_status`` instead.
+    Above ``max_qps`` requests in the trailing second, requests are rejected at once
+    with HTTP 429, like Bedrock's ThrottlingException.
+    ``response_suffix`` is appended after the JSON, like a model's closing remarks.
+    System prompt blocks marked with ``cache_control`` are remembered, and later
+    requests repeating one report its tokens as cached, like provider prompt caching.
+    Streaming requests get the content as server-sent events, with the latency
+    spread over the chunks.
+    """
+
+    STREAM_CHUNK_CHARS = 64
+    TIME_TO_FIRST_TOKEN = 0.2
+
+    def __init__(
+        self,
+        latency_seconds: Union[float, Callable[[], float]] = 0.5,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        failure_rate: float = 0.0,
+        failure_status: int = 500,
+        seed: Optional[int] = None,
+        response_suffix: str = "",
+        max_qps: float = 0.0,
+        model_latency: Optional[Dict[str, Union[float, Callable[[], float]]]] = None
+    ):
+        self.latency_seconds = latency_seconds
+        self.model_latency = model_latency or {}
+        self.response_suffix = response_suffix
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.requests_served = 0
+        self.requests_failed = 0
+        self.requests_throttled = 0
+        self.max_qps = max_qps
+        self._recent = deque()
+        self._cached_prefixes = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+
+                if server.throttled():
+                    body = json.dumps({"error": {
+                        "message": "Rate limit exceeded: too many requests, please slow down",
+                        "type": "rate_limit_error"
+                    }}).encode()
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                latency = server.model_latency.get(request.get("model", ""), server.latency_seconds)
+                latency = latency() if callable(latency) else latency
+                streaming = bool(request.get("stream"))
+                time.sleep(latency * server.TIME_TO_FIRST_TOKEN if streaming else latency)
+                with server._lock:
+                    failed = server._rng.random() < server.failure_rate
+                    if failed:
+                        server.requests_failed += 1
+                    else:
+                        server.requests_served += 1
+
+                if failed:
+                    body = json.dumps({"error": {"message": "Injected failure", "type": "server_error"}}).encode()
+                    self.send_response(server.failure_status)
+                elif streaming:
+                    self.stream_completion(request, latency * (1 - server.TIME_TO_FIRST_TOKEN))
+                    return
+                else:
+                    body = json.dumps(server.completion_body(request)).encode()
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def stream_completion(self, request: Dict[str, Any], remaining_latency: float):
+                content = server.completion_content(request)
+                pieces = [content[i:i + server.STREAM_CHUNK_CHARS] for i in range(0, len(content), server.STREAM_CHUNK_CHARS)]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                try:
+                    for piece in pieces:
+                        chunk = {
+                            "id": completion_id,
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": request.get("model", "fake-model"),
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                        time.sleep(remaining_latency / len(pieces))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading once it had what it needed
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def throttled(self) -> bool:
+        """Count this request against the trailing one-second window; True when over max_qps."""
+        if self.max_qps <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] <= now - 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_qps:
+                self.requests_throttled += 1
+                return True
+            self._recent.append(now)
+            return False
+
+    def completion_content(self, request: Optional[Dict[str, Any]] = None) -> str:
+        return json.dumps(CANNED_RESPONSE) + self.response_suffix
+
+    def cached_tokens(self, request: Dict[str, Any]) -> int:
+        """Tokens of cache-marked system blocks already seen; marks new ones as cached."""
+        cached = 0
+        for message in request.get("messages", []):
+            blocks = message.get("content")
+            if message.get("role") != "system" or not isinstance(blocks, list):
+                continue
+            for block in blocks:
+                if isinstance(block, dict) and block.get("cache_control"):
+                    text = block.get("text", "")
+                    with self._lock:
+                        if text in self._cached_prefixes:
+                            cached += len(text) // 4
+                        self._cached_prefixes.add(text)
+        return cached
+
+    def completion_body(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        content = self.completion_content(request)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": sum(len(str(m.get("content", ""))) // 4 for m in request.get("messages", [])),
+                "completion_tokens": len(content) // 4,
+                "total_tokens": 0,
+                "prompt_tokens_details": {"cached_tokens": self.cached_tokens(request)}
+            }
+        }
+
+    def start(self) -> "FakeModelServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
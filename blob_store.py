@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Document Blob Store
+Content-addressed storage for document text (claim check): the web tier stores
+each note once and workflows pass a small reference that activities resolve on
+demand through a per-process read cache
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MB = 64
+
+# Texts shorter than this are stored uncompressed; zlib gains little on them
+COMPRESS_MIN_BYTES = 512
+
+class BlobNotFound(KeyError):
+    """A referenced blob is not in this host's store."""
+
+# ============================================================================
+# BLOB BACKENDS
+# ============================================================================
+
+class BlobBackend:
+    """Storage interface for immutable blobs keyed by their content hash."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes):
+        """Store ``data`` under ``key``; a key that already exists is left as is."""
+        raise NotImplementedError
+
+
+class MemoryBlobBackend(BlobBackend):
+    """Blobs held in this process only (development and benchmarks)."""
+
+    def __init__(self):
+        self._blobs: Dict[str, bytes] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._blobs.get(key)
+
+    def put(self, key: str, data: bytes):
+        self._blobs.setdefault(key, data)
+
+
+class FileBlobBackend(BlobBackend):
+    """One file per blob under ``root``, sharded by the first two hex digits of the hash."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = key.split(":", 1)[-1]
+        return os.path.join(self.root, digest[:2], digest)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class SQLiteBlobBackend(BlobBackend):
+    """SQLite table of blobs shared by every process on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " key TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute("SELECT data FROM blobs WHERE key = ?", (key,)).fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    def put(self, key: str, data: bytes):
+        self._connection().execute(
+            "INSERT OR IGNORE INTO blobs (key, data, created_at) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(data), time.time())
+        )
+
+# ============================================================================
+# BLOB STORE
+# ============================================================================
+
+class BlobStore:
+    """Stores texts under the SHA-256 of their UTF-8 bytes and reads them back through an LRU cache.
+
+    Each stored blob starts with a one-byte marker, ``z`` for zlib-compressed or
+    ``r`` for raw, so stores written with different compression settings stay
+    readable. The read cache holds decoded texts up to ``cache_bytes``.
+    """
+
+    def __init__(self, backend: BlobBackend, compression: str = "zlib", cache_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024):
+        self.backend = backend
+        self.compression = compression
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"puts": 0, "stored_bytes": 0, "raw_bytes": 0, "cache_hits": 0, "cache_misses": 0}
+
+    @staticmethod
+    def make_key(raw: bytes) -> str:
+        return f"sha256:{hashlib.sha256(raw).hexdigest()}"
+
+    def put_text(self, text: str) -> Dict[str, Any]:
+        """Store a text and return its reference: blob key, characters and bytes."""
+        raw = text.encode("utf-8")
+        key = self.make_key(raw)
+        data = b"r" + raw
+        if self.compression == "zlib" and len(raw) >= COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(raw, 6)
+            if len(compressed) < len(raw):
+                data = b"z" + compressed
+        self.backend.put(key, data)
+        with self._lock:
+            self._counters["puts"] += 1
+            self._counters["raw_bytes"] += len(raw)
+            self._counters["stored_bytes"] += len(data)
+        self._remember(key, text, len(raw))
+        return {"blob": key, "chars": len(text), "bytes": len(raw)}
+
+    def get_text(self, key: str) -> str:
+        """The text stored under ``key``; raises BlobNotFound when this host's store lacks it."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self._counters["cache_hits"] += 1
+                return entry[0]
+            self._counters["cache_misses"] += 1
+        data = self.backend.get(key)
+        if data is None:
+            raise BlobNotFound(key)
+        raw = zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]
+        text = raw.decode("utf-8")
+        self._remember(key, text, len(raw))
+        return text
+
+    def _remember(self, key: str, text: str, size: int):
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return
+            self._cache[key] = (text, size)
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted_size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["cache_hits"] + self._counters["cache_misses"]
+            return {
+                **self._counters,
+                "compression_ratio": round(self._counters["stored_bytes"] / self._counters["raw_bytes"], 3) if self._counters["raw_bytes"] else None,
+                "cache_entries": len(self._cache),
+                "cache_bytes": self._cached_bytes,
+                "cache_hit_rate": self._counters["cache_hits"] / lookups if lookups else 0.0
+            }
+
+# ============================================================================
+# DOCUMENT REFERENCES
+# ============================================================================
+
+def offload_content(document: Dict[str, Any], store: BlobStore) -> Dict[str, Any]:
+    """Copy of a document with its content replaced by a ``content_ref`` into the store."""
+    offloaded = {key: value for key, value in document.items() if key != "content"}
+    offloaded["content_ref"] = store.put_text(document.get("content", ""))
+    return offloaded
+
+def resolve_content(document: Dict[str, Any]) -> Dict[str, Any]:
+    """A document with ``content`` filled in from its ``content_ref`` (documents with content pass through).
+
+    Chunks of an offloaded document reference the whole note plus the
+    ``content_span`` they cover, so every chunk reads the same cached blob.
+    """
+    if "content" in document or "content_ref" not in document:
+        return document
+    store = get_blob_store()
+    if store is None:
+        raise BlobNotFound(f"{document['content_ref']['blob']} (BLOB_STORE_BACKEND is off on this worker)")
+    content = store.get_text(document["content_ref"]["blob"])
+    span = document.get("content_span")
+    if span:
+        content = content[span[0]:span[1]]
+    return {**document, "content": content}
+
+
+_store: Optional[BlobStore] = None
+_store_configured = False
+_store_lock = threading.Lock()
+
+def get_blob_store() -> Optional[BlobStore]:
+    """Return the process-wide blob store configured from the environment, or None if disabled.
+
+    BLOB_STORE_BACKEND selects ``off`` (default), ``file`` or ``sqlite``;
+    BLOB_STORE_PATH, BLOB_STORE_COMPRESSION (``zlib`` or ``none``) and
+    BLOB_CACHE_MB tune it. The web tier and the workers must see the same store.
+    """
+    global _store, _store_configured
+    with _store_lock:
+        if _store_configured:
+            return _store
+
+        backend_name = os.getenv("BLOB_STORE_BACKEND", "off").lower()
+        compression = os.getenv("BLOB_STORE_COMPRESSION", "zlib").lower()
+        cache_bytes = int(float(os.getenv("BLOB_CACHE_MB", DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+        if backend_name == "file":
+            path = os.getenv("BLOB_STORE_PATH", "medical_coding_blobs")
+            _store = BlobStore(FileBlobBackend(path), compression, cache_bytes)
+            logger.info(f"📦 Blob store: files under {path} ({compression})")
+        elif backend_name == "sqlite":
+            path = os.getenv("BLOB_STORE_PATH", "medical_coding_blobs.db")
+            _store = BlobStore(SQLiteBlobBackend(path), compression, cache_bytes)
+            logger.info(f"📦 Blob store: SQLite at {path} ({compression})")
+        else:
+            _store = None
+
+        _store_configured = True
+        return _store
+
+def set_blob_store(store: Optional[BlobStore]):
+    """Replace the process-wide blob store (used by benchmarks and tooling)."""
+    global _store, _store_configured
+    with _store_lock:
+        _store = store
+        _store_configured = True
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Deterministic Clinical Extraction
+Vital signs, dosed medications and lab values written in regular formats
+("Blood pressure: 140/90 mmHg", "Metformin 500mg twice daily", "A1C: 7.2%")
+pulled out with two compiled scans, so the model only handles findings that
+need reasoning
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+LOCAL_EXTRACTION = os.getenv("LOCAL_EXTRACTION", "true").lower() in ("1", "true", "yes")
+
+# ============================================================================
+# PATTERNS
+# ============================================================================
+
+# Patterns run over ASCII-lowercased text (same offsets as the original), which
+# is several times faster than case-insensitive matching
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+_LINK = r"\s*(?:[:=]|\bof\b|\bwas\b|\bis\b)?\s*"
+
+VITAL_PATTERNS = {
+    "blood_pressure": rf"(?:blood\s+pressure|b/?p){_LINK}(?P<bp_sys>\d{{2,3}})\s*/\s*(?P<bp_dia>\d{{2,3}})(?:\s*mm\s*hg)?",
+    "heart_rate": rf"(?:heart\s+rate|pulse(?:\s+rate)?|hr){_LINK}(?P<hr>\d{{2,3}})(?:\s*(?:bpm|beats\s*(?:per|/)\s*min(?:ute)?))?",
+    "temperature": rf"(?:temperature|temp){_LINK}(?P<temp>\d{{2,3}}(?:\.\d)?)\s*(?:°\s*|deg(?:rees)?\s*)?(?P<temp_unit>[fc](?![a-z]))?",
+    "oxygen_saturation": rf"(?:oxygen\s+saturation|o2\s+sat(?:uration)?|sp\s?o2|sa\s?o2){_LINK}(?P<spo2>\d{{2,3}})\s*%",
+    "respiratory_rate": rf"(?:respiratory\s+rate|resp(?:irations)?|rr){_LINK}(?P<rr>\d{{1,2}})(?!\d)(?:\s*(?:breaths\s*(?:per|/)\s*min(?:ute)?|/min))?",
+}
+
+# Canonical lab name per alias; longer aliases come first in the pattern so
+# "hemoglobin A1c" is not read as hemoglobin
+LAB_ALIASES = {
+    "hemoglobin a1c": "A1C", "hba1c": "A1C", "hb a1c": "A1C", "a1c": "A1C",
+    "creatinine": "Creatinine", "bnp": "BNP", "nt-probnp": "NT-proBNP", "troponin": "Troponin",
+    "glucose": "Glucose", "potassium": "Potassium", "sodium": "Sodium", "egfr": "eGFR",
+    "ldl": "LDL", "hdl": "HDL", "hemoglobin": "Hemoglobin", "wbc": "WBC", "inr": "INR", "tsh": "TSH",
+}
+LAB_NAMES = "|".join(r"\s*".join(map(re.escape, alias.split())) for alias in sorted(LAB_ALIASES, key=len, reverse=True))
+LAB_UNITS = r"%|mg/dl|mmol/l|meq/l|pg/ml|ng/ml|ng/l|g/dl|k/ul|x10\^?9/l|ml/min(?:/1\.73\s*m2)?|u/l|miu/l|uiu/ml"
+LAB_PATTERN = rf"(?P<lab_name>{LAB_NAMES})(?:\s+level)?{_LINK}(?P<lab_value>\d+(?:\.\d+)?)(?:\s*(?P<lab_unit>{LAB_UNITS}))?"
+
+# Vital signs and labs start with a keyword: one alternation finds them all,
+# and the outer group's name (match.lastgroup) says which kind matched. The
+# word-start check sits outside the alternation so it runs once per position.
+KEYWORD_PATTERN = re.compile(
+    r"(?<![a-z0-9])(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in (*VITAL_PATTERNS.items(), ("lab", LAB_PATTERN))) + ")"
+)
+
+DOSE_UNITS = r"mg|mcg|µg|g|units?|iu|ml|meq"
+ROUTES = r"iv|po|im|sc|subq|subcutaneous(?:ly)?|oral(?:ly)?|inhaled|topical|sublingual"
+FREQUENCIES = (
+    r"once\s+daily|twice\s+daily|three\s+times\s+daily|four\s+times\s+daily|daily|nightly|at\s+bedtime"
+    r"|every\s+\d+\s+hours|q\d+h|qd|bid|tid|qid|qhs|weekly|prn|as\s+needed"
+)
+# Medications are found from their dose, which starts with a digit (the scan
+# skips straight to digits), and the drug is the word just before it. A dose
+# unit followed by "/" is a concentration (mg/dL), not a dose.
+DOSE_PATTERN = re.compile(
+    rf"(?P<dose>\d+(?:\.\d+)?\s*(?:{DOSE_UNITS}))\b(?!\s*/)"
+    rf"(?:\s+(?P<route>{ROUTES})\b)?(?:\s+(?P<frequency>{FREQUENCIES})\b)?"
+)
+DRUG_BEFORE_DOSE = re.compile(r"(?<![a-z])((?:insulin\s+)?[a-z][a-z-]{3,})\s+\Z")
+DRUG_WINDOW = 40
+
+# Words that can precede a dose without naming a drug
+NOT_DRUGS = frozenset({
+    "with", "given", "take", "takes", "taking", "took", "total", "dose", "dosed", "received", "from", "about",
+    "approximately", "over", "than", "weighs", "weight", "lost", "gained", "plus", "then", "increase", "decrease",
+    "increased", "decreased", "reduced", "started", "continue", "bolus", "additional",
+})
+
+# Values outside these ranges are misreads (dates, record numbers), not vitals
+VITAL_RANGES = {"bp_sys": (50, 300), "bp_dia": (20, 200), "hr": (20, 250), "spo2": (50, 100), "rr": (4, 60)}
+
+# ============================================================================
+# EXTRACTION
+# ============================================================================
+
+def _in_range(group: str, value: float) -> bool:
+    low, high = VITAL_RANGES[group]
+    return low <= value <= high
+
+def _vital(kind: str, match: "re.Match") -> Optional[str]:
+    if kind == "blood_pressure":
+        systolic, diastolic = int(match.group("bp_sys")), int(match.group("bp_dia"))
+        if _in_range("bp_sys", systolic) and _in_range("bp_dia", diastolic) and systolic > diastolic:
+            return f"{systolic}/{diastolic} mmHg"
+    elif kind == "heart_rate":
+        if _in_range("hr", int(match.group("hr"))):
+            return f"{match.group('hr')} bpm"
+    elif kind == "temperature":
+        value = float(match.group("temp"))
+        unit = (match.group("temp_unit") or ("c" if value < 50 else "f")).upper()
+        if (90 <= value <= 110) if unit == "F" else (30 <= value <= 45):
+            return f"{match.group('temp')}°{unit}"
+    elif kind == "oxygen_saturation":
+        if _in_range("spo2", int(match.group("spo2"))):
+            return f"{match.group('spo2')}%"
+    elif kind == "respiratory_rate":
+        if _in_range("rr", int(match.group("rr"))):
+            return f"{match.group('rr')} breaths/min"
+    return None
+
+def _empty_facts() -> Dict[str, Any]:
+    return {"vital_signs": {}, "medications": [], "lab_results": []}
+
+def _add_keyword_fact(facts: Dict[str, Any], match: "re.Match", text: str):
+    kind = match.lastgroup
+    if kind == "lab":
+        test = LAB_ALIASES[re.sub(r"\s+", " ", match.group("lab_name"))]
+        if any(lab["test"] == test for lab in facts["lab_results"]):
+            return
+        facts["lab_results"].append({
+            "test": test, "value": float(match.group("lab_value")), "unit": text[slice(*match.span("lab_unit"))],
+            "evidence": text[match.start():match.end()], "source": "rules"
+        })
+    elif kind not in facts["vital_signs"]:
+        # The first reading of each vital sign wins, as when chunk analyses are merged
+        value = _vital(kind, match)
+        if value is not None:
+            facts["vital_signs"][kind] = value
+
+def _add_medication(facts: Dict[str, Any], match: "re.Match", lowered: str, text: str, window_start: int):
+    drug = DRUG_BEFORE_DOSE.search(lowered, max(window_start, match.start() - DRUG_WINDOW), match.start())
+    if drug is None:
+        return
+    name = drug.group(1)
+    if name in NOT_DRUGS or name in LAB_ALIASES or any(m["medication"].lower() == name for m in facts["medications"]):
+        return
+    dosage = " ".join(text[slice(*match.span(group))] for group in ("dose", "route", "frequency") if match.group(group))
+    facts["medications"].append({
+        "medication": text[slice(*drug.span(1))], "dosage": re.sub(r"\s+", " ", dosage), "indication": "",
+        "evidence": text[drug.start(1):match.end()], "source": "rules"
+    })
+
+def _lower(text: str) -> str:
+    return text.translate(_ASCII_LOWER)
+
+def extract_clinical_facts(text: str) -> Dict[str, Any]:
+    """Vital signs, dosed medications and lab values found in one note."""
+    facts = _empty_facts()
+    lowered = _lower(text)
+    for match in KEYWORD_PATTERN.finditer(lowered):
+        _add_keyword_fact(facts, match, text)
+    for match in DOSE_PATTERN.finditer(lowered):
+        _add_medication(facts, match, lowered, text, 0)
+    return facts
+
+def extract_clinical_facts_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """``extract_clinical_facts`` for many notes with one pass of each scan over the joined corpus.
+
+    Notes are joined with a separator no pattern can match across, and the
+    matches are assigned to their notes by a binary search of the note offsets.
+    """
+    separator = "\n\x00\n"
+    text = separator.join(texts)
+    lowered = _lower(text)
+    starts = np.cumsum([0] + [len(t) + len(separator) for t in texts[:-1]])
+
+    results = [_empty_facts() for _ in texts]
+    keyword_matches = list(KEYWORD_PATTERN.finditer(lowered))
+    owners = np.searchsorted(starts, [m.start() for m in keyword_matches], side="right") - 1
+    for owner, match in zip(owners.tolist(), keyword_matches):
+        _add_keyword_fact(results[owner], match, text)
+    dose_matches = list(DOSE_PATTERN.finditer(lowered))
+    owners = np.searchsorted(starts, [m.start() for m in dose_matches], side="right") - 1
+    for owner, match in zip(owners.tolist(), dose_matches):
+        _add_medication(results[owner], match, lowered, text, int(starts[owner]))
+    return results
+
+# ============================================================================
+# MERGING
+# ============================================================================
+
+def merge_extracted(analysis: Dict[str, Any], facts: Dict[str, Any]) -> Dict[str, Any]:
+    """Analysis with the extracted facts merged in.
+
+    Extracted vital signs and medications take precedence, since they are copied
+    from the text; the model's medications fill in indications and add the drugs
+    written without a regular dose.
+    """
+    by_name = {m["medication"].lower(): dict(m) for m in facts.get("medications", [])}
+    for medication in analysis.get("medications", []):
+        key = str(medication.get("medication", "")).lower()
+        if key in by_name:
+            by_name[key]["indication"] = by_name[key]["indication"] or medication.get("indication", "")
+        else:
+            by_name[key] = medication
+
+    vital_signs = {name: value for name, value in (analysis.get("vital_signs") or {}).items() if value}
+    vital_signs.update(facts.get("vital_signs", {}))
+
+    return {
+        **analysis,
+        "medications": list(by_name.values()),
+        "vital_signs": vital_signs,
+        "lab_results": facts.get("lab_results", []) + [
+            lab for lab in analysis.get("lab_results", [])
+            if lab.get("test") not in {fact["test"] for fact in facts.get("lab_results", [])}
+        ]
+    }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Candidate Code Retrieval
+TF-IDF inverted index over ICD-10 code descriptions, vectorized with NumPy,
+mapping extracted condition/procedure phrases to a short list of candidate codes.
+"""
+
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from icd10_index import Icd10Index, format_cm_code, get_code_catalog
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset({
+    "a", "an", "and", "as", "at", "by", "due", "for", "from", "in", "into", "is", "of",
+    "on", "or", "other", "the", "to", "with", "without", "not", "elsewhere", "classified",
+    "unspecified", "nos"
+})
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens with stopwords and trailing plural 's' removed."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class CodeRetriever:
+    """Inverted index with L2-normalized TF-IDF weights stored as CSR-style NumPy arrays."""
+
+    def __init__(self, codes: Sequence[str], descriptions: Sequence[str], system: str = "CM"):
+        self.system = system
+        self.codes = list(codes)
+        self.descriptions = list(descriptions)
+        n_docs = len(self.codes)
+
+        vocabulary: Dict[str, int] = {}
+        doc_terms: List[Counter] = []
+        for description in self.descriptions:
+            counts = Counter()
+            for token in tokenize(description):
+                counts[vocabulary.setdefault(token, len(vocabulary))] += 1
+            doc_terms.append(counts)
+
+        # Flatten (doc, term, tf) triples, then sort by term to get postings lists
+        nnz = sum(len(counts) for counts in doc_terms)
+        doc_ids = np.empty(nnz, dtype=np.int32)
+        term_ids = np.empty(nnz, dtype=np.int32)
+        tfs = np.empty(nnz, dtype=np.float32)
+        position = 0
+        for doc_id, counts in enumerate(doc_terms):
+            size = len(counts)
+            doc_ids[position:position + size] = doc_id
+            term_ids[position:position + size] = np.fromiter(counts.keys(), dtype=np.int32, count=size)
+            tfs[position:position + size] = np.fromiter(counts.values(), dtype=np.float32, count=size)
+            position += size
+
+        df = np.bincount(term_ids, minlength=len(vocabulary)).astype(np.float32)
+        self.idf = np.log((1 + n_docs) / (1 + df)).astype(np.float32) + 1.0
+        weights = (1 + np.log(tfs)) * self.idf[term_ids]
+        norms = np.sqrt(np.bincount(doc_ids, weights=weights * weights, minlength=n_docs)).astype(np.float32)
+        weights /= np.maximum(norms[doc_ids], 1e-9)
+
+        order = np.argsort(term_ids, kind="stable")
+        self.postings_docs = doc_ids[order]
+        self.postings_weights = weights[order].astype(np.float32)
+        self.term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=self.term_ptr[1:])
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_index(cls, index: Icd10Index, billable_only: bool = True) -> "CodeRetriever":
+        """Build a retriever over the (billable) codes of a memory-mapped ICD-10 index."""
+        codes, descriptions = [], []
+        for entry in index.entries():
+            if billable_only and not entry["billable"]:
+                continue
+            codes.append(entry["code"])
+            descriptions.append(entry["description"])
+        return cls(codes, descriptions, index.system)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def search(self, phrase: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Top-k codes whose descriptions best match the phrase (cosine over TF-IDF)."""
+        query = Counter(self.vocabulary[t] for t in tokenize(phrase) if t in self.vocabulary)
+        if not query:
+            return []
+
+        scores = np.zeros(len(self.codes), dtype=np.float32)
+        for term_id, tf in query.items():
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            # Doc ids are unique within one postings list, so fancy-index add is safe
+            scores[self.postings_docs[start:end]] += self.postings_weights[start:end] * ((1 + math.log(tf)) * self.idf[term_id])
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "code": format_cm_code(self.codes[i]) if self.system == "CM" else self.codes[i],
+                "description": self.descriptions[i],
+                "score": round(float(scores[i]), 4)
+            }
+            for i in top if scores[i] > 0
+        ]
+
+    def search_many(self, phrases: Sequence[str], k: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        return {phrase: self.search(phrase, k) for phrase in phrases if phrase}
+
+
+_retrievers: Dict[str, Optional[CodeRetriever]] = {}
+_retriever_lock = threading.Lock()
+
+def get_code_retriever(kind: str) -> Optional[CodeRetriever]:
+    """Process-wide retriever for "diagnosis" (CM) or "procedure" (PCS) codes, built on first use.
+
+    Returns None when no ICD-10 table is configured for that code system.
+    """
+    with _retriever_lock:
+        if kind not in _retrievers:
+            catalog = get_code_catalog()
+            index = catalog.index_for(kind) if catalog is not None else None
+            _retrievers[kind] = CodeRetriever.from_index(index) if index is not None else None
+            if _retrievers[kind] is not None:
+                logger.info(f"🔎 Built {kind} code retriever over {len(_retrievers[kind])} ICD-10-{index.system} codes")
+    return _retrievers[kind]
+
+def warm_up_code_retrievers():
+    """Build the retrievers at worker start-up instead of inside the first coding activity."""
+    for kind in ("diagnosis", "procedure"):
+        get_code_retriever(kind)
+
+def retrieve_candidates(analysis: Dict[str, Any], k: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+    """Candidate codes for each diagnosis and procedure phrase in an analysis.
+
+    Returns {"diagnosis": [...], "procedure": [...]}, each a list of
+    {"phrase", "candidates"}; a kind is empty when no table is configured.
+    """
+    candidates: Dict[str, List[Dict[str, Any]]] = {"diagnosis": [], "procedure": []}
+    for kind, key, field in (("diagnosis", "diagnoses", "condition"), ("procedure", "procedures", "procedure")):
+        retriever = get_code_retriever(kind)
+        if retriever is None:
+            continue
+        for finding in analysis.get(key, []):
+            phrase = finding.get(field, "")
+            matches = retriever.search(phrase, k)
+            if matches:
+                candidates[kind].append({"phrase": phrase, "candidates": matches})
+    return candidates
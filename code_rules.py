@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Rule-Based Code Validation
+Format, existence, billability and primary-code checks against the local ICD-10 catalog
+"""
+
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from icd10_index import Icd10Catalog, format_cm_code, normalize_code
+
+CM_CODE_PATTERN = re.compile(r"^[A-Z][0-9][0-9A-Z](\.?[0-9A-Z]{1,4})?$")
+PCS_CODE_PATTERN = re.compile(r"^[0-9A-HJ-NP-Z]{7}$")
+
+def is_external_cause(code: str) -> bool:
+    """V00-Y99 external cause codes may never be reported as the primary diagnosis."""
+    return normalize_code(code)[:1] in ("V", "W", "X", "Y")
+
+def validate_codes_with_rules(codes: Dict[str, List[Dict[str, Any]]], catalog: Optional[Icd10Catalog] = None) -> Dict[str, Any]:
+    """Check generated codes without a model call.
+
+    Format and primary-code rules always run; existence and billability checks
+    run for each code system the catalog has an index for.
+    """
+    started = time.perf_counter()
+    errors: List[str] = []
+    warnings: List[str] = []
+    checks = {"format": 0, "existence": 0, "billability": 0, "primary": 0}
+    suggestions: Dict[str, List[str]] = {}
+
+    for kind, key, pattern in (
+        ("diagnosis", "diagnosis_codes", CM_CODE_PATTERN),
+        ("procedure", "procedure_codes", PCS_CODE_PATTERN),
+    ):
+        index = catalog.index_for(kind) if catalog is not None else None
+        seen = set()
+
+        for entry in codes.get(key, []):
+            raw = str(entry.get("code", "")).strip().upper()
+            code = normalize_code(raw)
+
+            checks["format"] += 1
+            if not pattern.match(raw):
+                errors.append(f"{raw or '<empty>'}: not a valid ICD-10-{'CM' if kind == 'diagnosis' else 'PCS'} code format")
+                continue
+
+            if code in seen:
+                warnings.append(f"{raw}: duplicate {kind} code")
+            seen.add(code)
+
+            if index is None:
+                continue
+
+            checks["existence"] += 1
+            found = index.lookup(code)
+            if found is None:
+                errors.append(f"{raw}: does not exist in the ICD-10-{index.system} code set")
+                parent = index.parent(code)
+                if parent:
+                    suggestions[raw] = [
+                        format_cm_code(e["code"]) if kind == "diagnosis" else e["code"]
+                        for e in index.prefix(parent, limit=10) if e["billable"]
+                    ]
+                continue
+
+            checks["billability"] += 1
+            if not found["billable"]:
+                errors.append(f"{raw}: category header, not billable; a more specific code is required")
+                suggestions[raw] = [
+                    format_cm_code(e["code"]) if kind == "diagnosis" else e["code"]
+                    for e in index.prefix(code, limit=10) if e["billable"]
+                ]
+
+    diagnosis_codes = codes.get("diagnosis_codes", [])
+    primary_diagnoses = [c for c in diagnosis_codes if c.get("primary")]
+    checks["primary"] += 1
+    if diagnosis_codes and len(primary_diagnoses) != 1:
+        errors.append(f"Exactly one primary diagnosis code is required, found {len(primary_diagnoses)}")
+    for entry in primary_diagnoses:
+        if is_external_cause(str(entry.get("code", ""))):
+            errors.append(f"{entry.get('code')}: external cause codes cannot be the primary diagnosis")
+
+    primary_procedures = [c for c in codes.get("procedure_codes", []) if c.get("primary")]
+    if len(primary_procedures) > 1:
+        warnings.append(f"{len(primary_procedures)} procedure codes are marked primary; expected at most one")
+
+    return {
+        "is_valid": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "suggestions": suggestions,
+        "checks_run": checks,
+        "codes_checked": checks["format"],
+        "catalog_loaded": catalog is not None,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
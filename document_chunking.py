@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Clinical Document Chunking
+Section-aware splitting of long clinical documents into overlapping chunks,
+and merging of the per-chunk analyses and codes back into one result
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Documents longer than this are split; each chunk stays within it plus the overlap
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "6000"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "300"))
+
+# Chunks of one document analyzed concurrently by a workflow
+CHUNK_MAX_PARALLEL = int(os.getenv("CHUNK_MAX_PARALLEL", "8"))
+
+CLINICAL_HEADERS = (
+    r"chief complaint|cc|history of present illness|hpi|past medical history|pmh|"
+    r"past surgical history|psh|medications?|current medications|allergies|social history|"
+    r"family history|review of systems|ros|physical exam(?:ination)?|exam|vital signs|vitals|"
+    r"lab(?:oratory)?(?: results| data)?|labs|imaging|radiology|hospital course|"
+    r"procedures?(?: performed)?|operative (?:note|report|findings)|findings|"
+    r"assessment(?: and plan| & plan)?|a/p|impression|plan|diagnos[ie]s|"
+    r"(?:admission|discharge|final) diagnos[ie]s|discharge medications|"
+    r"discharge instructions|disposition|follow[- ]?up"
+)
+
+# A known clinical header at the start of a line ("HPI:", "Assessment and Plan"),
+# or any all-caps line ending in a colon ("OPERATIVE DETAILS:")
+SECTION_HEADER_PATTERN = re.compile(
+    rf"^[ \t]*(?:(?P<known>{CLINICAL_HEADERS})[ \t]*(?::|$)|(?P<caps>[A-Z][A-Z /&-]{{2,40}}):)",
+    re.IGNORECASE | re.MULTILINE
+)
+
+def split_sections(content: str) -> List[Tuple[str, int, int]]:
+    """(section name, start, end) spans covering the whole document in order."""
+    sections: List[Tuple[str, int, int]] = []
+    name, start = "preamble", 0
+    for match in SECTION_HEADER_PATTERN.finditer(content):
+        header = match.group("known") or match.group("caps")
+        # The caps alternative is case-insensitive too, so require real upper case there
+        if match.group("caps") and not header.isupper():
+            continue
+        if match.start() > start:
+            sections.append((name, start, match.start()))
+        name, start = header.strip().lower(), match.start()
+    if start < len(content):
+        sections.append((name, start, len(content)))
+    return sections
+
+def _split_oversized(content: str, name: str, start: int, end: int, max_chars: int) -> List[Tuple[str, int, int]]:
+    """Split one section into pieces of at most max_chars at paragraph, line, sentence or word breaks."""
+    pieces = []
+    while end - start > max_chars:
+        limit = start + max_chars
+        cut = -1
+        for separator in ("\n\n", "\n", ". ", " "):
+            position = content.rfind(separator, start + max_chars // 2, limit)
+            if position != -1:
+                cut = position + len(separator)
+                break
+        if cut == -1:
+            cut = limit
+        pieces.append((name, start, cut))
+        start = cut
+    pieces.append((name, start, end))
+    return pieces
+
+def chunk_document(content: str, max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP_CHARS) -> List[Dict[str, Any]]:
+    """Pack whole sections into chunks of at most max_chars, splitting only oversized sections.
+
+    Each chunk after the first also repeats up to ``overlap`` characters before its
+    start (from the nearest line break), so findings that straddle a boundary keep
+    their context. Returns dicts with index, count, sections, start, end and text.
+    """
+    units: List[Tuple[str, int, int]] = []
+    for name, start, end in split_sections(content):
+        units.extend(_split_oversized(content, name, start, end, max_chars))
+
+    spans: List[Tuple[int, int, List[str]]] = []
+    for name, start, end in units:
+        if spans and end - spans[-1][0] <= max_chars:
+            chunk_start, _, names = spans[-1]
+            if name not in names:
+                names.append(name)
+            spans[-1] = (chunk_start, end, names)
+        else:
+            spans.append((start, end, [name]))
+
+    chunks = []
+    for index, (start, end, names) in enumerate(spans):
+        text_start = start
+        if index > 0 and overlap > 0:
+            text_start = max(0, start - overlap)
+            line_break = content.find("\n", text_start, start)
+            if line_break != -1:
+                text_start = line_break + 1
+        chunks.append({
+            "index": index,
+            "count": len(spans),
+            "sections": names,
+            "start": start,
+            "end": end,
+            "text": content[text_start:end]
+        })
+    return chunks
+
+def pin_chunk_settings(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Fix the chunk size and fan-out in a workflow's input when it is started.
+
+    Workflow code reads them from the input, so a worker with different
+    CHUNK_MAX_CHARS or CHUNK_MAX_PARALLEL settings replays the execution the
+    same way.
+    """
+    document.setdefault("chunk_max_chars", CHUNK_MAX_CHARS)
+    document.setdefault("chunk_max_parallel", CHUNK_MAX_PARALLEL)
+    return document
+
+def chunk_documents(document: Dict[str, Any], max_chars: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Per-chunk copies of a document for the analysis activities; [] when it fits in one call."""
+    max_chars = max_chars or CHUNK_MAX_CHARS
+    content = document.get("content", "")
+    if len(content) <= max_chars:
+        return []
+    return [
+        {
+            **document,
+            "document_id": f"{document['document_id']}#chunk-{chunk['index'] + 1}",
+            "content": chunk["text"],
+            "chunk": {key: chunk[key] for key in ("index", "count", "sections", "start", "end")}
+        }
+        for chunk in chunk_document(content, max_chars)
+    ]
+
+# ============================================================================
+# MERGING
+# ============================================================================
+
+def _finding_key(text: Any) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", str(text or "").lower()))
+
+def _merge_by(items: List[Dict[str, Any]], key_fn) -> List[Dict[str, Any]]:
+    """Deduplicate items by key, keeping the highest-confidence copy in first-seen order."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        key = key_fn(item)
+        if not key:
+            continue
+        kept = merged.get(key)
+        if kept is None or item.get("confidence", 0) > kept.get("confidence", 0):
+            merged[key] = dict(item)
+    return list(merged.values())
+
+def merge_analyses(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-chunk analyses, deduplicating diagnoses by condition and procedures by name."""
+    diagnoses = _merge_by([d for a in analyses for d in a.get("diagnoses", [])], lambda d: _finding_key(d.get("condition")))
+    procedures = _merge_by([p for a in analyses for p in a.get("procedures", [])], lambda p: _finding_key(p.get("procedure")))
+    medications = _merge_by([m for a in analyses for m in a.get("medications", [])], lambda m: _finding_key(m.get("medication")))
+
+    lab_results = _merge_by([l for a in analyses for l in a.get("lab_results", [])], lambda l: _finding_key(l.get("test")))
+
+    vital_signs: Dict[str, Any] = {}
+    for analysis in analyses:
+        for name, value in (analysis.get("vital_signs") or {}).items():
+            if not vital_signs.get(name):
+                vital_signs[name] = value
+
+    return {
+        "diagnoses": diagnoses,
+        "procedures": procedures,
+        "medications": medications,
+        "vital_signs": vital_signs,
+        "lab_results": lab_results,
+        "confidence_score": sum(d.get("confidence", 0) for d in diagnoses) / len(diagnoses) if diagnoses else 0,
+        "chunks_analyzed": len(analyses)
+    }
+
+def _code_key(entry: Dict[str, Any]) -> str:
+    return str(entry.get("code", "")).replace(".", "").strip().upper()
+
+def merge_codes(code_sets: List[Dict[str, List[Dict[str, Any]]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Combine per-chunk code sets, deduplicating by code and keeping one primary code per system."""
+    merged = {}
+    for key in ("diagnosis_codes", "procedure_codes"):
+        codes = _merge_by([c for code_set in code_sets for c in code_set.get(key, [])], _code_key)
+        primaries = [c for c in codes if c.get("primary")]
+        if len(primaries) > 1:
+            keep = max(primaries, key=lambda c: c.get("confidence", 0))
+            for entry in primaries:
+                entry["primary"] = entry is keep
+        merged[key] = codes
+    return merged
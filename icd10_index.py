@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+ICD-10 Code Index - Local ICD-10-CM/PCS code table
+Builds a compact, memory-mapped index from the CMS order flat files
+(icd10cm_order_YYYY.txt / icd10pcs_order_YYYY.txt) for microsecond code lookups.
+
+Usage:
+    python icd10_index.py build icd10cm_order_2025.txt icd10cm.idx --system CM
+    python icd10_index.py lookup icd10cm.idx E11.9 E11 --prefix
+"""
+
+import argparse
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# File layout: header, fixed-width records sorted by code, then a description blob.
+# Record: code (8 bytes, NUL padded, no dot), flags, chapter, description offset and length.
+MAGIC = b"ICD10IDX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8s4sII")
+RECORD = struct.Struct("<8sBBIH")
+FLAG_BILLABLE = 0x01
+
+# ICD-10-CM chapters: (first category, last category, title)
+CM_CHAPTERS = [
+    ("A00", "B99", "Certain infectious and parasitic diseases"),
+    ("C00", "D49", "Neoplasms"),
+    ("D50", "D89", "Diseases of the blood and blood-forming organs and certain disorders involving the immune mechanism"),
+    ("E00", "E89", "Endocrine, nutritional and metabolic diseases"),
+    ("F01", "F99", "Mental, behavioral and neurodevelopmental disorders"),
+    ("G00", "G99", "Diseases of the nervous system"),
+    ("H00", "H59", "Diseases of the eye and adnexa"),
+    ("H60", "H95", "Diseases of the ear and mastoid process"),
+    ("I00", "I99", "Diseases of the circulatory system"),
+    ("J00", "J99", "Diseases of the respiratory system"),
+    ("K00", "K95", "Diseases of the digestive system"),
+    ("L00", "L99", "Diseases of the skin and subcutaneous tissue"),
+    ("M00", "M99", "Diseases of the musculoskeletal system and connective tissue"),
+    ("N00", "N99", "Diseases of the genitourinary system"),
+    ("O00", "O9A", "Pregnancy, childbirth and the puerperium"),
+    ("P00", "P96", "Certain conditions originating in the perinatal period"),
+    ("Q00", "Q99", "Congenital malformations, deformations and chromosomal abnormalities"),
+    ("R00", "R99", "Symptoms, signs and abnormal clinical and laboratory findings, not elsewhere classified"),
+    ("S00", "T88", "Injury, poisoning and certain other consequences of external causes"),
+    ("V00", "Y99", "External causes of morbidity"),
+    ("Z00", "Z99", "Factors influencing health status and contact with health services"),
+    ("U00", "U85", "Codes for special purposes"),
+]
+
+# ICD-10-PCS sections, keyed by the first character of the code
+PCS_SECTIONS = {
+    "0": "Medical and Surgical",
+    "1": "Obstetrics",
+    "2": "Placement",
+    "3": "Administration",
+    "4": "Measurement and Monitoring",
+    "5": "Extracorporeal or Systemic Assistance and Performance",
+    "6": "Extracorporeal or Systemic Therapies",
+    "7": "Osteopathic",
+    "8": "Other Procedures",
+    "9": "Chiropractic",
+    "B": "Imaging",
+    "C": "Nuclear Medicine",
+    "D": "Radiation Therapy",
+    "F": "Physical Rehabilitation and Diagnostic Audiology",
+    "G": "Mental Health",
+    "H": "Substance Abuse Treatment",
+    "X": "New Technology",
+}
+PCS_SECTION_KEYS = sorted(PCS_SECTIONS)
+
+def normalize_code(code: str) -> str:
+    """Upper-case a code and drop the dot: 'e11.9' -> 'E119'."""
+    return code.strip().upper().replace(".", "")
+
+def format_cm_code(code: str) -> str:
+    """Insert the dot after the category: 'E119' -> 'E11.9'."""
+    return f"{code[:3]}.{code[3:]}" if len(code) > 3 else code
+
+def cm_chapter(code: str) -> int:
+    """1-based ICD-10-CM chapter number for a code, or 0 if it falls outside every chapter."""
+    category = code[:3]
+    for number, (first, last, _) in enumerate(CM_CHAPTERS, start=1):
+        if first <= category <= last:
+            return number
+    return 0
+
+def chapter_title(system: str, chapter: int) -> Optional[str]:
+    if chapter <= 0:
+        return None
+    if system == "CM":
+        return CM_CHAPTERS[chapter - 1][2] if chapter <= len(CM_CHAPTERS) else None
+    return PCS_SECTIONS[PCS_SECTION_KEYS[chapter - 1]] if chapter <= len(PCS_SECTION_KEYS) else None
+
+def _chapter_for(system: str, code: str) -> int:
+    if system == "CM":
+        return cm_chapter(code)
+    return PCS_SECTION_KEYS.index(code[0]) + 1 if code[:1] in PCS_SECTIONS else 0
+
+# ============================================================================
+# FLAT FILE PARSING
+# ============================================================================
+
+def parse_cms_file(path: str) -> Iterator[Tuple[str, bool, str]]:
+    """Yield (code, billable, description) from a CMS order file or a codes file.
+
+    Order files are fixed width: order number, code, billable flag (0/1), short
+    and long descriptions. Codes files list only billable codes as
+    "code description".
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            if len(line) > 16 and line[:5].isdigit() and line[5] == " ":
+                code = line[6:13].strip()
+                billable = line[14] == "1"
+                description = line[77:].strip() or line[16:76].strip()
+            else:
+                code, _, description = line.partition(" ")
+                billable = True
+                description = description.strip()
+            yield normalize_code(code), billable, description
+
+# ============================================================================
+# INDEX BUILD AND LOOKUP
+# ============================================================================
+
+def build_index(entries: Iterator[Tuple[str, bool, str]], out_path: str, system: str = "CM") -> int:
+    """Write a memory-mappable index for (code, billable, description) entries; returns the count."""
+    system = system.upper()
+    records = {}
+    for code, billable, description in entries:
+        if code and len(code) <= 8:
+            records[code] = (billable, description)
+
+    blob = bytearray()
+    packed = []
+    for code in sorted(records):
+        billable, description = records[code]
+        encoded = description.encode("utf-8")[:0xFFFF]
+        packed.append(RECORD.pack(
+            code.encode("ascii"), FLAG_BILLABLE if billable else 0, _chapter_for(system, code), len(blob), len(encoded)
+        ))
+        blob += encoded
+
+    # A temp file of its own: worker pool processes may build the same index at once,
+    # and each then atomically replaces the output with a complete file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)), prefix=f"{os.path.basename(out_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, system.encode("ascii").ljust(4, b"\0"), FORMAT_VERSION, len(packed)))
+            f.write(b"".join(packed))
+            f.write(blob)
+        # mkstemp creates the file owner-only; the index is as readable as any other output
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(packed)
+
+
+class _CodeKeys:
+    """Sequence view of the sorted codes, so bisect can search the mapped records directly."""
+
+    def __init__(self, index: "Icd10Index"):
+        self._index = index
+
+    def __len__(self):
+        return self._index.count
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = HEADER.size + i * RECORD.size
+        return self._index._mm[offset:offset + 8].rstrip(b"\0")
+
+
+class Icd10Index:
+    """Read-only, memory-mapped view of one ICD-10 code system (CM or PCS)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, system, version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not an ICD-10 index (version {FORMAT_VERSION})")
+        self.system = system.rstrip(b"\0").decode("ascii")
+        self.count = count
+        self._blob_offset = HEADER.size + count * RECORD.size
+        self._keys = _CodeKeys(self)
+
+    def __len__(self):
+        return self.count
+
+    def _position(self, code: str) -> int:
+        key = normalize_code(code).encode("ascii", "ignore")
+        i = bisect_left(self._keys, key)
+        return i if i < self.count and self._keys[i] == key else -1
+
+    def _record(self, i: int) -> Dict[str, Any]:
+        code, flags, chapter, desc_offset, desc_len = RECORD.unpack_from(self._mm, HEADER.size + i * RECORD.size)
+        start = self._blob_offset + desc_offset
+        code = code.rstrip(b"\0").decode("ascii")
+        return {
+            "code": code,
+            "description": self._mm[start:start + desc_len].decode("utf-8"),
+            "billable": bool(flags & FLAG_BILLABLE),
+            "chapter": chapter,
+            "chapter_title": chapter_title(self.system, chapter),
+            "system": self.system
+        }
+
+    def __contains__(self, code: str) -> bool:
+        return self._position(code) >= 0
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Every entry in code order."""
+        for i in range(self.count):
+            yield self._record(i)
+
+    def lookup(self, code: str) -> Optional[Dict[str, Any]]:
+        """Entry for a code (dotted or not), with its nearest existing parent, or None."""
+        i = self._position(code)
+        if i < 0:
+            return None
+        entry = self._record(i)
+        entry["parent"] = self.parent(entry["code"])
+        return entry
+
+    def parent(self, code: str) -> Optional[str]:
+        """Nearest shorter code in the table that prefixes this one."""
+        code = normalize_code(code)
+        for length in range(len(code) - 1, 2, -1):
+            if self._position(code[:length]) >= 0:
+                return code[:length]
+        return None
+
+    def prefix(self, prefix: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Entries whose code starts with the prefix, in code order."""
+        key = normalize_code(prefix).encode("ascii", "ignore")
+        i = bisect_left(self._keys, key)
+        matches = []
+        while i < self.count and len(matches) < limit and self._keys[i].startswith(key):
+            matches.append(self._record(i))
+            i += 1
+        return matches
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class Icd10Catalog:
+    """ICD-10-CM diagnosis and ICD-10-PCS procedure indexes used together."""
+
+    def __init__(self, cm: Optional[Icd10Index] = None, pcs: Optional[Icd10Index] = None):
+        self.cm = cm
+        self.pcs = pcs
+
+    def index_for(self, kind: str) -> Optional[Icd10Index]:
+        """Index for "diagnosis" (CM) or "procedure" (PCS) codes."""
+        return self.cm if kind == "diagnosis" else self.pcs
+
+
+def load_index(path: str, system: str) -> Optional[Icd10Index]:
+    """Open an index file, building it first when given a CMS flat file."""
+    if not path:
+        return None
+    if not path.endswith(".idx"):
+        index_path = f"{path}.idx"
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+            count = build_index(parse_cms_file(path), index_path, system)
+            logger.info(f"📚 Built ICD-10-{system} index with {count} codes at {index_path}")
+        path = index_path
+    return Icd10Index(path)
+
+
+_catalog: Optional[Icd10Catalog] = None
+_catalog_loaded = False
+_catalog_lock = threading.Lock()
+
+def get_code_catalog() -> Optional[Icd10Catalog]:
+    """Return the process-wide catalog from ICD10_CM_PATH / ICD10_PCS_PATH, or None if neither is set.
+
+    Each path may be a built ``.idx`` file or a CMS order/codes flat file, which
+    is indexed on first use and cached next to it.
+    """
+    global _catalog, _catalog_loaded
+    with _catalog_lock:
+        if not _catalog_loaded:
+            cm_path = os.getenv("ICD10_CM_PATH")
+            pcs_path = os.getenv("ICD10_PCS_PATH")
+            if cm_path or pcs_path:
+                _catalog = Icd10Catalog(load_index(cm_path, "CM"), load_index(pcs_path, "PCS"))
+                logger.info(
+                    f"📚 ICD-10 catalog loaded: {len(_catalog.cm) if _catalog.cm else 0} CM codes, "
+                    f"{len(_catalog.pcs) if _catalog.pcs else 0} PCS codes"
+                )
+            else:
+                logger.info("📚 No ICD-10 code tables configured; existence and billability checks disabled")
+            _catalog_loaded = True
+    return _catalog
+
+def set_code_catalog(catalog: Optional[Icd10Catalog]):
+    """Replace the process-wide catalog (used by benchmarks and tooling)."""
+    global _catalog, _catalog_loaded
+    _catalog = catalog
+    _catalog_loaded = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="index a CMS order or codes flat file")
+    build.add_argument("source")
+    build.add_argument("output")
+    build.add_argument("--system", choices=["CM", "PCS"], default="CM")
+
+    lookup = commands.add_parser("lookup", help="look codes up in an index")
+    lookup.add_argument("index")
+    lookup.add_argument("codes", nargs="+")
+    lookup.add_argument("--prefix", action="store_true", help="list codes under each prefix")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        count = build_index(parse_cms_file(args.source), args.output, args.system)
+        print(f"✅ Indexed {count} ICD-10-{args.system} codes into {args.output}")
+    else:
+        index = Icd10Index(args.index)
+        for code in args.codes:
+            entries = index.prefix(code) if args.prefix else [index.lookup(code)]
+            for entry in entries:
+                if entry is None:
+                    print(f"{code}: not found")
+                else:
+                    print(f"{entry['code']:<8} {'billable' if entry['billable'] else 'header  '} {entry['description']}")
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Async Model Client - Amazon Bedrock via LiteLLM
+Non-blocking model calls for Temporal activities with a per-worker concurrency limit
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from model_metrics import cached_prompt_tokens, model_call_span, record_model_call, response_token_counts
+from rate_limiter import AdaptiveLimiter, TokenBucket, backoff_delay, is_throttling_error
+from response_parsing import JsonObjectScanner
+from workflow_contract import LANE_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "bedrock/anthropic.claude-3-sonnet-20240229-v1:0"
+DEFAULT_MAX_CONCURRENCY = 32
+
+# Priority lane of the model calls made in the current context (see call_priority)
+_call_priority: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("model_call_priority", default=None)
+
+@contextlib.contextmanager
+def call_priority(lane: Optional[str]):
+    """Make model calls inside the block wait for a concurrency slot in ``lane``."""
+    if lane is None:
+        yield
+        return
+    token = _call_priority.set(lane)
+    try:
+        yield
+    finally:
+        _call_priority.reset(token)
+
+# ============================================================================
+# MODEL CLIENT
+# ============================================================================
+
+class ModelClient:
+    """Async chat-completion client shared by every activity in a worker process.
+
+    Calls go through litellm's native async path (``acompletion``) so a model
+    round trip never blocks the worker's event loop. When the async path is
+    unavailable, or ``MODEL_CLIENT_MODE=executor`` is set, calls fall back to
+    the synchronous ``completion`` running on a thread pool. Either way an
+    adaptive limiter caps the number of in-flight model calls per worker: it
+    starts at ``max_concurrency``, halves on throttling and creeps back up on
+    success. ``MODEL_MAX_QPS`` additionally paces call starts, and throttled
+    calls are retried here with jittered backoff (``MODEL_THROTTLE_RETRIES``).
+
+    With ``stream_json`` (``MODEL_STREAM_JSON=true``), calls that expect a JSON
+    object stream the completion and stop reading as soon as the object closes,
+    instead of waiting for any trailing text.
+
+    A prompt's static prefix is sent as the system message. With
+    ``prompt_caching`` (``MODEL_PROMPT_CACHING``: ``auto``, ``on`` or ``off``)
+    it is marked as a provider cache breakpoint, so models that support prompt
+    caching bill and process the repeated prefix once per cache lifetime;
+    ``auto`` enables it for models litellm lists as supporting it.
+
+    Calls made inside ``call_priority(lane)`` wait for a slot in that priority
+    lane; when lanes compete, slots are shared by ``priority_weights``
+    (``PRIORITY_LANE_WEIGHTS``), so urgent documents overtake a bulk backlog.
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        api_base: Optional[str] = None,
+        api_key: Optional[str] = None,
+        mode: Optional[str] = None,
+        stream_json: Optional[bool] = None,
+        max_qps: Optional[float] = None,
+        adaptive: Optional[bool] = None,
+        throttle_retries: Optional[int] = None,
+        prompt_caching: Optional[str] = None,
+        priority_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.model = model or os.getenv("BEDROCK_MODEL_ID", DEFAULT_MODEL)
+        self.max_concurrency = max_concurrency or int(os.getenv("MODEL_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self.api_base = api_base or os.getenv("MODEL_API_BASE") or None
+        self.api_key = api_key or os.getenv("MODEL_API_KEY") or None
+        self.mode = mode or os.getenv("MODEL_CLIENT_MODE", "async")
+        if stream_json is None:
+            stream_json = os.getenv("MODEL_STREAM_JSON", "false").lower() in ("1", "true", "yes")
+        self.stream_json = stream_json
+        self.max_qps = max_qps if max_qps is not None else float(os.getenv("MODEL_MAX_QPS", "0"))
+        if adaptive is None:
+            adaptive = os.getenv("MODEL_ADAPTIVE_CONCURRENCY", "true").lower() in ("1", "true", "yes")
+        self.throttle_retries = throttle_retries if throttle_retries is not None else int(os.getenv("MODEL_THROTTLE_RETRIES", "4"))
+
+        self.prompt_caching = (prompt_caching or os.getenv("MODEL_PROMPT_CACHING", "auto")).lower()
+
+        self.limiter = AdaptiveLimiter(self.max_concurrency, adaptive=adaptive, weights=priority_weights or LANE_WEIGHTS)
+        self._bucket = TokenBucket(self.max_qps)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._acompletion = None
+        self._completion = None
+        self._supports_prompt_caching = None
+        self._caching_models: Dict[str, bool] = {}
+
+        _configure_aws_credentials()
+
+    def _load_backend(self):
+        """Import litellm once and pick the async or executor-backed path."""
+        if self._acompletion is not None or self._completion is not None:
+            return
+
+        from litellm import completion
+        self._completion = completion
+
+        if self.mode != "executor":
+            try:
+                from litellm import acompletion
+                self._acompletion = acompletion
+            except ImportError:
+                logger.warning("litellm.acompletion unavailable, falling back to executor-backed completion")
+
+        if self.prompt_caching == "auto":
+            try:
+                from litellm.utils import supports_prompt_caching
+                self._supports_prompt_caching = supports_prompt_caching
+            except ImportError:
+                pass
+
+        if self._acompletion is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="model-client"
+            )
+
+    def warm_up(self):
+        """Import the litellm backend now instead of on the first model call.
+
+        The import takes seconds and blocks the event loop, so workers do it
+        before they start polling rather than inside their first activity.
+        """
+        self._load_backend()
+
+    def caches_prompts(self, model: Optional[str] = None) -> bool:
+        """Whether calls to this model mark the system prefix for provider-side caching."""
+        if self.prompt_caching in ("on", "true", "1"):
+            return True
+        if self.prompt_caching != "auto" or self._supports_prompt_caching is None:
+            return False
+        model = model or self.model
+        if model not in self._caching_models:
+            try:
+                self._caching_models[model] = bool(self._supports_prompt_caching(model))
+            except Exception:
+                self._caching_models[model] = False
+        return self._caching_models[model]
+
+    def _messages(self, prompt: str, system: Optional[str], model: Optional[str]) -> List[Dict[str, Any]]:
+        messages: List[Dict[str, Any]] = []
+        if system:
+            if self.caches_prompts(model):
+                content: Any = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+            else:
+                content = system
+            messages.append({"role": "system", "content": content})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _request_kwargs(self, messages: List[Dict[str, Any]], max_tokens: int, temperature: float, model: Optional[str]) -> Dict[str, Any]:
+        kwargs = {
+            "model": model or self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            # Throttling retries are handled in complete(), with backoff shared by all calls
+            "max_retries": 0,
+        }
+        if self.api_base:
+            kwargs["api_base"] = self.api_base
+        if self.api_key:
+            kwargs["api_key"] = self.api_key
+        return kwargs
+
+    async def complete(
+        self,
+        prompt: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.1,
+        model: Optional[str] = None,
+        json_response: bool = False,
+        system: Optional[str] = None,
+    ) -> str:
+        """Send a single-turn prompt, after an optional static system prefix, and return the completion text.
+
+        Tokens, latency and errors are recorded against the current tracked step
+        (see ``model_metrics.track_model_usage``). Throttled calls are retried up
+        to ``throttle_retries`` times before the error reaches the activity.
+        """
+        self._load_backend()
+
+        kwargs = self._request_kwargs(
+            self._messages(prompt, system, model), max_tokens, temperature, model
+        )
+        if system:
+            prompt = system + prompt
+
+        stream = json_response and self.stream_json
+
+        attempt = 0
+        while True:
+            await self._bucket.acquire()
+            try:
+                async with self.limiter.slot(_call_priority.get()):
+                    text = await self._call(kwargs, prompt, stream)
+            except Exception as e:
+                if not is_throttling_error(e):
+                    raise
+                self.limiter.on_throttle()
+                if attempt >= self.throttle_retries:
+                    raise
+                # Back off outside the limiter so waiting does not hold a slot
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            self.limiter.on_success()
+            return text
+
+    async def _call(self, kwargs: Dict[str, Any], prompt: str, stream: bool) -> str:
+        """One model round trip, recorded in the usage metrics."""
+        started = time.perf_counter()
+        with model_call_span(kwargs["model"]) as span:
+            try:
+                if stream and self._acompletion is not None:
+                    response, text = None, await self._stream_json_async(kwargs)
+                elif stream:
+                    loop = asyncio.get_running_loop()
+                    response, text = None, await loop.run_in_executor(
+                        self._executor, partial(self._stream_json_sync, kwargs)
+                    )
+                elif self._acompletion is not None:
+                    response = await self._acompletion(**kwargs)
+                    text = response.choices[0].message.content
+                else:
+                    loop = asyncio.get_running_loop()
+                    response = await loop.run_in_executor(
+                        self._executor, partial(self._completion, **kwargs)
+                    )
+                    text = response.choices[0].message.content
+            except Exception:
+                record_model_call(kwargs["model"], 0, 0, time.perf_counter() - started, error=True, span=span)
+                raise
+
+            prompt_tokens, completion_tokens = response_token_counts(response, prompt, text)
+            record_model_call(
+                kwargs["model"], prompt_tokens, completion_tokens, time.perf_counter() - started,
+                span=span, cached_tokens=cached_prompt_tokens(response)
+            )
+        return text
+
+    async def _stream_json_async(self, kwargs: Dict[str, Any]) -> str:
+        """Stream a completion until its first JSON object closes."""
+        scanner = JsonObjectScanner()
+        stream = await self._acompletion(**kwargs, stream=True)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content and scanner.feed(chunk.choices[0].delta.content):
+                    break
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        return scanner.object_text() or scanner.text
+
+    def _stream_json_sync(self, kwargs: Dict[str, Any]) -> str:
+        scanner = JsonObjectScanner()
+        stream = self._completion(**kwargs, stream=True)
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content and scanner.feed(chunk.choices[0].delta.content):
+                    break
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        return scanner.object_text() or scanner.text
+
+    def close(self):
+        """Release the fallback thread pool, if one was created."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def _configure_aws_credentials():
+    """Make sure LiteLLM sees the AWS region even when only credentials are set."""
+    os.environ.setdefault("AWS_REGION_NAME", "us-east-1")
+
+
+_client: Optional[ModelClient] = None
+
+def get_model_client() -> ModelClient:
+    """Return the process-wide model client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = ModelClient()
+        logger.info(f"🤖 Model client ready: {_client.model} (max {_client.max_concurrency} concurrent calls, {_client.max_qps or 'unlimited'} calls/sec, {_client.mode} mode)")
+    return _client
+
+def set_model_client(client: Optional[ModelClient]):
+    """Replace the process-wide model client (used by benchmarks and tooling)."""
+    global _client
+    _client = client
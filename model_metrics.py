@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Model Usage Metrics
+Token, cost, latency, retry and cache accounting for model calls, escalations
+per model tier, and queue latency per priority lane, exported as OpenTelemetry metrics and spans when
+available and as Prometheus text
+"""
+
+import contextlib
+import contextvars
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from opentelemetry import metrics as otel_metrics
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_metrics = None
+    otel_trace = None
+
+# USD per 1K tokens; defaults are Claude 3 Sonnet on-demand Bedrock pricing
+PRICE_INPUT_PER_1K = float(os.getenv("MODEL_PRICE_INPUT_PER_1K", "0.003"))
+PRICE_OUTPUT_PER_1K = float(os.getenv("MODEL_PRICE_OUTPUT_PER_1K", "0.015"))
+# Prompt tokens read from the provider's prompt cache are billed at a tenth of the input price
+PRICE_CACHED_INPUT_PER_1K = float(os.getenv("MODEL_PRICE_CACHED_INPUT_PER_1K", str(PRICE_INPUT_PER_1K / 10)))
+
+CACHE_STATUSES = ("hit", "miss", "bypass")
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """USD cost of a call; ``cached_tokens`` of the prompt tokens were prompt cache reads."""
+    return (
+        (prompt_tokens - cached_tokens) / 1000 * PRICE_INPUT_PER_1K
+        + cached_tokens / 1000 * PRICE_CACHED_INPUT_PER_1K
+        + completion_tokens / 1000 * PRICE_OUTPUT_PER_1K
+    )
+
+def response_token_counts(response: Any, prompt: str, text: str) -> Tuple[int, int]:
+    """Prompt and completion tokens reported by the provider, estimated from length when missing."""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) if usage is not None else None
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+    if not prompt_tokens:
+        prompt_tokens = len(prompt) // 4
+    if not completion_tokens:
+        completion_tokens = len(text or "") // 4
+    return int(prompt_tokens), int(completion_tokens)
+
+def cached_prompt_tokens(response: Any) -> int:
+    """Prompt tokens the provider served from its prompt cache (0 when not reported)."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if not cached:
+        cached = getattr(usage, "cache_read_input_tokens", None)
+    return int(cached or 0)
+
+# ============================================================================
+# PER-STEP USAGE
+# ============================================================================
+
+class ModelUsage:
+    """Model calls made by one activity attempt (one workflow step, or one chunk of it)."""
+
+    def __init__(self, step: str, attempt: int = 1):
+        self.step = step
+        self.attempt = attempt
+        self.model: Optional[str] = None
+        self.cache_status: Optional[str] = None
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.latency_seconds = 0.0
+        self.tiers: Dict[str, Dict[str, Any]] = {}
+
+    def add_call(self, model: str, prompt_tokens: int, completion_tokens: int, latency_seconds: float, error: bool = False, cached_tokens: int = 0):
+        self.model = model
+        self.latency_seconds += latency_seconds
+        if error:
+            self.errors += 1
+            return
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+
+    def add_tier_attempt(self, tier: str, escalated: bool, latency_seconds: float):
+        entry = self.tiers.setdefault(tier, _empty_tier())
+        entry["attempts"] += 1
+        entry["escalations"] += int(escalated)
+        entry["latency_seconds"] += latency_seconds
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "step": self.step,
+            "model": self.model,
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.attempt - 1,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cost_usd": round(estimate_cost(self.prompt_tokens, self.completion_tokens, self.cached_tokens), 6),
+            "model_latency_seconds": round(self.latency_seconds, 4),
+            "cache": {status: int(self.cache_status == status) for status in CACHE_STATUSES},
+            "tiers": {tier: {**entry, "latency_seconds": round(entry["latency_seconds"], 4)} for tier, entry in self.tiers.items()}
+        }
+
+
+_current_usage: contextvars.ContextVar[Optional[ModelUsage]] = contextvars.ContextVar("model_usage", default=None)
+
+@contextlib.contextmanager
+def track_model_usage(step: str, attempt: int = 1):
+    """Attribute model calls made inside the block to one step, then record them."""
+    usage = ModelUsage(step, attempt)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        get_model_metrics().record_usage(usage.summary())
+
+def set_cache_status(status: str):
+    """Mark whether the current step was served from the result cache."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.cache_status = status
+
+def record_model_call(
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency_seconds: float,
+    error: bool = False,
+    span: Any = None,
+    cached_tokens: int = 0
+):
+    """Record one model round trip against the current step and the OpenTelemetry instruments."""
+    usage = _current_usage.get()
+    step = usage.step if usage is not None else "unscoped"
+    if usage is not None:
+        usage.add_call(model, prompt_tokens, completion_tokens, latency_seconds, error, cached_tokens)
+
+    instruments = _otel_instruments()
+    if instruments is not None:
+        attributes = {"step": step, "model": model, "error": error}
+        instruments["calls"].add(1, attributes)
+        instruments["latency"].record(latency_seconds, attributes)
+        if not error:
+            instruments["tokens"].add(prompt_tokens, {**attributes, "direction": "input"})
+            instruments["tokens"].add(completion_tokens, {**attributes, "direction": "output"})
+            instruments["tokens"].add(cached_tokens, {**attributes, "direction": "cached_input"})
+            instruments["cost"].add(estimate_cost(prompt_tokens, completion_tokens, cached_tokens), attributes)
+    if span is not None:
+        span.set_attribute("medical_coding.step", step)
+        span.set_attribute("gen_ai.usage.input_tokens", prompt_tokens)
+        span.set_attribute("gen_ai.usage.output_tokens", completion_tokens)
+        span.set_attribute("gen_ai.usage.cache_read_input_tokens", cached_tokens)
+
+def record_tier_attempt(tier: str, escalated: bool, latency_seconds: float):
+    """Record one pass of the current step on a model tier, and whether it was escalated to the next tier."""
+    usage = _current_usage.get()
+    step = usage.step if usage is not None else "unscoped"
+    if usage is not None:
+        usage.add_tier_attempt(tier, escalated, latency_seconds)
+
+    instruments = _otel_instruments()
+    if instruments is not None:
+        attributes = {"step": step, "tier": tier, "escalated": escalated}
+        instruments["tier_attempts"].add(1, attributes)
+        instruments["tier_latency"].record(latency_seconds, attributes)
+
+def model_call_span(model: str):
+    """An OpenTelemetry span around one model call, or a no-op without the SDK."""
+    if otel_trace is None:
+        return contextlib.nullcontext()
+    return otel_trace.get_tracer("medical_coding").start_as_current_span(
+        "model.complete", attributes={"gen_ai.request.model": model}
+    )
+
+def summarize_model_usage(usages: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-step and total calls, tokens, cost, latency, retries and cache outcomes of one document."""
+    steps: Dict[str, Dict[str, Any]] = {}
+    total = _empty_totals()
+    for usage in usages:
+        entry = steps.setdefault(usage["step"], _empty_totals())
+        if usage.get("model"):
+            entry["model"] = usage["model"]
+        for target in (entry, total):
+            _add_usage(target, usage)
+    return {"steps": steps, "total": total}
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "calls": 0, "errors": 0, "retries": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0, "total_tokens": 0,
+        "cost_usd": 0.0, "model_latency_seconds": 0.0,
+        "cache": {status: 0 for status in CACHE_STATUSES},
+        "tiers": {}
+    }
+
+def _empty_tier() -> Dict[str, Any]:
+    return {"attempts": 0, "escalations": 0, "latency_seconds": 0.0}
+
+def _add_usage(target: Dict[str, Any], usage: Dict[str, Any]):
+    for field in ("calls", "errors", "retries", "prompt_tokens", "completion_tokens", "cached_prompt_tokens", "total_tokens"):
+        target[field] += usage.get(field, 0)
+    target["cost_usd"] = round(target["cost_usd"] + usage.get("cost_usd", 0.0), 6)
+    target["model_latency_seconds"] = round(target["model_latency_seconds"] + usage.get("model_latency_seconds", 0.0), 4)
+    for status in CACHE_STATUSES:
+        target["cache"][status] += usage.get("cache", {}).get(status, 0)
+    for tier, counts in (usage.get("tiers") or {}).items():
+        entry = target["tiers"].setdefault(tier, _empty_tier())
+        entry["attempts"] += counts.get("attempts", 0)
+        entry["escalations"] += counts.get("escalations", 0)
+        entry["latency_seconds"] = round(entry["latency_seconds"] + counts.get("latency_seconds", 0.0), 4)
+
+# ============================================================================
+# PROCESS-WIDE AGGREGATES
+# ============================================================================
+
+_instruments: Optional[Dict[str, Any]] = None
+
+def _otel_instruments() -> Optional[Dict[str, Any]]:
+    global _instruments
+    if otel_metrics is None:
+        return None
+    if _instruments is None:
+        meter = otel_metrics.get_meter("medical_coding")
+        _instruments = {
+            "calls": meter.create_counter("medical_coding.model.calls", description="Model calls"),
+            "tokens": meter.create_counter("medical_coding.model.tokens", unit="{token}", description="Prompt and completion tokens"),
+            "cost": meter.create_counter("medical_coding.model.cost", unit="USD", description="Estimated model cost"),
+            "latency": meter.create_histogram("medical_coding.model.latency", unit="s", description="Model call latency"),
+            "queue_latency": meter.create_histogram("medical_coding.queue.latency", unit="s", description="Task queue latency per priority lane"),
+            "tier_attempts": meter.create_counter("medical_coding.tier.attempts", description="Step passes per model tier, by whether they escalated"),
+            "tier_latency": meter.create_histogram("medical_coding.tier.latency", unit="s", description="Step latency per model tier pass")
+        }
+    return _instruments
+
+
+class ModelMetrics:
+    """Running per-step totals and recent latency samples for this process.
+
+    Workers feed it from every tracked activity; the web tier feeds it from the
+    cost breakdown of each completed workflow result.
+    """
+
+    LATENCY_SAMPLES = 4096
+
+    def __init__(self):
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self._latencies: Dict[str, deque] = {}
+        self._queues: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._tier_latencies: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+
+    def record_usage(self, usage: Dict[str, Any]):
+        with self._lock:
+            entry = self._steps.setdefault(usage["step"], _empty_totals())
+            _add_usage(entry, usage)
+            if usage.get("calls"):
+                self._latencies.setdefault(usage["step"], deque(maxlen=self.LATENCY_SAMPLES)).append(usage["model_latency_seconds"])
+            for tier, counts in (usage.get("tiers") or {}).items():
+                if counts.get("attempts"):
+                    samples = self._tier_latencies.setdefault((usage["step"], tier), deque(maxlen=self.LATENCY_SAMPLES))
+                    samples.append(counts["latency_seconds"] / counts["attempts"])
+
+    def record_queue_latency(self, lane: str, kind: str, seconds: float):
+        """Record how long a task waited in a lane's task queue.
+
+        ``kind`` is "workflow" (start to first workflow task) or "activity"
+        (scheduled to started, per model activity attempt).
+        """
+        seconds = max(0.0, seconds)
+        with self._lock:
+            entry = self._queues.setdefault((lane, kind), {"count": 0, "sum": 0.0, "samples": deque(maxlen=self.LATENCY_SAMPLES)})
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["samples"].append(seconds)
+        instruments = _otel_instruments()
+        if instruments is not None:
+            instruments["queue_latency"].record(seconds, {"lane": lane, "kind": kind})
+
+    def record_breakdown(self, breakdown: Optional[Dict[str, Any]]):
+        """Fold in the per-step usage of one completed document."""
+        for step, usage in ((breakdown or {}).get("steps") or {}).items():
+            self.record_usage({**usage, "step": step})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {
+                step: {**entry, "cache": dict(entry["cache"]), "tiers": {tier: dict(counts) for tier, counts in entry["tiers"].items()}}
+                for step, entry in self._steps.items()
+            }
+            latencies = {step: sorted(samples) for step, samples in self._latencies.items()}
+            tier_latencies = {key: sorted(samples) for key, samples in self._tier_latencies.items()}
+            queue_entries = {key: (entry["count"], entry["sum"], sorted(entry["samples"])) for key, entry in self._queues.items()}
+
+        def percentile(samples: List[float], p: float):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 4) if samples else None
+
+        total = _empty_totals()
+        for step, entry in steps.items():
+            _add_usage(total, entry)
+            samples = latencies.get(step, [])
+            entry["model_latency_seconds_percentiles"] = {
+                "p50": percentile(samples, 0.50),
+                "p95": percentile(samples, 0.95),
+                "p99": percentile(samples, 0.99),
+                "samples": len(samples)
+            }
+            for tier, counts in entry["tiers"].items():
+                samples = tier_latencies.get((step, tier), [])
+                counts["escalation_rate"] = round(counts["escalations"] / counts["attempts"], 4) if counts["attempts"] else None
+                counts["latency_seconds_percentiles"] = {
+                    "p50": percentile(samples, 0.50),
+                    "p95": percentile(samples, 0.95),
+                    "p99": percentile(samples, 0.99)
+                }
+        queues: Dict[str, Dict[str, Any]] = {}
+        for (lane, kind), (count, seconds, samples) in sorted(queue_entries.items()):
+            queues.setdefault(lane, {})[kind] = {
+                "count": count,
+                "sum_seconds": round(seconds, 4),
+                "mean_seconds": round(seconds / count, 4) if count else None,
+                "p50": percentile(samples, 0.50),
+                "p95": percentile(samples, 0.95),
+                "p99": percentile(samples, 0.99)
+            }
+        return {"steps": steps, "total": total, "queues": queues}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the per-step totals."""
+        stats = self.stats()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, values: List[Any]):
+            lines.append(f"# HELP medical_coding_{name} {help_text}")
+            lines.append(f"# TYPE medical_coding_{name} {kind}")
+            for labels, value in values:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"medical_coding_{name}{{{label_text}}} {value}")
+
+        steps = stats["steps"]
+        metric("model_calls_total", "counter", "Model calls per workflow step",
+               [({"step": step}, entry["calls"]) for step, entry in steps.items()])
+        metric("model_errors_total", "counter", "Failed model calls per workflow step",
+               [({"step": step}, entry["errors"]) for step, entry in steps.items()])
+        metric("activity_retries_total", "counter", "Activity retry attempts per workflow step",
+               [({"step": step}, entry["retries"]) for step, entry in steps.items()])
+        metric("model_tokens_total", "counter", "Prompt and completion tokens per workflow step",
+               [({"step": step, "direction": "input"}, entry["prompt_tokens"]) for step, entry in steps.items()]
+               + [({"step": step, "direction": "output"}, entry["completion_tokens"]) for step, entry in steps.items()]
+               + [({"step": step, "direction": "cached_input"}, entry["cached_prompt_tokens"]) for step, entry in steps.items()])
+        metric("model_cost_usd_total", "counter", "Estimated model cost in USD per workflow step",
+               [({"step": step}, entry["cost_usd"]) for step, entry in steps.items()])
+        metric("cache_lookups_total", "counter", "Result cache outcomes per workflow step",
+               [({"step": step, "status": status}, entry["cache"][status]) for step, entry in steps.items() for status in CACHE_STATUSES])
+        metric("model_latency_seconds", "summary", "Model latency per step execution",
+               [({"step": step, "quantile": q}, entry["model_latency_seconds_percentiles"][key])
+                for step, entry in steps.items()
+                for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))
+                if entry["model_latency_seconds_percentiles"][key] is not None])
+        tiers = [(step, tier, counts) for step, entry in steps.items() for tier, counts in entry["tiers"].items()]
+        metric("tier_attempts_total", "counter", "Step passes per model tier",
+               [({"step": step, "tier": tier}, counts["attempts"]) for step, tier, counts in tiers])
+        metric("tier_escalations_total", "counter", "Step passes escalated to the next model tier",
+               [({"step": step, "tier": tier}, counts["escalations"]) for step, tier, counts in tiers])
+        metric("tier_latency_seconds", "summary", "Latency of one step pass per model tier",
+               [({"step": step, "tier": tier, "quantile": q}, counts["latency_seconds_percentiles"][key])
+                for step, tier, counts in tiers
+                for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))
+                if counts["latency_seconds_percentiles"][key] is not None])
+        queues = [(lane, kind, entry) for lane, kinds in stats["queues"].items() for kind, entry in kinds.items()]
+        metric("queue_latency_seconds", "summary", "Task queue latency per priority lane",
+               [({"lane": lane, "kind": kind, "quantile": q}, entry[key])
+                for lane, kind, entry in queues
+                for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))
+                if entry[key] is not None])
+        lines.extend(f'medical_coding_queue_latency_seconds_count{{lane="{lane}",kind="{kind}"}} {entry["count"]}' for lane, kind, entry in queues)
+        lines.extend(f'medical_coding_queue_latency_seconds_sum{{lane="{lane}",kind="{kind}"}} {entry["sum_seconds"]}' for lane, kind, entry in queues)
+        return "\n".join(lines) + "\n"
+
+
+_metrics: Optional[ModelMetrics] = None
+_metrics_lock = threading.Lock()
+
+def get_model_metrics() -> ModelMetrics:
+    """Return the process-wide model usage aggregates."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = ModelMetrics()
+    return _metrics
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Model Tiers
+Per-step model cascade: a step's first pass runs on a small, fast model and is
+escalated to the next tier only when its parsed result fails the step's checks
+(unparseable response, low confidence, local code rule errors)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, TypeVar
+
+from model_metrics import record_tier_attempt
+from response_parsing import ResponseParseError
+
+logger = logging.getLogger(__name__)
+
+CASCADE_STEPS = ("analysis", "coding", "extraction", "validation")
+
+# First-pass results whose confidence falls below this are escalated
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+T = TypeVar("T")
+
+class ModelTier(NamedTuple):
+    """One rung of the cascade; ``model`` None means the model client's default model."""
+    name: str
+    model: Optional[str]
+
+# ============================================================================
+# TIER POLICY
+# ============================================================================
+
+def _pairs(spec: str) -> List[List[str]]:
+    return [[part.strip() for part in item.split("=", 1)] for item in spec.split(",") if item.strip()]
+
+def parse_tiers(spec: Optional[str]) -> List[ModelTier]:
+    """Tiers from ``name=model,name=model`` (cheapest first); a bare model is named after itself."""
+    tiers = [ModelTier(pair[0], pair[1]) if len(pair) == 2 else ModelTier(pair[0], pair[0]) for pair in _pairs(spec or "")]
+    return tiers or [ModelTier("default", None)]
+
+def parse_step_values(spec: Optional[str], default: Any, cast: Callable[[str], Any] = str) -> Dict[str, Any]:
+    """Per-step settings from ``step=value,...``; a bare value applies to every step."""
+    values = {step: default for step in CASCADE_STEPS}
+    for pair in _pairs(spec or ""):
+        if len(pair) == 1:
+            values = {step: cast(pair[0]) for step in CASCADE_STEPS}
+        elif pair[0] not in CASCADE_STEPS:
+            raise ValueError(f"Unknown step in model tier settings: {pair[0]} (expected {', '.join(CASCADE_STEPS)})")
+        else:
+            values[pair[0]] = cast(pair[1])
+    return values
+
+
+class TierPolicy:
+    """Which tiers each step tries, in order, and the confidence a result needs to stop there.
+
+    Every step starts at ``start[step]`` (the first tier by default) and may
+    escalate through the tiers after it. A step started at the last tier never
+    escalates, which is today's single-model behaviour.
+    """
+
+    def __init__(self, tiers: List[ModelTier], start: Optional[Dict[str, str]] = None, min_confidence: Optional[Dict[str, float]] = None):
+        self.tiers = tiers
+        names = [tier.name for tier in tiers]
+        self.start = {step: (start or {}).get(step) or names[0] for step in CASCADE_STEPS}
+        unknown = sorted({name for name in self.start.values() if name not in names})
+        if unknown:
+            raise ValueError(f"Unknown model tiers in MODEL_TIER_START: {', '.join(unknown)} (expected {', '.join(names)})")
+        self.min_confidence = {step: (min_confidence or {}).get(step, DEFAULT_MIN_CONFIDENCE) for step in CASCADE_STEPS}
+
+    def tiers_for(self, step: str) -> List[ModelTier]:
+        names = [tier.name for tier in self.tiers]
+        return self.tiers[names.index(self.start.get(step, names[-1])):]
+
+    def cache_model(self, default_model: str) -> str:
+        """Model part of result cache keys: the tier models, so changing the cascade invalidates cached results."""
+        if len(self.tiers) == 1:
+            return self.tiers[0].model or default_model
+        return "+".join(tier.model or default_model for tier in self.tiers)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "tiers": [{"name": tier.name, "model": tier.model} for tier in self.tiers],
+            "start": dict(self.start),
+            "min_confidence": dict(self.min_confidence)
+        }
+
+
+_policy: Optional[TierPolicy] = None
+_policy_lock = threading.Lock()
+
+def get_tier_policy() -> TierPolicy:
+    """Return the process-wide tier policy configured from the environment.
+
+    MODEL_TIERS lists the tiers cheapest first (unset: one tier, the model
+    client's model); MODEL_TIER_START names the tier each step starts at and
+    MODEL_TIER_MIN_CONFIDENCE the confidence below which a result is escalated.
+    """
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = TierPolicy(
+                parse_tiers(os.getenv("MODEL_TIERS")),
+                parse_step_values(os.getenv("MODEL_TIER_START"), None),
+                parse_step_values(os.getenv("MODEL_TIER_MIN_CONFIDENCE"), DEFAULT_MIN_CONFIDENCE, float)
+            )
+            if len(_policy.tiers) > 1:
+                logger.info(f"🪜 Model tiers: {' → '.join(f'{tier.name} ({tier.model})' for tier in _policy.tiers)}")
+    return _policy
+
+def set_tier_policy(policy: Optional[TierPolicy]):
+    """Replace the process-wide tier policy (None re-reads the environment; used by benchmarks and tooling)."""
+    global _policy
+    with _policy_lock:
+        _policy = policy
+
+# ============================================================================
+# CASCADE
+# ============================================================================
+
+async def run_cascade(
+    step: str,
+    attempt: Callable[[Optional[str]], Awaitable[T]],
+    check: Callable[[T, float], Optional[str]]
+) -> T:
+    """Run ``attempt(model)`` on each of the step's tiers until a result passes ``check``.
+
+    ``check(result, min_confidence)`` returns the reason to escalate, or None to
+    accept. An unparseable response also escalates; other errors (throttling,
+    outages) propagate to the activity's retry policy. The last tier's result
+    is returned unchecked. Each tier's outcome and latency is recorded against
+    the current step.
+    """
+    policy = get_tier_policy()
+    tiers = policy.tiers_for(step)
+    for position, tier in enumerate(tiers):
+        last = position == len(tiers) - 1
+        started = time.perf_counter()
+        try:
+            result = await attempt(tier.model)
+        except ResponseParseError as e:
+            record_tier_attempt(tier.name, escalated=not last, latency_seconds=time.perf_counter() - started)
+            if last:
+                raise
+            reason = f"unusable response ({e})"
+        else:
+            reason = None if last else check(result, policy.min_confidence.get(step, DEFAULT_MIN_CONFIDENCE))
+            record_tier_attempt(tier.name, escalated=reason is not None, latency_seconds=time.perf_counter() - started)
+            if reason is None:
+                return result
+        logger.info(f"🪜 Escalating {step} from {tier.name} to {tiers[position + 1].name}: {reason}")
+    raise AssertionError("unreachable: the last tier either returns or raises")
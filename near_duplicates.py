@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Documents
+MinHash signatures and an LSH index over submitted note text, so copy-forward
+notes that differ by a few lines can reuse an earlier note's coding, plus the
+diff check that decides whether reusing it is safe
+"""
+
+import difflib
+import glob
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from blob_store import BlobNotFound, BlobStore, FileBlobBackend, MemoryBlobBackend, get_blob_store
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above roughly 0.7 Jaccard similarity share a band
+BANDS = 16
+SHINGLE_WORDS = 3
+# Recent inserts are scanned linearly and merged into the sorted band keys this often
+COMPACT_EVERY = 16384
+# A bucket shared by many notes (boilerplate) contributes only its newest entries
+MAX_BUCKET_CANDIDATES = 256
+
+REUSE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_REUSE_THRESHOLD", "0.9"))
+REFERENCE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_REFERENCE_THRESHOLD", "0.75"))
+# Reuse is refused when added and removed text exceed this share of the note
+MAX_CHANGED_RATIO = 0.2
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# ============================================================================
+# MINHASH LSH INDEX
+# ============================================================================
+
+class MinHashLSHIndex:
+    """MinHash LSH index over word-shingle sets.
+
+    Band keys of every entry live in one sorted uint64 array (band number in the
+    high 32 bits), so a query is two ``searchsorted`` calls; recent inserts wait
+    in a small buffer until the next merge. Each entry keeps only the low 8 bits
+    of its signature (b-bit MinHash), enough to estimate similarity in 128 bytes.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1, compact_every: int = COMPACT_EVERY):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm, self.bands, self.seed, self.compact_every = num_perm, bands, seed, compact_every
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) mod 2^64, top 32 bits, with odd a
+        self._a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._mix = rng.integers(1, 1 << 32, self.rows, dtype=np.uint64) | np.uint64(1)
+        self._band_tags = np.arange(bands, dtype=np.uint64) << np.uint64(32)
+
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int32)
+        self._pending_keys = np.empty((compact_every, bands), dtype=np.uint64)
+        self._pending_ids = np.empty(compact_every, dtype=np.int32)
+        self._pending = 0
+
+        self._sketches = np.empty((1024, num_perm), dtype=np.uint8)
+        self._digests = np.empty((1024, 32), dtype=np.uint8)
+        self._workflow_ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._workflow_ids)
+
+    # ------------------------------------------------------------------ hashing
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint32 per permutation) of the note's word 3-gram set."""
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        hashes = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+        if len(hashes) >= SHINGLE_WORDS:
+            hashes = (hashes[:-2] * np.uint64(0x9E3779B1) + hashes[1:-1] * np.uint64(0x85EBCA77) + hashes[2:]) & np.uint64(0xFFFFFFFF)
+        if len(hashes) == 0:
+            hashes = np.zeros(1, dtype=np.uint64)
+        shingles = np.unique(hashes)
+        return ((np.outer(shingles, self._a) + self._b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> np.ndarray:
+        rows = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        return ((rows * self._mix).sum(axis=1) & np.uint64(0xFFFFFFFF)) | self._band_tags
+
+    def similarity(self, signature: np.ndarray, entry_ids: np.ndarray) -> np.ndarray:
+        """Estimated Jaccard similarity to stored entries from their 8-bit sketches."""
+        matches = (self._sketches[entry_ids] == (signature & 0xFF).astype(np.uint8)).mean(axis=1)
+        # Unrelated sets still agree on 1 in 256 low bytes
+        return np.clip((matches - 1 / 256) / (1 - 1 / 256), 0.0, 1.0)
+
+    # ---------------------------------------------------------------- insert/query
+
+    def add(self, signature: np.ndarray, workflow_id: str, blob_key: str) -> int:
+        """Index a note by its signature; ``blob_key`` names its text in the blob store."""
+        with self._lock:
+            entry_id = len(self._workflow_ids)
+            if entry_id == len(self._sketches):
+                self._sketches = np.concatenate([self._sketches, np.empty_like(self._sketches)])
+                self._digests = np.concatenate([self._digests, np.empty_like(self._digests)])
+            self._sketches[entry_id] = signature & 0xFF
+            self._digests[entry_id] = np.frombuffer(bytes.fromhex(blob_key.split(":", 1)[-1]), dtype=np.uint8)
+            self._workflow_ids.append(workflow_id)
+
+            self._pending_keys[self._pending] = self._band_keys(signature)
+            self._pending_ids[self._pending] = entry_id
+            self._pending += 1
+            if self._pending == self.compact_every:
+                self._compact()
+            return entry_id
+
+    def _compact(self):
+        """Merge buffered band keys into the sorted arrays."""
+        if not self._pending:
+            return
+        new_keys = self._pending_keys[:self._pending].ravel()
+        new_ids = np.repeat(self._pending_ids[:self._pending], self.bands)
+        order = np.argsort(new_keys, kind="stable")
+        new_keys, new_ids = new_keys[order], new_ids[order]
+        # Inserting after equal keys keeps each bucket in insertion order, newest last
+        positions = np.searchsorted(self._keys, new_keys, side="right")
+        self._keys = np.insert(self._keys, positions, new_keys)
+        self._ids = np.insert(self._ids, positions, new_ids)
+        self._pending = 0
+
+    def query(self, signature: np.ndarray, min_similarity: float, limit: int = 5) -> List[Dict[str, Any]]:
+        """Stored notes sharing a band with the signature, at or above ``min_similarity``, most similar first."""
+        keys = self._band_keys(signature)
+        with self._lock:
+            lo = np.searchsorted(self._keys, keys, side="left")
+            hi = np.searchsorted(self._keys, keys, side="right")
+            groups = [self._ids[max(start, end - MAX_BUCKET_CANDIDATES):end] for start, end in zip(lo, hi) if end > start]
+            if self._pending:
+                hits = (self._pending_keys[:self._pending] == keys).any(axis=1)
+                groups.append(self._pending_ids[:self._pending][hits])
+            if not groups:
+                return []
+            candidates = np.unique(np.concatenate(groups))
+            scores = self.similarity(signature, candidates)
+            keep = np.nonzero(scores >= min_similarity)[0]
+            best = keep[np.argsort(-scores[keep], kind="stable")][:limit]
+            return [
+                {
+                    "workflow_id": self._workflow_ids[candidates[i]],
+                    "blob": f"sha256:{self._digests[candidates[i]].tobytes().hex()}",
+                    "similarity": round(float(scores[i]), 3)
+                }
+                for i in best
+            ]
+
+    def merge(self, other: "MinHashLSHIndex") -> int:
+        """Add the entries of an index built with the same hash parameters, skipping known workflows.
+
+        Returns the number of entries added.
+        """
+        if (other.num_perm, other.bands, other.seed) != (self.num_perm, self.bands, self.seed):
+            raise ValueError("cannot merge MinHash indexes with different hash parameters")
+        with self._lock, other._lock:
+            self._compact()
+            other._compact()
+            known = set(self._workflow_ids)
+            keep = np.fromiter((workflow_id not in known for workflow_id in other._workflow_ids), dtype=bool, count=len(other._workflow_ids))
+            added = int(keep.sum())
+            if not added:
+                return 0
+            count = len(self._workflow_ids)
+            new_ids = np.full(len(keep), -1, dtype=np.int32)
+            new_ids[keep] = np.arange(count, count + added, dtype=np.int32)
+            entries = keep[other._ids]
+            keys = np.concatenate([self._keys, other._keys[entries]])
+            ids = np.concatenate([self._ids, new_ids[other._ids[entries]]])
+            order = np.argsort(keys, kind="stable")
+            self._keys, self._ids = keys[order], ids[order]
+
+            self._sketches = np.concatenate([self._sketches[:count], other._sketches[:len(keep)][keep]])
+            self._digests = np.concatenate([self._digests[:count], other._digests[:len(keep)][keep]])
+            self._workflow_ids += [workflow_id for workflow_id, new in zip(other._workflow_ids, keep) if new]
+            return added
+
+    # ----------------------------------------------------------------- persistence
+
+    def save(self, path: str):
+        """Write the index to ``path`` (npz), replacing any earlier snapshot atomically."""
+        with self._lock:
+            self._compact()
+            count = len(self._workflow_ids)
+            buffer = io.BytesIO()
+            np.savez(
+                buffer,
+                params=np.array([self.num_perm, self.bands, self.seed, self.compact_every], dtype=np.int64),
+                keys=self._keys, ids=self._ids,
+                sketches=self._sketches[:count], digests=self._digests[:count],
+                workflow_ids=np.frombuffer("\n".join(self._workflow_ids).encode("utf-8"), dtype=np.uint8)
+            )
+        # A unique temp file, so concurrent saves never write into each other's snapshot
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(buffer.getbuffer())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "MinHashLSHIndex":
+        with np.load(path) as data:
+            num_perm, bands, seed, compact_every = (int(value) for value in data["params"])
+            index = cls(num_perm, bands, seed, compact_every)
+            index._keys, index._ids = data["keys"], data["ids"]
+            index._sketches, index._digests = data["sketches"], data["digests"]
+            workflow_ids = data["workflow_ids"].tobytes().decode("utf-8")
+            index._workflow_ids = workflow_ids.split("\n") if workflow_ids else []
+        if not len(index._sketches):
+            index._sketches = np.empty((1024, num_perm), dtype=np.uint8)
+            index._digests = np.empty((1024, 32), dtype=np.uint8)
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self._workflow_ids),
+                "band_keys": int(len(self._keys) + self._pending * self.bands),
+                "memory_bytes": int(self._keys.nbytes + self._ids.nbytes + self._pending_keys.nbytes
+                                    + self._sketches.nbytes + self._digests.nbytes)
+            }
+
+# ============================================================================
+# DIFF VERIFICATION
+# ============================================================================
+
+SEGMENT_SPLIT = re.compile(r"\n+|(?<=[.;])\s+")
+
+# Added text with these cues may carry a finding the earlier coding lacks
+FINDING_CUES = re.compile(
+    r"\b(?:diagnos[a-z]*|assessment|impression|presents?\s+(?:with|for)|admitted\s+(?:with|for)|history\s+of"
+    r"|new(?:ly)?\s+(?:onset|diagnosed)|acute|chronic|suspected|rule\s+out|r/o|status\s+post|s/p|procedure"
+    r"|surgery|biopsy|fracture|infection|syndrome|disease|disorder|failure|cancer|carcinoma"
+    r"|[a-z]+(?:itis|emia|osis|pathy|oma))\b",
+    re.IGNORECASE
+)
+
+def _segments(text: str) -> List[str]:
+    return [segment.strip() for segment in SEGMENT_SPLIT.split(text) if segment.strip()]
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def verify_copy_forward(prior_text: str, text: str, prior_codes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Check that a note's differences from an earlier note leave that note's coding intact.
+
+    The notes are diffed by sentence. Reuse is refused when added sentences
+    carry finding cues, when a code's evidence is gone from the new note, or when
+    too much of the note changed.
+    """
+    prior_segments, segments = _segments(prior_text), _segments(text)
+    matcher = difflib.SequenceMatcher(None, prior_segments, segments, autojunk=False)
+    added: List[str] = []
+    removed: List[str] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed += prior_segments[i1:i2]
+        if tag in ("replace", "insert"):
+            added += segments[j1:j2]
+
+    reasons = []
+    for segment in added:
+        cue = FINDING_CUES.search(segment)
+        if cue:
+            reasons.append(f"added text mentions '{cue.group(0)}': {segment[:80]}")
+    normalized = _normalize(text)
+    for code in prior_codes:
+        evidence = _normalize(code.get("evidence") or "")
+        if evidence and evidence not in normalized:
+            reasons.append(f"evidence for {code.get('code')} is no longer in the note")
+    # A rewritten sentence counts once, not as a removal plus an addition
+    changed_ratio = max(sum(map(len, added)), sum(map(len, removed))) / max(len(text), 1)
+    if changed_ratio > MAX_CHANGED_RATIO:
+        reasons.append(f"{changed_ratio:.0%} of the note changed")
+
+    return {
+        "verified": not reasons,
+        "added_segments": len(added),
+        "removed_segments": len(removed),
+        "changed_ratio": round(changed_ratio, 3),
+        "reasons": reasons
+    }
+
+# ============================================================================
+# DETECTOR
+# ============================================================================
+
+class NearDuplicateDetector:
+    """MinHash LSH index of submitted notes, with their texts kept in a blob store for diff checks."""
+
+    def __init__(self, index: MinHashLSHIndex, text_store: BlobStore, path: Optional[str] = None, save_every: int = 1000):
+        self.index = index
+        self.text_store = text_store
+        self.path = path
+        self.save_every = save_every
+        self._unsaved = 0
+        self._saving = threading.Lock()
+
+    def find(self, text: str, min_similarity: float = REFERENCE_THRESHOLD) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """The note's signature and the indexed notes at least ``min_similarity`` similar to it."""
+        signature = self.index.signature(text)
+        return signature, self.index.query(signature, min_similarity)
+
+    def prior_text(self, match: Dict[str, Any]) -> Optional[str]:
+        try:
+            return self.text_store.get_text(match["blob"])
+        except BlobNotFound:
+            return None
+
+    def remember(self, signature: np.ndarray, text: str, workflow_id: str):
+        """Index a submitted note under the workflow that codes it."""
+        # Content-addressed: a note the claim check already stored is not written again
+        self.index.add(signature, workflow_id, self.text_store.put_text(text)["blob"])
+        self._unsaved += 1
+        if self.path and self._unsaved >= self.save_every and self._saving.acquire(blocking=False):
+            self._unsaved = 0
+            threading.Thread(target=self._save_in_background, daemon=True).start()
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        finally:
+            self._saving.release()
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        """This process's snapshot file; each web process saves its own and they are merged on load."""
+        return os.path.join(self.path, f"index-{os.getpid()}.npz") if self.path else None
+
+    def save(self) -> bool:
+        if not self.path:
+            return False
+        try:
+            self.index.save(self.snapshot_path)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not save near-duplicate index: {str(e)}")
+            return False
+
+
+def _snapshot_owner_running(snapshot: str) -> bool:
+    """Whether the process that writes ``snapshot`` (index-<pid>.npz) is still running."""
+    match = re.fullmatch(r"index-(\d+)\.npz", os.path.basename(snapshot))
+    if not match:
+        return False
+    try:
+        os.kill(int(match.group(1)), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def load_snapshots(path: str) -> Tuple[MinHashLSHIndex, List[str]]:
+    """Merge every snapshot under ``path`` (one per web process, plus a legacy index.npz) into one index.
+
+    Returns the index and the snapshot files it was read from.
+    """
+    index = MinHashLSHIndex()
+    snapshots = sorted(glob.glob(os.path.join(path, "index*.npz")))
+    for snapshot in snapshots:
+        try:
+            index.merge(MinHashLSHIndex.load(snapshot))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping near-duplicate snapshot {snapshot}: {str(e)}")
+    return index, snapshots
+
+def _consolidate_snapshots(detector: NearDuplicateDetector, snapshots: List[str]):
+    """Save the merged index as this process's snapshot and drop the ones it now covers.
+
+    Snapshots of web processes that are still running are left for them to keep
+    saving; duplicates across snapshots are skipped on the next merge.
+    """
+    stale = [snapshot for snapshot in snapshots if snapshot != detector.snapshot_path and not _snapshot_owner_running(snapshot)]
+    if not stale or not detector.save():
+        return
+    for snapshot in stale:
+        try:
+            os.remove(snapshot)
+        except FileNotFoundError:
+            pass
+
+
+_detector: Optional[NearDuplicateDetector] = None
+_detector_configured = False
+_detector_lock = threading.Lock()
+
+def get_near_duplicate_detector() -> Optional[NearDuplicateDetector]:
+    """Return the process-wide near-duplicate detector configured from the environment, or None if disabled.
+
+    NEAR_DUPLICATE_INDEX selects ``off`` (default), ``memory`` or ``file``; with
+    ``file`` every web process saves its own snapshot under NEAR_DUPLICATE_INDEX_PATH
+    and all snapshots there are merged when the index is loaded. Note texts
+    go to the blob store when one is configured (BLOB_STORE_BACKEND), otherwise
+    next to the index (or in memory).
+    """
+    global _detector, _detector_configured
+    with _detector_lock:
+        if _detector_configured:
+            return _detector
+
+        mode = os.getenv("NEAR_DUPLICATE_INDEX", "off").lower()
+        if mode in ("memory", "file"):
+            path = os.getenv("NEAR_DUPLICATE_INDEX_PATH", "medical_coding_near_duplicates") if mode == "file" else None
+            index = MinHashLSHIndex()
+            text_store = get_blob_store()
+            if path:
+                os.makedirs(path, exist_ok=True)
+                index, snapshots = load_snapshots(path)
+                text_store = text_store or BlobStore(FileBlobBackend(os.path.join(path, "texts")))
+            _detector = NearDuplicateDetector(index, text_store or BlobStore(MemoryBlobBackend()), path)
+            if path:
+                _consolidate_snapshots(_detector, snapshots)
+            logger.info(f"🪞 Near-duplicate index: {mode}{f' at {path}' if path else ''} ({len(index)} notes)")
+        else:
+            _detector = None
+
+        _detector_configured = True
+        return _detector
+
+def set_near_duplicate_detector(detector: Optional[NearDuplicateDetector]):
+    """Replace the process-wide detector (used by benchmarks and tooling)."""
+    global _detector, _detector_configured
+    with _detector_lock:
+        _detector = detector
+        _detector_configured = True
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Model Prompts
+Each model step's prompt as a static prefix (instructions and response format,
+identical for every document, so providers can cache it) and a compact
+per-document payload (minified JSON holding only the fields the step needs)
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# (static prefix, dynamic payload); the client sends the prefix as the system message
+Prompt = Tuple[str, str]
+
+def compact_json(value: Any) -> str:
+    """Minified JSON for prompt payloads."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def describe_scope(document: Dict[str, Any]) -> str:
+    """How prompts refer to the text: the whole document, or one chunk of a long one."""
+    chunk = document.get("chunk")
+    if not chunk:
+        return "medical document"
+    return f"excerpt (part {chunk['index'] + 1} of {chunk['count']}, sections: {', '.join(chunk['sections'])}) of a longer medical document"
+
+# ============================================================================
+# RESPONSE FORMATS
+# ============================================================================
+
+ANALYSIS_FORMAT = compact_json({
+    "diagnoses": [{"condition": "name", "confidence": 0.95, "evidence": "supporting text", "severity": "mild|moderate|severe"}],
+    "procedures": [{"procedure": "name", "confidence": 0.9, "evidence": "supporting text", "type": "diagnostic|therapeutic"}],
+    "medications": [{"medication": "name", "dosage": "dosage", "indication": "purpose"}],
+    "vital_signs": {"blood_pressure": "value", "heart_rate": "value", "temperature": "value", "oxygen_saturation": "value"}
+})
+
+# Vital signs and dosed medications come from local extraction (clinical_extraction.py)
+FACTS_ANALYSIS_FORMAT = compact_json({
+    "diagnoses": [{"condition": "name", "confidence": 0.95, "evidence": "supporting text", "severity": "mild|moderate|severe"}],
+    "procedures": [{"procedure": "name", "confidence": 0.9, "evidence": "supporting text", "type": "diagnostic|therapeutic"}],
+    "medications": [{"medication": "name", "dosage": "dosage", "indication": "purpose"}]
+})
+
+CODES_FORMAT = compact_json({
+    "diagnosis_codes": [{"code": "ICD10_CM_CODE", "description": "full description", "confidence": 0.95, "evidence": "supporting text", "primary": True, "category": "category"}],
+    "procedure_codes": [{"code": "ICD10_PCS_CODE", "description": "full description", "confidence": 0.9, "evidence": "supporting text", "primary": False, "category": "category"}]
+})
+
+VALIDATION_FORMAT = compact_json({
+    "is_valid": True, "confidence_score": 0.95, "compliance_score": 100, "validation_checks_passed": 3,
+    "errors": [], "warnings": [], "recommendations": ["recommendation text"]
+})
+
+# ============================================================================
+# STATIC PREFIXES
+# ============================================================================
+
+ANALYSIS_INSTRUCTIONS = f"""You are a clinical documentation specialist. Extract clinical information from the medical text in the user message:
+1. Diagnoses with confidence scores and severity
+2. Procedures performed or recommended
+3. Medications mentioned
+4. Vital signs if present
+Quote short supporting text from the document as evidence.
+Respond with JSON only in this format:
+{ANALYSIS_FORMAT}"""
+
+FACTS_ANALYSIS_INSTRUCTIONS = f"""You are a clinical documentation specialist. Extract clinical information from the medical text in the user message:
+1. Diagnoses with confidence scores and severity
+2. Procedures performed or recommended
+3. Medications mentioned, except those listed as already extracted
+Vital signs, lab values and dosed medications are extracted separately; do not repeat them.
+Quote short supporting text from the document as evidence.
+Respond with JSON only in this format:
+{FACTS_ANALYSIS_FORMAT}"""
+
+CODING_INSTRUCTIONS = f"""You are a certified medical coder. Assign specific ICD-10-CM codes for the diagnoses and ICD-10-PCS codes for the procedures in the user message, which lists each finding with its supporting evidence. Use real codes only and mark exactly one diagnosis code as primary.
+Respond with JSON only in this format:
+{CODES_FORMAT}"""
+
+CANDIDATE_CODING_INSTRUCTIONS = f"""You are a certified medical coder. Assign ICD-10-CM diagnosis codes and ICD-10-PCS procedure codes for the clinical findings in the user message. Each finding lists candidate codes retrieved from the official code tables as [code, description] pairs; prefer them and use another code only if none of the candidates fits the evidence. Mark exactly one diagnosis code as primary.
+Respond with JSON only in this format:
+{CODES_FORMAT}"""
+
+FAST_CODING_INSTRUCTIONS = f"""You are a certified medical coder. From the medical text in the user message, extract the clinical findings and assign ICD-10 codes in one pass. Use real ICD-10-CM codes for diagnoses and ICD-10-PCS codes for procedures, quote short supporting text as evidence, and mark exactly one diagnosis code as primary.
+Respond with JSON only in this format:
+{{"analysis":{ANALYSIS_FORMAT},"codes":{CODES_FORMAT}}}"""
+
+FACTS_FAST_CODING_INSTRUCTIONS = f"""You are a certified medical coder. From the medical text in the user message, extract the clinical findings and assign ICD-10 codes in one pass. Use real ICD-10-CM codes for diagnoses and ICD-10-PCS codes for procedures, quote short supporting text as evidence, and mark exactly one diagnosis code as primary. Vital signs, lab values and dosed medications are extracted separately; list only medications not listed as already extracted.
+Respond with JSON only in this format:
+{{"analysis":{FACTS_ANALYSIS_FORMAT},"codes":{CODES_FORMAT}}}"""
+
+VALIDATION_INSTRUCTIONS = f"""You are a medical coding auditor. Validate the ICD-10 codes in the user message, each listed with the document evidence it was assigned from. Check:
+1. Code accuracy and specificity
+2. Compliance with coding guidelines
+3. Completeness of documentation
+4. Appropriate use of primary vs secondary codes
+Respond with JSON only in this format:
+{VALIDATION_FORMAT}"""
+
+# ============================================================================
+# PROMPT BUILDERS
+# ============================================================================
+
+def _findings(items: List[Dict[str, Any]], field: str) -> List[Dict[str, Any]]:
+    return [{field: item.get(field, ""), "evidence": item.get("evidence", "")} for item in items]
+
+def _codes(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"code": item.get("code"), "description": item.get("description"), "primary": bool(item.get("primary")), "evidence": item.get("evidence", "")}
+        for item in items
+    ]
+
+def _document_text(document: Dict[str, Any], facts: Optional[Dict[str, Any]]) -> str:
+    text = f"{describe_scope(document).capitalize()}:\n{document['content']}"
+    medications = [m["medication"] for m in (facts or {}).get("medications", [])]
+    if medications:
+        text += f"\nAlready extracted medications: {', '.join(medications)}"
+    return text
+
+def analysis_prompt(document: Dict[str, Any], facts: Optional[Dict[str, Any]] = None) -> Prompt:
+    """Analysis prompt; with locally extracted ``facts`` it asks only for what needs reasoning."""
+    return FACTS_ANALYSIS_INSTRUCTIONS if facts is not None else ANALYSIS_INSTRUCTIONS, _document_text(document, facts)
+
+def fast_coding_prompt(document: Dict[str, Any], facts: Optional[Dict[str, Any]] = None) -> Prompt:
+    text = _document_text(document, facts)
+    if document.get("reference_codes"):
+        text += f"\nCodes assigned to a nearly identical earlier note (keep those the evidence supports): {compact_json(document['reference_codes'])}"
+    return FACTS_FAST_CODING_INSTRUCTIONS if facts is not None else FAST_CODING_INSTRUCTIONS, text
+
+def _with_reference(payload: Dict[str, Any], reference_codes: Optional[List[List[str]]]) -> Dict[str, Any]:
+    # [code, description] pairs coded for a near-duplicate earlier note; only sent when there is one
+    if reference_codes:
+        payload["codes_of_nearly_identical_earlier_note"] = reference_codes
+    return payload
+
+def coding_prompt(analysis: Dict[str, Any], reference_codes: Optional[List[List[str]]] = None) -> Prompt:
+    return CODING_INSTRUCTIONS, compact_json(_with_reference({
+        "diagnoses": _findings(analysis.get("diagnoses", []), "condition"),
+        "procedures": _findings(analysis.get("procedures", []), "procedure")
+    }, reference_codes))
+
+def candidate_coding_prompt(analysis: Dict[str, Any], candidates: Dict[str, List[Dict[str, Any]]], reference_codes: Optional[List[List[str]]] = None) -> Prompt:
+    """Code-generation prompt built from extracted findings and retrieved candidate codes."""
+    def with_candidates(items: List[Dict[str, Any]], field: str, groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_phrase = {group["phrase"]: group["candidates"] for group in groups}
+        findings = _findings(items, field)
+        for finding in findings:
+            finding["candidates"] = [[c["code"], c["description"]] for c in by_phrase.get(finding[field], [])]
+        return findings
+
+    return CANDIDATE_CODING_INSTRUCTIONS, compact_json(_with_reference({
+        "diagnoses": with_candidates(analysis.get("diagnoses", []), "condition", candidates["diagnosis"]),
+        "procedures": with_candidates(analysis.get("procedures", []), "procedure", candidates["procedure"])
+    }, reference_codes))
+
+def validation_prompt(codes: Dict[str, List[Dict[str, Any]]]) -> Prompt:
+    return VALIDATION_INSTRUCTIONS, compact_json({
+        "diagnosis_codes": _codes(codes.get("diagnosis_codes", [])),
+        "procedure_codes": _codes(codes.get("procedure_codes", []))
+    })
+
+# Every prompt's static prefix, for token reports and cache warm-up
+STATIC_PREFIXES = {
+    "analysis": ANALYSIS_INSTRUCTIONS,
+    "analysis_facts": FACTS_ANALYSIS_INSTRUCTIONS,
+    "coding": CODING_INSTRUCTIONS,
+    "coding_candidates": CANDIDATE_CODING_INSTRUCTIONS,
+    "extraction": FAST_CODING_INSTRUCTIONS,
+    "extraction_facts": FACTS_FAST_CODING_INSTRUCTIONS,
+    "validation": VALIDATION_INSTRUCTIONS,
+}
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Model Call Rate Limiting
+Worker-wide token bucket and AIMD concurrency limit (shared by weight across
+priority lanes) for model calls, throttling error classification and jittered backoff
+"""
+
+import asyncio
+import collections
+import contextlib
+import random
+import time
+from typing import Any, Deque, Dict, Optional
+
+THROTTLE_ERROR_NAMES = ("RateLimitError", "ThrottlingException", "TooManyRequestsException")
+THROTTLE_MARKERS = ("throttl", "rate limit", "ratelimit", "too many requests", "rate exceeded")
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Whether the provider rejected the call for exceeding its rate or concurrency quota."""
+    if type(error).__name__ in THROTTLE_ERROR_NAMES:
+        return True
+    if getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0, rng: Optional[random.Random] = None) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)].
+
+    The jitter spreads retries of calls throttled together, so they do not hit
+    the endpoint again as one synchronized burst.
+    """
+    return (rng or random).uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Paces calls to at most ``rate`` per second, allowing bursts of ``burst``; rate 0 disables it."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted by additive increase / multiplicative decrease.
+
+    Each success raises the limit by 1/limit (about +1 per limit's worth of
+    calls); a throttle cuts it by ``decrease_factor``, at most once per
+    ``cooldown`` seconds so one burst of rejections counts as one signal. With
+    ``adaptive=False`` it is a fixed semaphore of ``max_limit``.
+
+    Callers may name a lane when they take a slot. Waiting callers in one lane
+    are served in arrival order; across lanes, free slots go out in proportion
+    to ``weights`` (stride scheduling), so a lane with a long backlog cannot
+    starve the others but still gets every slot nobody else is waiting for.
+    Lanes missing from ``weights`` count with weight 1.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+        adaptive: bool = True,
+        weights: Optional[Dict[str, float]] = None
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.adaptive = adaptive
+        self.weights = dict(weights or {})
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._counters = {"successes": 0, "throttles": 0, "decreases": 0}
+        # Per-lane waiting callers, stride-scheduling pass values and grants
+        self._waiting: Dict[Optional[str], Deque[object]] = {}
+        self._pass: Dict[Optional[str], float] = {}
+        self._virtual_time = 0.0
+        self._granted: Dict[Optional[str], int] = {}
+
+    def _lane_weight(self, lane: Optional[str]) -> float:
+        return max(self.weights.get(lane, 1.0), 1e-6) if lane is not None else 1.0
+
+    def _next_waiter(self) -> Optional[object]:
+        lanes = [lane for lane, waiters in self._waiting.items() if waiters]
+        if not lanes:
+            return None
+        lane = min(lanes, key=lambda lane: (self._pass[lane], -self._lane_weight(lane)))
+        return self._waiting[lane][0]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, lane: Optional[str] = None):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        ticket = object()
+        async with self._condition:
+            waiters = self._waiting.setdefault(lane, collections.deque())
+            if not waiters:
+                # A lane that was idle starts level with the others instead of
+                # cashing in the turns it did not use
+                self._pass[lane] = max(self._pass.get(lane, 0.0), self._virtual_time)
+            waiters.append(ticket)
+            try:
+                await self._condition.wait_for(
+                    lambda: self._in_flight < max(self.min_limit, int(self.limit)) and self._next_waiter() is ticket
+                )
+            except BaseException:
+                waiters.remove(ticket)
+                self._condition.notify_all()
+                raise
+            waiters.popleft()
+            self._virtual_time = self._pass[lane]
+            self._pass[lane] += 1 / self._lane_weight(lane)
+            self._granted[lane] = self._granted.get(lane, 0) + 1
+            self._in_flight += 1
+            # The next waiter may fit as well (the limit can grow by more than one slot)
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self):
+        self._counters["successes"] += 1
+        if self.adaptive:
+            self.limit = min(float(self.max_limit), self.limit + 1 / max(self.limit, 1.0))
+
+    def on_throttle(self):
+        self._counters["throttles"] += 1
+        now = time.monotonic()
+        if self.adaptive and now - self._last_decrease >= self.cooldown:
+            self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+            self._last_decrease = now
+            self._counters["decreases"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "in_flight": self._in_flight,
+            "adaptive": self.adaptive,
+            **self._counters,
+            "lanes": {
+                lane or "default": {"waiting": len(self._waiting.get(lane, ())), "granted": granted}
+                for lane, granted in self._granted.items()
+            }
+        }
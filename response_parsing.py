@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Model Response Parsing
+Extracts, repairs and validates the JSON object in a model completion, so a
+preamble, code fence, trailing commentary or truncated array does not fail
+the activity and cost another model round trip
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ResponseParseError(ValueError):
+    """The completion holds no usable JSON object, or it does not match the activity's schema."""
+
+
+# ============================================================================
+# EXTRACTION AND REPAIR
+# ============================================================================
+
+class JsonObjectScanner:
+    """Tracks the first top-level JSON object in text fed to it piece by piece.
+
+    ``feed`` returns True once the object has closed, so a streaming reader can
+    stop consuming the completion there.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self.stack: List[str] = []
+        # Offset of the bracket that opened each level of ``stack``
+        self.openings: List[int] = []
+        self.in_string = False
+        self._escape = False
+        self._position = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, piece: str) -> bool:
+        self.text += piece
+        text = self.text
+        position = self._position
+        while position < len(text) and self.end is None:
+            char = text[position]
+            if self.start is None:
+                if char == "{":
+                    self.start = position
+                    self.stack.append("}")
+                    self.openings.append(position)
+            elif self.in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.stack.append("}" if char == "{" else "]")
+                self.openings.append(position)
+            elif char in "}]":
+                if self.stack and self.stack[-1] == char:
+                    self.stack.pop()
+                    self.openings.pop()
+                if not self.stack:
+                    self.end = position + 1
+            position += 1
+        self._position = position
+        return self.complete
+
+    def object_text(self) -> Optional[str]:
+        """The object so far: complete when ``complete``, otherwise the truncated prefix."""
+        if self.start is None:
+            return None
+        return self.text[self.start:self.end] if self.end is not None else self.text[self.start:]
+
+
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+
+def _strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket, outside of strings."""
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', text)
+    return "".join(part if index % 2 else TRAILING_COMMA_PATTERN.sub(r"\1", part) for index, part in enumerate(parts))
+
+def _close_truncated(text: str) -> Optional[str]:
+    """Close the brackets a truncated object left open; None when it stops inside a string."""
+    scanner = JsonObjectScanner()
+    scanner.feed(text)
+    if scanner.complete:
+        return scanner.object_text()
+    if scanner.in_string:
+        # A cut-off string value is not trustworthy; the caller drops that element
+        return None
+    closed = re.sub(r"[\s,:]+$", "", text)
+    return closed + "".join(reversed(scanner.stack))
+
+def _drop_open_elements(text: str) -> str:
+    """Cut a truncated object back to before the outermost list element it left open.
+
+    A finding or code cut off mid-object may be missing its confidence or
+    evidence, so it is dropped rather than closed and kept.
+    """
+    scanner = JsonObjectScanner()
+    scanner.feed(text)
+    if scanner.complete:
+        return text
+    for depth in range(1, len(scanner.stack)):
+        if scanner.stack[depth - 1] == "]":
+            return text[:scanner.openings[depth]]
+    return text
+
+def _repair_truncated(text: str) -> Optional[Any]:
+    """Parse a truncated object, cutting back to earlier element boundaries until it closes cleanly."""
+    candidate = _drop_open_elements(text)
+    for _ in range(64):
+        closed = _close_truncated(candidate)
+        if closed is not None:
+            try:
+                return json.loads(_strip_trailing_commas(closed))
+            except json.JSONDecodeError:
+                pass
+        cut = max(candidate.rfind(","), candidate.rfind("["), candidate.rfind("{"))
+        if cut < 0 or len(candidate) == 1:
+            return None
+        # Keep an opening bracket with its contents dropped; drop a comma, or a
+        # bracket that already had nothing after it
+        if candidate[cut] in "[{" and cut < len(candidate) - 1:
+            candidate = candidate[:cut + 1]
+        else:
+            candidate = candidate[:cut]
+    return None
+
+def extract_json(text: str) -> Tuple[Dict[str, Any], bool]:
+    """The JSON object in a completion, and whether it needed repair.
+
+    Handles surrounding prose, code fences, trailing commas and output cut off
+    mid-object (incomplete trailing elements are dropped).
+    """
+    if text is None:
+        raise ResponseParseError("Empty model response")
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return parsed, False
+    except json.JSONDecodeError:
+        pass
+
+    scanner = JsonObjectScanner()
+    scanner.feed(text)
+    candidate = scanner.object_text()
+    if candidate is None:
+        raise ResponseParseError(f"No JSON object in model response: {text[:120]!r}")
+
+    if scanner.complete:
+        for attempt in (candidate, _strip_trailing_commas(candidate)):
+            try:
+                return json.loads(attempt), True
+            except json.JSONDecodeError:
+                continue
+
+    repaired = _repair_truncated(candidate)
+    if isinstance(repaired, dict):
+        return repaired, True
+    raise ResponseParseError(f"Unrepairable JSON in model response: {candidate[:120]!r}")
+
+# ============================================================================
+# SCHEMAS
+# ============================================================================
+
+# Field specs: a type, a nested dict spec, or a one-element list holding the item
+# spec. "required" keys must be present in the response; list items missing their
+# "key" field are dropped; "confidence" values are clamped to [0, 1].
+FINDING_LISTS = {
+    "diagnoses": [{"condition": str, "confidence": float, "evidence": str, "severity": str}],
+    "procedures": [{"procedure": str, "confidence": float, "evidence": str, "type": str}],
+    "medications": [{"medication": str, "dosage": str, "indication": str}],
+    "vital_signs": {"blood_pressure": str, "heart_rate": str, "temperature": str, "oxygen_saturation": str},
+}
+CODE_LISTS = {
+    "diagnosis_codes": [{"code": str, "description": str, "confidence": float, "evidence": str, "primary": bool, "category": str}],
+    "procedure_codes": [{"code": str, "description": str, "confidence": float, "evidence": str, "primary": bool, "category": str}],
+}
+ITEM_KEYS = {"diagnoses": "condition", "procedures": "procedure", "medications": "medication",
+             "diagnosis_codes": "code", "procedure_codes": "code"}
+
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "analysis": {"fields": FINDING_LISTS, "required": ("diagnoses",)},
+    "codes": {"fields": CODE_LISTS, "required": ("diagnosis_codes",)},
+    "fast_coding": {"fields": {"analysis": FINDING_LISTS, "codes": CODE_LISTS}, "required": ("analysis", "codes")},
+    "validation": {
+        "fields": {
+            "is_valid": bool, "confidence_score": float, "compliance_score": float,
+            "validation_checks_passed": int, "errors": [str], "warnings": [str], "recommendations": [str]
+        },
+        "required": ("is_valid",)
+    },
+}
+
+def _coerce(value: Any, spec: Any, field: str) -> Any:
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            return {}
+        return _conform(value, spec)
+    if isinstance(spec, list):
+        if isinstance(value, dict):
+            value = [value]
+        if not isinstance(value, list):
+            return []
+        key = ITEM_KEYS.get(field)
+        items = [_coerce(item, spec[0], "") for item in value]
+        return [item for item in items if not key or (isinstance(item, dict) and item.get(key))]
+    if value is None:
+        return value
+    if spec is bool:
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("true", "yes", "1")
+    if spec in (int, float):
+        try:
+            number = spec(float(str(value).strip().rstrip("%")))
+        except ValueError:
+            return None
+        if field == "confidence":
+            number = number / 100 if number > 1 else number
+            number = min(max(number, 0.0), 1.0)
+        return number
+    if spec is str:
+        return value if isinstance(value, str) else json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+    return value
+
+def _conform(data: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+    conformed = dict(data)
+    for field, spec in fields.items():
+        if field in data:
+            conformed[field] = _coerce(data[field], spec, field)
+        elif isinstance(spec, list):
+            conformed[field] = []
+    return conformed
+
+def validate_response(data: Dict[str, Any], schema_name: str) -> Dict[str, Any]:
+    """Check required keys and coerce field types to the activity's schema."""
+    schema = RESPONSE_SCHEMAS[schema_name]
+    missing = [field for field in schema["required"] if field not in data]
+    if missing:
+        raise ResponseParseError(f"Model response for {schema_name} is missing {', '.join(missing)}")
+    return _conform(data, schema["fields"])
+
+def parse_model_response(text: str, schema_name: str) -> Dict[str, Any]:
+    """Extract, repair if needed, and validate the JSON object in a completion."""
+    data, repaired = extract_json(text)
+    if repaired:
+        logger.warning(f"🩹 Repaired malformed JSON in {schema_name} model response")
+    return validate_response(data, schema_name)
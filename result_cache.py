@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Result Cache
+Caches model results keyed by normalized document content, prompt version and model id
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+
+# ============================================================================
+# CACHE BACKENDS
+# ============================================================================
+
+class CacheBackend:
+    """Storage interface for cached results; values are JSON-serializable dicts."""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: float):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: float):
+        # Store the serialized form so callers can't mutate cached results
+        serialized = json.dumps(value)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl_seconds, serialized)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """SQLite-backed cache shared by every worker process on the host."""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES * 10):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_accessed ON result_cache (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM result_cache WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE result_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: float):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO result_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + ttl_seconds, now)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge()
+
+    def purge(self):
+        """Drop expired entries, then the least recently used beyond max_entries."""
+        conn = self._connection()
+        conn.execute("DELETE FROM result_cache WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM result_cache WHERE key IN ("
+            " SELECT key FROM result_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM result_cache")
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+def normalize_content(content: str) -> str:
+    """Normalize document text so trivially different copies share a cache key."""
+    content = unicodedata.normalize("NFC", content)
+    return " ".join(content.split())
+
+
+class ResultCache:
+    """Content-addressed cache in front of the model-backed activities."""
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(namespace: str, content: str, prompt_version: str, model: str, extra: Any = None) -> str:
+        """Hash normalized content + prompt version + model id (+ any extra prompt inputs)."""
+        digest = hashlib.sha256()
+        for part in (namespace, prompt_version, model, normalize_content(content)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        if extra is not None:
+            digest.update(json.dumps(extra, sort_keys=True).encode("utf-8"))
+        return f"{namespace}:{digest.hexdigest()}"
+
+    def _count(self, namespace: str, outcome: str):
+        with self._lock:
+            counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0, "bypassed": 0})
+            counters[outcome] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        namespace = key.split(":", 1)[0]
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Result cache read failed, treating as miss: {str(e)}")
+            value = None
+        self._count(namespace, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        try:
+            self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Result cache write failed: {str(e)}")
+
+    def record_bypass(self, namespace: str):
+        self._count(namespace, "bypassed")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters per namespace, with hit rate."""
+        with self._lock:
+            stats = {}
+            for namespace, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                stats[namespace] = dict(counters, hit_rate=counters["hits"] / lookups if lookups else 0.0)
+            return stats
+
+
+_cache: Optional[ResultCache] = None
+_cache_configured = False
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Return the process-wide cache configured from the environment, or None if disabled.
+
+    RESULT_CACHE_BACKEND selects ``memory`` (default), ``sqlite`` or ``off``;
+    RESULT_CACHE_PATH, RESULT_CACHE_TTL_SECONDS and RESULT_CACHE_MAX_ENTRIES tune it.
+    """
+    global _cache, _cache_configured
+    if _cache_configured:
+        return _cache
+
+    backend_name = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()
+    ttl_seconds = float(os.getenv("RESULT_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+    if backend_name == "sqlite":
+        path = os.getenv("RESULT_CACHE_PATH", "medical_coding_cache.db")
+        _cache = ResultCache(SQLiteCacheBackend(path, max_entries=max_entries), ttl_seconds)
+        logger.info(f"🗄️  Result cache: SQLite at {path}")
+    elif backend_name == "memory":
+        _cache = ResultCache(MemoryCacheBackend(max_entries=max_entries), ttl_seconds)
+        logger.info(f"🗄️  Result cache: in-process LRU ({max_entries} entries)")
+    else:
+        _cache = None
+        logger.info("🗄️  Result cache disabled")
+
+    _cache_configured = True
+    return _cache
+
+def set_result_cache(cache: Optional[ResultCache]):
+    """Replace the process-wide cache (used by benchmarks and tooling)."""
+    global _cache, _cache_configured
+    _cache = cache
+    _cache_configured = True
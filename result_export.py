@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Coding Result Export
+Streams completed coding results from the result store as NDJSON, CSV or
+Parquet, one row per assigned code, for billing systems. Exports resume from
+the cursor of the last exported row or from a completion timestamp.
+
+Usage:
+    python result_export.py --format csv --since 2025-01-01 --output codes.csv
+    python result_export.py --format ndjson --cursor-file export.cursor --output -
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from result_store import ResultStore, get_result_store
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+EXPORT_COLUMNS = (
+    "cursor", "completed_at", "workflow_id", "document_id", "patient_id",
+    "code_type", "code", "description", "primary", "confidence", "requires_review"
+)
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Rows serialized per chunk of output (and per Parquet row group)
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+# Results completed within this many seconds of the export start are left for the
+# next export, so a record committed slightly out of timestamp order is not skipped
+EXPORT_SETTLE_SECONDS = float(os.getenv("EXPORT_SETTLE_SECONDS", "2"))
+
+# ============================================================================
+# CURSORS AND TIMESTAMPS
+# ============================================================================
+
+def make_cursor(updated_at: float, workflow_id: str) -> str:
+    # repr round-trips the float exactly, so the cursor's own record compares equal, not newer
+    return f"{updated_at!r}|{workflow_id}"
+
+def parse_cursor(cursor: str) -> Tuple[float, str]:
+    """The (completion time, workflow id) position a cursor stands for."""
+    try:
+        timestamp, workflow_id = cursor.split("|", 1)
+        return float(timestamp), workflow_id
+    except ValueError:
+        raise ValueError(f"Invalid export cursor: {cursor!r}")
+
+def parse_timestamp(value: str) -> float:
+    """Epoch seconds from epoch seconds or an ISO 8601 date/time (UTC unless it has an offset)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value!r} (expected ISO 8601 or epoch seconds)")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="microseconds")
+
+# ============================================================================
+# ROWS
+# ============================================================================
+
+def code_rows(record: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """One row per diagnosis and procedure code of a completed record."""
+    result = record.get("result") or {}
+    shared = {
+        "cursor": make_cursor(record["updated_at"], record["workflow_id"]),
+        "completed_at": _iso(record["updated_at"]),
+        "workflow_id": record["workflow_id"],
+        "document_id": result.get("document_id") or record.get("document_id"),
+        "patient_id": result.get("patient_id") or record.get("patient_id"),
+        "requires_review": bool(result.get("requires_review", False))
+    }
+    for code_type, key in (("diagnosis", "diagnosis_codes"), ("procedure", "procedure_codes")):
+        for entry in result.get(key) or []:
+            confidence = entry.get("confidence")
+            yield {
+                **shared,
+                "code_type": code_type,
+                "code": str(entry.get("code", "")),
+                "description": str(entry.get("description", "")),
+                "primary": bool(entry.get("primary", False)),
+                "confidence": float(confidence) if confidence is not None else None
+            }
+
+
+class ResultExport:
+    """Code rows of the results completed after a cursor or timestamp, read lazily from the store.
+
+    ``cursor`` follows the last record read, including records without codes,
+    so passing it to the next export picks up exactly where this one stopped.
+    """
+
+    def __init__(
+        self,
+        store: ResultStore,
+        cursor: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ):
+        self.store = store
+        self.after = parse_cursor(cursor) if cursor else None
+        if since is not None and (self.after is None or since > self.after[0]):
+            # Start just before ``since``: records completed at exactly that time are included
+            self.after = (since, "")
+        self.until = until if until is not None else time.time() - EXPORT_SETTLE_SECONDS
+        self.cursor = cursor
+        self.records = 0
+        self.rows = 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for record in self.store.iter_completed(after=self.after, until=self.until):
+            for row in code_rows(record):
+                self.rows += 1
+                yield row
+            self.records += 1
+            self.cursor = make_cursor(record["updated_at"], record["workflow_id"])
+
+# ============================================================================
+# SERIALIZATION
+# ============================================================================
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _pyarrow():
+    """pyarrow and pyarrow.parquet, imported on first Parquet export so the web tier does not load them at start."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+def parquet_available() -> bool:
+    try:
+        _pyarrow()
+    except ValueError:
+        return False
+    return True
+
+def parquet_schema():
+    pa, _ = _pyarrow()
+    return pa.schema([
+        ("cursor", pa.string()),
+        ("completed_at", pa.timestamp("us", tz="UTC")),
+        ("workflow_id", pa.string()),
+        ("document_id", pa.string()),
+        ("patient_id", pa.string()),
+        ("code_type", pa.string()),
+        ("code", pa.string()),
+        ("description", pa.string()),
+        ("primary", pa.bool_()),
+        ("confidence", pa.float64()),
+        ("requires_review", pa.bool_())
+    ])
+
+def _parquet_table(batch: List[Dict[str, Any]], schema):
+    pa, _ = _pyarrow()
+    columns = {column: [row[column] for row in batch] for column in EXPORT_COLUMNS}
+    columns["completed_at"] = [datetime.fromisoformat(value) for value in columns["completed_at"]]
+    return pa.table(columns, schema=schema)
+
+def serialize_rows(rows: Iterable[Dict[str, Any]], fmt: str, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    """Encode rows as ``fmt``, yielding one chunk of bytes per ``batch_rows`` rows.
+
+    Parquet chunks are row groups written through ``pyarrow``; the file footer
+    comes with the last chunk.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (expected {', '.join(EXPORT_FORMATS)})")
+    if fmt == "parquet":
+        _pyarrow()
+    return _serialize(rows, fmt, batch_rows)
+
+def _serialize(rows: Iterable[Dict[str, Any]], fmt: str, batch_rows: int) -> Iterator[bytes]:
+    if fmt == "ndjson":
+        for batch in _batches(rows, batch_rows):
+            yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in batch).encode("utf-8")
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        yield buffer.getvalue().encode("utf-8")
+        for batch in _batches(rows, batch_rows):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows({key: str(value).lower() if isinstance(value, bool) else value for key, value in row.items()} for row in batch)
+            yield buffer.getvalue().encode("utf-8")
+    else:
+        _, pq = _pyarrow()
+        schema = parquet_schema()
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        wrote = False
+        for batch in _batches(rows, batch_rows):
+            writer.write_table(_parquet_table(batch, schema))
+            wrote = True
+            yield sink.drain()
+        if not wrote:
+            # An empty export is still a readable file with the schema
+            writer.write_table(schema.empty_table())
+        writer.close()
+        yield sink.drain()
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--output", default="-", help="file to write, - for stdout")
+    parser.add_argument("--since", help="completed at or after (ISO 8601 or epoch seconds)")
+    parser.add_argument("--until", help="completed before (default: now, less EXPORT_SETTLE_SECONDS)")
+    parser.add_argument("--cursor", help="resume after this cursor (the last exported row's cursor column)")
+    parser.add_argument("--cursor-file", help="read the cursor from this file and write the new one back after the export")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    if os.getenv("RESULT_STORE_BACKEND", "memory").lower() == "memory":
+        logger.warning("⚠️  RESULT_STORE_BACKEND is memory: this process's store is empty; use the web tier's sqlite store")
+
+    cursor = args.cursor
+    if cursor is None and args.cursor_file and os.path.exists(args.cursor_file):
+        with open(args.cursor_file) as f:
+            cursor = f.read().strip() or None
+
+    export = ResultExport(
+        get_result_store(),
+        cursor=cursor,
+        since=parse_timestamp(args.since) if args.since else None,
+        until=parse_timestamp(args.until) if args.until else None
+    )
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in serialize_rows(export, args.format):
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        else:
+            output.flush()
+
+    if args.cursor_file and export.cursor:
+        tmp_path = f"{args.cursor_file}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(export.cursor + "\n")
+        os.replace(tmp_path, args.cursor_file)
+    logger.info(f"📤 Exported {export.rows} codes from {export.records} results (cursor {export.cursor})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
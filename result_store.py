@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Workflow Result Store
+Bounded storage for workflow status records and completed coding results
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+
+# Completed records read per page by iter_completed
+EXPORT_PAGE_SIZE = 500
+
+# Record fields stored alongside the (compressed) result
+STATUS_FIELDS = ("status", "progress", "message", "started")
+
+# Fields of a batch record: its submission status and the batch workflows that make it up
+BATCH_FIELDS = ("status", "message", "total_documents", "workflow_ids")
+
+def compress_result(result: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    """Serialize a completed result as compact, zlib-compressed JSON."""
+    if result is None:
+        return None
+    return zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"))
+
+def decompress_result(blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    if blob is None:
+        return None
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+# ============================================================================
+# RESULT STORES
+# ============================================================================
+
+class ResultStore:
+    """Status and results of workflows started by the web tier, keyed by workflow id.
+
+    Records are dicts with status, progress, message, started and result keys,
+    plus the document_id and patient_id they were created with. Batch records
+    (status, message, total_documents and workflow_ids, keyed by batch id) are
+    kept alongside with the same time-to-live and size bound.
+    """
+
+    def create(self, workflow_id: str, record: Dict[str, Any], document_id: Optional[str] = None, patient_id: Optional[str] = None):
+        raise NotImplementedError
+
+    def update(self, workflow_id: str, **fields):
+        raise NotImplementedError
+
+    def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete(self, workflow_id: str):
+        raise NotImplementedError
+
+    def find(self, document_id: Optional[str] = None, patient_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Records for a document or patient, most recently updated first."""
+        raise NotImplementedError
+
+    def iter_completed(
+        self,
+        after: Optional[Tuple[float, str]] = None,
+        until: Optional[float] = None,
+        page_size: int = EXPORT_PAGE_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """Completed records in (updated_at, workflow_id) order, read a page at a time.
+
+        ``after`` is the (updated_at, workflow_id) of the last record already
+        seen, and records updated at or after ``until`` are left out. Completed
+        records are not updated again, so ``updated_at`` is their completion time.
+        """
+        raise NotImplementedError
+
+    def create_batch(self, batch_id: str, record: Dict[str, Any]):
+        raise NotImplementedError
+
+    def update_batch(self, batch_id: str, **fields):
+        raise NotImplementedError
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete_batch(self, batch_id: str):
+        raise NotImplementedError
+
+    def __contains__(self, workflow_id: str) -> bool:
+        return self.get(workflow_id) is not None
+
+
+class MemoryResultStore(ResultStore):
+    """In-process LRU store with a time-to-live on each record."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._batches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, workflow_id, record, document_id=None, patient_id=None):
+        now = time.time()
+        stored = {field: record.get(field) for field in STATUS_FIELDS}
+        stored.update({
+            "workflow_id": workflow_id,
+            "document_id": document_id,
+            "patient_id": patient_id,
+            "result": compress_result(record.get("result")),
+            "created_at": now,
+            "updated_at": now
+        })
+        with self._lock:
+            self._records[workflow_id] = stored
+            self._records.move_to_end(workflow_id)
+            self._evict(self._records, now)
+
+    def update(self, workflow_id, **fields):
+        with self._lock:
+            stored = self._records.get(workflow_id)
+            if stored is None:
+                return
+            if "result" in fields:
+                fields["result"] = compress_result(fields["result"])
+            stored.update(fields)
+            stored["updated_at"] = time.time()
+            self._records.move_to_end(workflow_id)
+
+    def get(self, workflow_id):
+        with self._lock:
+            stored = self._records.get(workflow_id)
+            if stored is None:
+                return None
+            if stored["updated_at"] + self.ttl_seconds < time.time():
+                del self._records[workflow_id]
+                return None
+            return self._to_record(stored)
+
+    def delete(self, workflow_id):
+        with self._lock:
+            self._records.pop(workflow_id, None)
+
+    def find(self, document_id=None, patient_id=None, limit=100):
+        with self._lock:
+            matches = [
+                stored for stored in reversed(self._records.values())
+                if (document_id is None or stored["document_id"] == document_id)
+                and (patient_id is None or stored["patient_id"] == patient_id)
+            ]
+            return [self._to_record(stored) for stored in matches[:limit]]
+
+    def iter_completed(self, after=None, until=None, page_size=EXPORT_PAGE_SIZE):
+        # Only the keys are copied; each record is decompressed when it is reached
+        with self._lock:
+            expires = time.time() - self.ttl_seconds
+            keys = sorted(
+                (stored["updated_at"], workflow_id) for workflow_id, stored in self._records.items()
+                if stored["status"] == "completed" and stored["updated_at"] >= expires
+                and (after is None or (stored["updated_at"], workflow_id) > tuple(after))
+                and (until is None or stored["updated_at"] < until)
+            )
+        for updated_at, workflow_id in keys:
+            with self._lock:
+                stored = self._records.get(workflow_id)
+                if stored is None or stored["updated_at"] != updated_at:
+                    continue
+                record = self._to_record(stored)
+            yield record
+
+    def create_batch(self, batch_id, record):
+        now = time.time()
+        stored = {field: record.get(field) for field in BATCH_FIELDS}
+        stored.update({"batch_id": batch_id, "created_at": now, "updated_at": now})
+        with self._lock:
+            self._batches[batch_id] = stored
+            self._batches.move_to_end(batch_id)
+            self._evict(self._batches, now)
+
+    def update_batch(self, batch_id, **fields):
+        with self._lock:
+            stored = self._batches.get(batch_id)
+            if stored is None:
+                return
+            stored.update(fields)
+            stored["updated_at"] = time.time()
+            self._batches.move_to_end(batch_id)
+
+    def get_batch(self, batch_id):
+        with self._lock:
+            stored = self._batches.get(batch_id)
+            if stored is None:
+                return None
+            if stored["updated_at"] + self.ttl_seconds < time.time():
+                del self._batches[batch_id]
+                return None
+            return {**stored, "workflow_ids": list(stored["workflow_ids"] or [])}
+
+    def delete_batch(self, batch_id):
+        with self._lock:
+            self._batches.pop(batch_id, None)
+
+    def _evict(self, records: "OrderedDict[str, Dict[str, Any]]", now: float):
+        # Records are kept in update order, so expired ones sit at the front
+        while records:
+            oldest = next(iter(records.values()))
+            if len(records) <= self.max_entries and oldest["updated_at"] + self.ttl_seconds >= now:
+                break
+            records.popitem(last=False)
+
+    @staticmethod
+    def _to_record(stored: Dict[str, Any]) -> Dict[str, Any]:
+        record = dict(stored)
+        record["result"] = decompress_result(stored["result"])
+        return record
+
+
+class SQLiteResultStore(ResultStore):
+    """SQLite-backed store shared by every web worker process on the host."""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES * 10, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS workflow_results ("
+            " workflow_id TEXT PRIMARY KEY,"
+            " document_id TEXT,"
+            " patient_id TEXT,"
+            " status TEXT,"
+            " progress INTEGER,"
+            " message TEXT,"
+            " started INTEGER,"
+            " result BLOB,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_results_document ON workflow_results (document_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_results_patient ON workflow_results (patient_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_results_updated ON workflow_results (updated_at)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_workflow_results_completed"
+            " ON workflow_results (updated_at, workflow_id) WHERE status = 'completed'"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS batch_jobs ("
+            " batch_id TEXT PRIMARY KEY,"
+            " status TEXT,"
+            " message TEXT,"
+            " total_documents INTEGER,"
+            " workflow_ids TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_batch_jobs_updated ON batch_jobs (updated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, workflow_id, record, document_id=None, patient_id=None):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO workflow_results"
+            " (workflow_id, document_id, patient_id, status, progress, message, started, result, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                workflow_id, document_id, patient_id,
+                record.get("status"), record.get("progress"), record.get("message"),
+                int(bool(record.get("started"))), compress_result(record.get("result")),
+                now, now
+            )
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge()
+
+    def update(self, workflow_id, **fields):
+        unknown = set(fields) - set(STATUS_FIELDS) - {"result"}
+        if unknown:
+            raise ValueError(f"Unknown result store fields: {sorted(unknown)}")
+        if "result" in fields:
+            fields["result"] = compress_result(fields["result"])
+        if "started" in fields:
+            fields["started"] = int(bool(fields["started"]))
+        fields["updated_at"] = time.time()
+
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self._connection().execute(
+            f"UPDATE workflow_results SET {assignments} WHERE workflow_id = ?",
+            (*fields.values(), workflow_id)
+        )
+
+    def get(self, workflow_id):
+        row = self._connection().execute(
+            "SELECT * FROM workflow_results WHERE workflow_id = ? AND updated_at >= ?",
+            (workflow_id, time.time() - self.ttl_seconds)
+        ).fetchone()
+        return self._to_record(row) if row is not None else None
+
+    def delete(self, workflow_id):
+        self._connection().execute("DELETE FROM workflow_results WHERE workflow_id = ?", (workflow_id,))
+
+    def find(self, document_id=None, patient_id=None, limit=100):
+        clauses, params = ["updated_at >= ?"], [time.time() - self.ttl_seconds]
+        if document_id is not None:
+            clauses.append("document_id = ?")
+            params.append(document_id)
+        if patient_id is not None:
+            clauses.append("patient_id = ?")
+            params.append(patient_id)
+        rows = self._connection().execute(
+            f"SELECT * FROM workflow_results WHERE {' AND '.join(clauses)} ORDER BY updated_at DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def iter_completed(self, after=None, until=None, page_size=EXPORT_PAGE_SIZE):
+        # Keyset pagination: each page resumes after the last row of the previous one
+        last = tuple(after) if after is not None else (0.0, "")
+        while True:
+            clauses = [
+                "status = 'completed'", "updated_at >= ?",
+                "(updated_at > ? OR (updated_at = ? AND workflow_id > ?))"
+            ]
+            params: List[Any] = [time.time() - self.ttl_seconds, last[0], last[0], last[1]]
+            if until is not None:
+                clauses.append("updated_at < ?")
+                params.append(until)
+            rows = self._connection().execute(
+                f"SELECT * FROM workflow_results WHERE {' AND '.join(clauses)} ORDER BY updated_at, workflow_id LIMIT ?",
+                (*params, page_size)
+            ).fetchall()
+            for row in rows:
+                yield self._to_record(row)
+            if len(rows) < page_size:
+                return
+            last = (rows[-1]["updated_at"], rows[-1]["workflow_id"])
+
+    def create_batch(self, batch_id, record):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO batch_jobs"
+            " (batch_id, status, message, total_documents, workflow_ids, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                batch_id, record.get("status"), record.get("message"), record.get("total_documents"),
+                json.dumps(record.get("workflow_ids") or []), now, now
+            )
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge()
+
+    def update_batch(self, batch_id, **fields):
+        unknown = set(fields) - set(BATCH_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown batch record fields: {sorted(unknown)}")
+        if "workflow_ids" in fields:
+            fields["workflow_ids"] = json.dumps(fields["workflow_ids"])
+        fields["updated_at"] = time.time()
+
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self._connection().execute(
+            f"UPDATE batch_jobs SET {assignments} WHERE batch_id = ?",
+            (*fields.values(), batch_id)
+        )
+
+    def get_batch(self, batch_id):
+        row = self._connection().execute(
+            "SELECT * FROM batch_jobs WHERE batch_id = ? AND updated_at >= ?",
+            (batch_id, time.time() - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["workflow_ids"] = json.loads(record["workflow_ids"] or "[]")
+        return record
+
+    def delete_batch(self, batch_id):
+        self._connection().execute("DELETE FROM batch_jobs WHERE batch_id = ?", (batch_id,))
+
+    def purge(self):
+        """Drop expired records and batches, then the least recently updated beyond max_entries."""
+        conn = self._connection()
+        for table, key in (("workflow_results", "workflow_id"), ("batch_jobs", "batch_id")):
+            conn.execute(f"DELETE FROM {table} WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+            conn.execute(
+                f"DELETE FROM {table} WHERE {key} IN ("
+                f" SELECT {key} FROM {table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record["started"] = bool(record["started"])
+        record["result"] = decompress_result(record["result"])
+        return record
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+def get_result_store() -> ResultStore:
+    """Return the process-wide result store configured from the environment.
+
+    RESULT_STORE_BACKEND selects ``memory`` (default) or ``sqlite``;
+    RESULT_STORE_PATH, RESULT_STORE_TTL_SECONDS and RESULT_STORE_MAX_ENTRIES tune it.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend_name = os.getenv("RESULT_STORE_BACKEND", "memory").lower()
+            ttl_seconds = float(os.getenv("RESULT_STORE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+            max_entries = int(os.getenv("RESULT_STORE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+            if backend_name == "sqlite":
+                path = os.getenv("RESULT_STORE_PATH", "medical_coding_results.db")
+                _store = SQLiteResultStore(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+                logger.info(f"🗃️  Result store: SQLite at {path}")
+            else:
+                _store = MemoryResultStore(max_entries=max_entries, ttl_seconds=ttl_seconds)
+                logger.info(f"🗃️  Result store: in-process LRU ({max_entries} records)")
+    return _store
+
+def set_result_store(store: Optional[ResultStore]):
+    """Replace the process-wide result store (used by benchmarks and tooling)."""
+    global _store
+    _store = store
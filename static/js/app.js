@@ -4,6 +4,7 @@ class MedicalCodingUI {
     constructor() {
         this.currentWorkflowId = null;
         this.statusCheckInterval = null;
+        this.eventSource = null;
         this.sampleDocuments = [];
         
         this.initializeEventListeners();
@@ -94,9 +95,11 @@ class MedicalCodingUI {
     
     startStatusChecking() {
         console.log('=== STARTING STATUS CHECKING ===');
-        this.statusCheckInterval = setInterval(() => {
-            this.checkWorkflowStatus();
-        }, 2000); // Check every 2 seconds
+        if (window.EventSource) {
+            this.startStatusStream();
+        } else {
+            this.startStatusPolling();
+        }
         
         // Set a timeout to stop checking after 5 minutes
         this.statusCheckTimeout = setTimeout(() => {
@@ -107,6 +110,31 @@ class MedicalCodingUI {
         }, 5 * 60 * 1000); // 5 minutes
     }
     
+    startStatusPolling() {
+        this.statusCheckInterval = setInterval(() => {
+            this.checkWorkflowStatus();
+        }, 2000); // Check every 2 seconds
+    }
+    
+    startStatusStream() {
+        // Server-Sent Events: the server pushes a status update whenever the workflow state changes
+        this.eventSource = new EventSource(`/api/workflow-events/${this.currentWorkflowId}`);
+        
+        this.eventSource.onmessage = (event) => {
+            this.handleStatusUpdate(JSON.parse(event.data));
+        };
+        
+        this.eventSource.onerror = () => {
+            if (!this.eventSource) {
+                return;
+            }
+            console.log('Status stream interrupted, falling back to polling');
+            this.eventSource.close();
+            this.eventSource = null;
+            this.startStatusPolling();
+        };
+    }
+    
     async checkWorkflowStatus() {
         if (!this.currentWorkflowId) {
             console.log('No workflow ID set, skipping status check');
@@ -133,40 +161,7 @@ class MedicalCodingUI {
             console.log('Has result:', !!data.result);
             console.log('Result keys:', data.result ? Object.keys(data.result) : 'No result');
             
-            // Update progress regardless of status
-            this.updateProgress(data);
-            
-            // Handle different statuses
-            if (data.status === 'completed') {
-                console.log('=== WORKFLOW COMPLETED ===');
-                if (data.result) {
-                    console.log('Result found, calling showResults...');
-                    this.showResults(data.result);
-                } else {
-                    console.log('No result in completed workflow');
-                    this.showError('Workflow completed but no results were generated');
-                }
-                this.stopStatusChecking();
-                this.enableForm();
-                
-            } else if (data.status === 'error') {
-                console.log('=== WORKFLOW ERROR ===');
-                console.error('Workflow error:', data.message);
-                this.showError(data.message || 'An error occurred during processing');
-                this.stopStatusChecking();
-                this.enableForm();
-                
-            } else if (data.status === 'processing') {
-                console.log('=== WORKFLOW STILL PROCESSING ===');
-                console.log('Progress:', data.progress + '%');
-                console.log('Message:', data.message);
-                // Continue checking - don't stop
-                
-            } else {
-                console.log('=== UNKNOWN STATUS ===');
-                console.log('Unknown workflow status:', data.status);
-                // Continue checking for now
-            }
+            this.handleStatusUpdate(data);
             
         } catch (error) {
             console.error('=== STATUS CHECK ERROR ===');
@@ -185,6 +180,43 @@ class MedicalCodingUI {
         }
     }
     
+    handleStatusUpdate(data) {
+        // Update progress regardless of status
+        this.updateProgress(data);
+        
+        // Handle different statuses
+        if (data.status === 'completed') {
+            console.log('=== WORKFLOW COMPLETED ===');
+            if (data.result) {
+                console.log('Result found, calling showResults...');
+                this.showResults(data.result);
+            } else {
+                console.log('No result in completed workflow');
+                this.showError('Workflow completed but no results were generated');
+            }
+            this.stopStatusChecking();
+            this.enableForm();
+            
+        } else if (data.status === 'error') {
+            console.log('=== WORKFLOW ERROR ===');
+            console.error('Workflow error:', data.message);
+            this.showError(data.message || 'An error occurred during processing');
+            this.stopStatusChecking();
+            this.enableForm();
+            
+        } else if (data.status === 'processing') {
+            console.log('=== WORKFLOW STILL PROCESSING ===');
+            console.log('Progress:', data.progress + '%');
+            console.log('Message:', data.message);
+            // Continue checking - don't stop
+            
+        } else {
+            console.log('=== UNKNOWN STATUS ===');
+            console.log('Unknown workflow status:', data.status);
+            // Continue checking for now
+        }
+    }
+    
     updateProgress(data) {
         const progressBar = document.getElementById('progressBar');
         const progressMessage = document.getElementById('progressMessage');
@@ -473,6 +505,10 @@ class MedicalCodingUI {
             clearTimeout(this.statusCheckTimeout);
             this.statusCheckTimeout = null;
         }
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
     }
     
     showToast(message, type = 'info') {
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Temporal Dispatcher - Shared client and event loop for the web tier
+One background asyncio loop owns one long-lived Temporal client; request
+threads hand it work through a bounded queue instead of spinning up their
+own threads, loops and connections.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from temporalio.client import Client
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[Client], Awaitable[Any]]
+ErrorCallback = Callable[[Exception], None]
+
+class DispatcherQueueFull(Exception):
+    """Raised when the submission queue is at capacity; callers should back off."""
+
+
+class TemporalDispatcher:
+    """Runs Temporal client calls on a dedicated loop thread with a bounded submission queue."""
+
+    def __init__(
+        self,
+        target: str = "localhost:7233",
+        max_queue_size: int = 1000,
+        concurrency: int = 16,
+        latency_window: int = 1000,
+    ):
+        self.target = target
+        self.max_queue_size = max_queue_size
+        self.concurrency = concurrency
+
+        self._slots = threading.BoundedSemaphore(max_queue_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._client: Optional[Client] = None
+        self._client_lock: Optional[asyncio.Lock] = None
+        self._background_tasks = set()
+
+        self._stats_lock = threading.Lock()
+        self._queue_depth = 0
+        self._in_flight = 0
+        self._counters = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._latencies = deque(maxlen=latency_window)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> "TemporalDispatcher":
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_loop, name="temporal-dispatcher", daemon=True)
+                self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._client_lock = asyncio.Lock()
+        for _ in range(self.concurrency):
+            self._loop.create_task(self._consume())
+        self._ready.set()
+        logger.info(f"🔌 Temporal dispatcher started ({self.concurrency} consumers, queue size {self.max_queue_size})")
+        self._loop.run_forever()
+
+        # Stopped: cancel the consumers and watchers, then release the loop
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    def stop(self, timeout: float = 5.0):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if threading.current_thread() is not self._thread:
+                self._thread.join(timeout)
+
+    async def get_client(self) -> Client:
+        """Connect once and reuse the client for the life of the process."""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    self._client = await Client.connect(self.target)
+                    logger.info(f"🔌 Connected to Temporal at {self.target}")
+        return self._client
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+
+    def submit(self, job: Job, on_error: Optional[ErrorCallback] = None):
+        """Queue ``job(client)`` to run on the dispatcher loop without waiting for it.
+
+        When no Temporal connection can be made the job never runs, so
+        ``on_error(exception)`` is called instead to record the failure (jobs
+        handle their own errors once they run). Raises DispatcherQueueFull
+        when max_queue_size jobs are already waiting.
+        """
+        self.start()
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._counters["rejected"] += 1
+            raise DispatcherQueueFull(f"Submission queue full ({self.max_queue_size} pending)")
+
+        with self._stats_lock:
+            self._queue_depth += 1
+            self._counters["submitted"] += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (time.perf_counter(), job, on_error))
+
+    async def _consume(self):
+        while True:
+            enqueued_at, job, on_error = await self._queue.get()
+            self._slots.release()
+            with self._stats_lock:
+                self._queue_depth -= 1
+                self._in_flight += 1
+            outcome = "completed"
+            try:
+                try:
+                    client = await self.get_client()
+                except Exception as e:
+                    logger.error(f"Dispatcher could not connect to Temporal at {self.target}: {str(e)}")
+                    if on_error is not None:
+                        on_error(e)
+                    raise
+                await job(client)
+            except Exception as e:
+                outcome = "failed"
+                logger.error(f"Dispatcher job failed: {str(e)}")
+            finally:
+                with self._stats_lock:
+                    self._in_flight -= 1
+                    self._counters[outcome] += 1
+                    self._latencies.append(time.perf_counter() - enqueued_at)
+
+    def run(self, job: Job, timeout: Optional[float] = 30) -> Any:
+        """Run ``job(client)`` on the dispatcher loop and block for its result.
+
+        Used for short reads (queries, describes) that should not wait behind
+        queued submissions.
+        """
+        self.start()
+
+        async def call():
+            return await job(await self.get_client())
+
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result(timeout)
+
+    def spawn(self, coro: Awaitable[Any]):
+        """Keep a background coroutine (e.g. a result watcher) alive on the dispatcher loop.
+
+        Must be called from the dispatcher loop, i.e. from inside a job.
+        """
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, job counters and submit latency (enqueue to job completion)."""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "queue_depth": self._queue_depth,
+                "max_queue_size": self.max_queue_size,
+                "in_flight": self._in_flight,
+                "background_tasks": len(self._background_tasks),
+                **self._counters
+            }
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else None
+
+        stats["submit_latency_ms"] = {
+            "avg": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "samples": len(latencies)
+        }
+        return stats
+
+
+_dispatcher: Optional[TemporalDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher() -> TemporalDispatcher:
+    """Return the process-wide dispatcher, configured from the environment on first use.
+
+    TEMPORAL_ADDRESS, DISPATCHER_QUEUE_SIZE and DISPATCHER_CONCURRENCY tune it.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = TemporalDispatcher(
+                target=os.getenv("TEMPORAL_ADDRESS", "localhost:7233"),
+                max_queue_size=int(os.getenv("DISPATCHER_QUEUE_SIZE", "1000")),
+                concurrency=int(os.getenv("DISPATCHER_CONCURRENCY", "16"))
+            )
+            atexit.register(_dispatcher.stop)
+    return _dispatcher
@@ -5,165 +5,422 @@ A comprehensive medical coding system using Temporal workflows and Amazon Bedroc
 """
 
 import asyncio
+import functools
 import logging
-import json
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-
-# Load environment variables from .env file
-from dotenv import load_dotenv
-load_dotenv()
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from temporalio import activity, workflow
 from temporalio.client import Client
 from temporalio.worker import Worker
 from temporalio.common import RetryPolicy
+from temporalio.exceptions import ApplicationError
+
+# The workflow sandbox re-imports this module for every workflow run; passing the
+# helper modules through shares the worker's copies instead of re-executing them
+with workflow.unsafe.imports_passed_through():
+    from dotenv import load_dotenv
+
+# Load environment variables from .env file before the modules below read their
+# settings, once per process rather than again in every sandboxed run
+if not workflow.unsafe.in_sandbox():
+    load_dotenv()
+
+with workflow.unsafe.imports_passed_through():
+    from model_client import call_priority, get_model_client
+    from result_cache import get_result_cache
+    from icd10_index import get_code_catalog
+    from code_rules import validate_codes_with_rules
+    from code_retrieval import retrieve_candidates, warm_up_code_retrievers
+    from response_parsing import ResponseParseError, parse_model_response
+    from prompts import analysis_prompt, candidate_coding_prompt, coding_prompt, fast_coding_prompt, validation_prompt
+    from rate_limiter import backoff_delay, is_throttling_error
+    from document_chunking import CHUNK_MAX_CHARS, CHUNK_MAX_PARALLEL, chunk_documents, merge_analyses, merge_codes
+    from blob_store import BlobNotFound, resolve_content
+    from clinical_extraction import LOCAL_EXTRACTION, extract_clinical_facts, merge_extracted
+    from model_tiers import get_tier_policy, run_cascade
+    from model_metrics import get_model_metrics, set_cache_status, summarize_model_usage, track_model_usage
+    from workflow_contract import (
+        ACTIVITY_TASK_QUEUE, BATCH_MEDICAL_CODING_WORKFLOW, BATCH_PRIORITY, DEFAULT_PRIORITY, MEDICAL_CODING_WORKFLOW,
+        PRIORITY_LANES, PROGRESS_QUERY, TASK_QUEUE,
+        document_priority, lane_task_queue, priority_for_task_queue
+    )
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# What one worker polls: "workflow" tasks (plus local activities), "activity" tasks, or "all"
+WORKER_ROLES = ("all", "workflow", "activity")
+
+def worker_lanes() -> List[str]:
+    """Priority lanes this process polls (WORKER_LANES, default all), each with its own workers and slots."""
+    lanes = [lane.strip() for lane in os.getenv("WORKER_LANES", ",".join(PRIORITY_LANES)).split(",") if lane.strip()]
+    unknown = [lane for lane in lanes if lane not in PRIORITY_LANES]
+    if unknown:
+        raise ValueError(f"Unknown priority lanes in WORKER_LANES: {', '.join(unknown)} (expected {', '.join(PRIORITY_LANES)})")
+    return lanes
+
+# Documents coded concurrently by a BatchMedicalCodingWorkflow started before the web
+# tier pinned max_parallel in its input. Fixed rather than read from the environment,
+# so a redeploy cannot change how such an execution replays
+UNPINNED_BATCH_MAX_PARALLEL = 50
+
+# Bump these whenever the matching prompt changes so stale cached results are not reused
+ANALYSIS_PROMPT_VERSION = "analysis-v2"
+ANALYSIS_FACTS_PROMPT_VERSION = "analysis-facts-v1"
+ICD10_CODES_PROMPT_VERSION = "icd10-codes-v3"
+ICD10_CODES_RETRIEVAL_PROMPT_VERSION = "icd10-codes-retrieval-v2"
+FAST_CODING_PROMPT_VERSION = "fast-coding-v2"
+FAST_CODING_FACTS_PROMPT_VERSION = "fast-coding-facts-v1"
+
+# Candidate codes retrieved from the local ICD-10 tables per extracted finding
+CANDIDATES_PER_FINDING = 5
+
+# Fast mode (see WORKFLOW_MODES) validates only below this overall code confidence
+FAST_MODE_VALIDATION_THRESHOLD = 0.85
+
+# Reports whose overall code confidence falls below this are flagged for human review
+REVIEW_CONFIDENCE_THRESHOLD = 0.80
+
+# ============================================================================
+# RESULT CACHING
+# ============================================================================
+
+def _cache_lookup(namespace: str, prompt_version: str, document: Dict[str, Any], extra: Any = None):
+    """Look up a cached model result for this document.
+
+    Returns (cache, key, cached_result); cache is None when caching is disabled
+    or bypassed for this document via ``bypass_cache``.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return None, None, None
+    if document.get("bypass_cache"):
+        cache.record_bypass(namespace)
+        set_cache_status("bypass")
+        return None, None, None
+
+    key = cache.make_key(namespace, load_document(document).get("content", ""), prompt_version, get_tier_policy().cache_model(get_model_client().model), extra)
+    cached = cache.get(key)
+    set_cache_status("hit" if cached is not None else "miss")
+    return cache, key, cached
+
+# ============================================================================
+# MODEL ERROR CLASSIFICATION
+# ============================================================================
+
+def model_activity_error(message: str, error: Exception) -> Exception:
+    """The exception a model activity raises for an error, classified for Temporal's retries.
+    
+    Unusable responses are not retried: at this temperature a retry mostly
+    reproduces the same output at the cost of another model call. Throttling is
+    retried after a jittered delay so throttled activities do not return in
+    lockstep; anything else keeps the workflow's retry policy.
+    """
+    if isinstance(error, ApplicationError):
+        return error
+    if isinstance(error, ResponseParseError):
+        return ApplicationError(f"{message}: {error}", type="ModelResponseInvalid", non_retryable=True)
+    if is_throttling_error(error):
+        attempt = activity.info().attempt if activity.in_activity() else 1
+        return ApplicationError(
+            f"{message}: {error}",
+            type="ModelThrottled",
+            next_retry_delay=timedelta(seconds=1 + backoff_delay(attempt, base=2.0, cap=60.0))
+        )
+    return Exception(f"{message}: {error}")
+
+# ============================================================================
+# MODEL TIER ESCALATION
+# ============================================================================
+
+# Each check returns why a first-pass result should go to the next model tier
+# (see model_tiers.run_cascade), or None to keep it
+
+def analysis_escalation(analysis: Dict[str, Any], min_confidence: float, partial: bool = False) -> Optional[str]:
+    """Escalate analyses without diagnoses or with low mean diagnosis confidence."""
+    if not analysis.get("diagnoses"):
+        # One chunk of a long note may hold no diagnoses (a medication list, say); a whole note should
+        return None if partial else "no diagnoses found"
+    if analysis.get("confidence_score", 0) < min_confidence:
+        return f"diagnosis confidence {analysis.get('confidence_score', 0):.2f} below {min_confidence}"
+    return None
+
+def codes_escalation(codes: Dict[str, List[Dict[str, Any]]], min_confidence: float, expected: bool = True) -> Optional[str]:
+    """Escalate code sets that are missing, low-confidence or fail the local code rules."""
+    if not codes.get("diagnosis_codes") and not codes.get("procedure_codes"):
+        return "no codes for the findings" if expected else None
+    confidence = overall_code_confidence(codes)
+    if confidence < min_confidence:
+        return f"code confidence {confidence:.2f} below {min_confidence}"
+    rule_errors = validate_codes_with_rules(codes, get_code_catalog())["errors"]
+    if rule_errors:
+        return f"{len(rule_errors)} code rule errors ({rule_errors[0]})"
+    return None
+
+def validation_escalation(validation: Dict[str, Any], min_confidence: float) -> Optional[str]:
+    """Escalate validations that report low confidence in their own verdict."""
+    confidence = validation.get("confidence_score")
+    if confidence is None:
+        return None
+    confidence = confidence / 100 if confidence > 1 else confidence
+    if confidence < min_confidence:
+        return f"validation confidence {confidence:.2f} below {min_confidence}"
+    return None
+
+# ============================================================================
+# DOCUMENT CONTENT
+# ============================================================================
+
+def load_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """The document with its content, read from the blob store for offloaded (claim-check) documents."""
+    try:
+        return resolve_content(document)
+    except BlobNotFound as e:
+        # Retried: another worker may share the store, or it may not be mounted yet
+        raise ApplicationError(f"Document content {e} is not in this worker's blob store", type="DocumentBlobMissing")
+
+@activity.defn
+async def plan_document_chunks(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Chunk an offloaded document; each chunk references the stored note and the span it covers."""
+    chunks = chunk_documents(load_document(document), document.get("chunk_max_chars"))
+    for chunk in chunks:
+        text = chunk.pop("content")
+        end = chunk["chunk"]["end"]
+        chunk["content_span"] = [end - len(text), end]
+    return chunks
+
+# ============================================================================
+# MODEL USAGE TRACKING
+# ============================================================================
+
+def activity_lane() -> Optional[str]:
+    """Priority lane of the running activity, recording how long it waited in the lane's queue."""
+    if not activity.in_activity():
+        return None
+    info = activity.info()
+    lane = priority_for_task_queue(info.task_queue)
+    if not info.is_local:
+        get_model_metrics().record_queue_latency(
+            lane, "activity", (info.started_time - info.current_attempt_scheduled_time).total_seconds()
+        )
+    return lane
+
+def tracks_model_usage(step: str):
+    """Record tokens, model latency, retries and cache status of an activity's model calls.
+
+    The activity's result dict gets a ``model_usage`` entry, which the workflow
+    collects into the per-document cost breakdown. Model calls wait for a
+    concurrency slot in the priority lane the activity was dispatched on.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args):
+            attempt = activity.info().attempt if activity.in_activity() else 1
+            with track_model_usage(step, attempt) as usage, call_priority(activity_lane()):
+                result = await fn(*args)
+            return {**result, "model_usage": usage.summary()}
+        return wrapper
+    return decorator
+
 # ============================================================================
 # AMAZON BEDROCK AI INTEGRATION
 # ============================================================================
 
 @activity.defn
+@tracks_model_usage("analysis")
 async def analyze_medical_document_with_bedrock(document: Dict[str, Any]) -> Dict[str, Any]:
     """Analyze medical document using Amazon Bedrock AI."""
+    document = load_document(document)
     document_id = document["document_id"]
-    content = document["content"]
     
     logger.info(f"🔍 Analyzing medical document {document_id} with Amazon Bedrock AI")
     
+    # Chunks of a long document carry their position and sections, which the prompt mentions
+    chunk = document.get("chunk")
+    prompt_version = ANALYSIS_FACTS_PROMPT_VERSION if LOCAL_EXTRACTION else ANALYSIS_PROMPT_VERSION
+    cache, cache_key, cached = _cache_lookup("analysis", prompt_version, document, chunk)
+    if cached is not None:
+        logger.info(f"⚡ Analysis cache hit for {document_id}")
+        return cached
+    
     try:
-        from litellm import completion
-        
-        # Set AWS credentials from environment
-        os.environ["AWS_ACCESS_KEY_ID"] = os.getenv("AWS_ACCESS_KEY_ID", "")
-        os.environ["AWS_SECRET_ACCESS_KEY"] = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-        os.environ["AWS_REGION_NAME"] = os.getenv("AWS_REGION_NAME", "us-east-1")
-        
-        prompt = f"""
-        Analyze this medical document and extract clinical information. Provide a comprehensive analysis including:
-        
-        1. Diagnoses with confidence scores
-        2. Procedures performed or recommended
-        3. Medications mentioned
-        4. Vital signs if present
-        5. Severity assessments
-        
-        MEDICAL DOCUMENT:
-        {content}
-        
-        Respond with JSON only in this format:
-        {{
-            "diagnoses": [
-                {{"condition": "condition name", "confidence": 0.95, "evidence": "supporting text", "severity": "mild/moderate/severe"}}
-            ],
-            "procedures": [
-                {{"procedure": "procedure name", "confidence": 0.90, "evidence": "supporting text", "type": "diagnostic/therapeutic"}}
-            ],
-            "medications": [
-                {{"medication": "medication name", "dosage": "dosage info", "indication": "purpose"}}
-            ],
-            "vital_signs": {{
-                "blood_pressure": "value",
-                "heart_rate": "value",
-                "temperature": "value",
-                "oxygen_saturation": "value"
-            }}
-        }}
-        """
+        # Vitals, lab values and dosed medications come from local patterns; the model handles the rest
+        facts = extract_clinical_facts(document["content"]) if LOCAL_EXTRACTION else None
+        system, prompt = analysis_prompt(document, facts)
         
-        response = completion(
-            model="bedrock/anthropic.claude-3-sonnet-20240229-v1:0",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=2000,
-            temperature=0.1
-        )
-        
-        ai_response = response.choices[0].message.content
+        async def analyze(model: Optional[str]) -> Dict[str, Any]:
+            ai_response = await get_model_client().complete(
+                prompt,
+                max_tokens=2000,
+                temperature=0.1,
+                model=model,
+                json_response=True,
+                system=system
+            )
+            analysis = parse_model_response(ai_response, "analysis")
+            if facts is not None:
+                analysis = merge_extracted(analysis, facts)
+            analysis["confidence_score"] = sum(d.get("confidence", 0) for d in analysis.get("diagnoses", [])) / len(analysis.get("diagnoses", [])) if analysis.get("diagnoses") else 0
+            return analysis
         
         try:
-            analysis = json.loads(ai_response)
-            analysis["processing_time_seconds"] = 2.5
-            analysis["confidence_score"] = sum(d.get("confidence", 0) for d in analysis.get("diagnoses", [])) / len(analysis.get("diagnoses", [])) if analysis.get("diagnoses") else 0
+            # Small model first; escalated to a larger tier when the result fails the checks
+            analysis = await run_cascade(
+                "analysis", analyze, lambda analysis, threshold: analysis_escalation(analysis, threshold, partial=chunk is not None)
+            )
+            
+            if cache is not None:
+                cache.set(cache_key, analysis)
             
             logger.info(f"✅ Amazon Bedrock AI analysis completed for {document_id}")
             return analysis
             
-        except json.JSONDecodeError as e:
+        except ResponseParseError as e:
             logger.error(f"JSON parsing failed for {document_id}: {str(e)}")
-            raise Exception(f"AI response parsing failed: {str(e)}")
+            raise model_activity_error("AI response parsing failed", e)
             
     except Exception as e:
         logger.error(f"Amazon Bedrock AI analysis failed for {document_id}: {str(e)}")
-        raise Exception(f"AI analysis failed: {str(e)}")
+        raise model_activity_error("AI analysis failed", e)
 
 @activity.defn
+@tracks_model_usage("coding")
 async def generate_icd10_codes_with_bedrock(analysis: Dict[str, Any], document: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
     """Generate ICD-10 codes using Amazon Bedrock AI."""
     document_id = document["document_id"]
     
     logger.info(f"🏷️  Generating ICD-10 codes for {document_id} with Amazon Bedrock AI")
     
+    # Candidate codes from the local ICD-10 tables, when configured, let the prompt
+    # carry the findings and a short code list instead of the raw document
+    candidates = await asyncio.to_thread(retrieve_candidates, analysis, CANDIDATES_PER_FINDING)
+    use_candidates = bool(candidates["diagnosis"] or candidates["procedure"])
+    
+    # The prompt also carries the analysis summary and any near-duplicate's codes, so they are part of the key
+    clinical_summary = {
+        "diagnoses": [d.get("condition") for d in analysis.get("diagnoses", [])],
+        "procedures": [p.get("procedure") for p in analysis.get("procedures", [])]
+    }
+    if document.get("reference_codes"):
+        clinical_summary["reference_codes"] = document["reference_codes"]
+    prompt_version = ICD10_CODES_RETRIEVAL_PROMPT_VERSION if use_candidates else ICD10_CODES_PROMPT_VERSION
+    cache, cache_key, cached = _cache_lookup("icd10_codes", prompt_version, document, clinical_summary)
+    if cached is not None:
+        logger.info(f"⚡ ICD-10 code cache hit for {document_id}")
+        return cached
+    
     try:
-        from litellm import completion
-        
-        # Set AWS credentials from environment
-        os.environ["AWS_ACCESS_KEY_ID"] = os.getenv("AWS_ACCESS_KEY_ID", "")
-        os.environ["AWS_SECRET_ACCESS_KEY"] = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-        os.environ["AWS_REGION_NAME"] = os.getenv("AWS_REGION_NAME", "us-east-1")
-        
-        prompt = f"""
-        Generate specific ICD-10 diagnosis and procedure codes for this medical case. Use real ICD-10-CM codes for diagnoses and ICD-10-PCS codes for procedures.
-        
-        CLINICAL SUMMARY:
-        Diagnoses: {[d['condition'] for d in analysis.get('diagnoses', [])]}
-        Procedures: {[p['procedure'] for p in analysis.get('procedures', [])]}
-        
-        ORIGINAL DOCUMENT:
-        {document.get('content', '')[:1000]}
-        
-        Respond with JSON only in this format:
-        {{
-            "diagnosis_codes": [
-                {{"code": "ICD10_CODE", "description": "full description", "confidence": 0.95, "evidence": "supporting text", "primary": true/false, "category": "category"}}
-            ],
-            "procedure_codes": [
-                {{"code": "ICD10_PCS_CODE", "description": "full description", "confidence": 0.90, "evidence": "supporting text", "primary": true/false, "category": "category"}}
-            ]
-        }}
-        """
-        
-        response = completion(
-            model="bedrock/anthropic.claude-3-sonnet-20240229-v1:0",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1500,
-            temperature=0.1
-        )
+        if use_candidates:
+            system, prompt = candidate_coding_prompt(analysis, candidates, document.get("reference_codes"))
+        else:
+            system, prompt = coding_prompt(analysis, document.get("reference_codes"))
         
-        ai_response = response.choices[0].message.content
+        async def code(model: Optional[str]) -> Dict[str, List[Dict[str, Any]]]:
+            ai_response = await get_model_client().complete(
+                prompt,
+                max_tokens=1500,
+                temperature=0.1,
+                model=model,
+                json_response=True,
+                system=system
+            )
+            return parse_model_response(ai_response, "codes")
         
         try:
-            codes = json.loads(ai_response)
+            expected = bool(analysis.get("diagnoses") or analysis.get("procedures"))
+            codes = await run_cascade("coding", code, lambda codes, threshold: codes_escalation(codes, threshold, expected))
+            if cache is not None:
+                cache.set(cache_key, codes)
+            if use_candidates:
+                logger.info(f"🔎 Coded {document_id} against retrieved candidates for {len(candidates['diagnosis']) + len(candidates['procedure'])} findings")
             logger.info(f"✅ Amazon Bedrock AI generated {len(codes.get('diagnosis_codes', []))} diagnosis codes and {len(codes.get('procedure_codes', []))} procedure codes")
             return codes
             
-        except json.JSONDecodeError as e:
+        except ResponseParseError as e:
             logger.error(f"JSON parsing failed for ICD-10 codes {document_id}: {str(e)}")
-            raise Exception(f"AI code generation parsing failed: {str(e)}")
+            raise model_activity_error("AI code generation parsing failed", e)
             
     except Exception as e:
         logger.error(f"Amazon Bedrock AI code generation failed for {document_id}: {str(e)}")
-        raise Exception(f"AI code generation failed: {str(e)}")
+        raise model_activity_error("AI code generation failed", e)
+
+@activity.defn
+@tracks_model_usage("extraction")
+async def extract_and_code_with_bedrock(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract clinical findings and ICD-10 codes in a single Amazon Bedrock AI call (fast mode)."""
+    document = load_document(document)
+    document_id = document["document_id"]
+    
+    logger.info(f"⚡ Extracting findings and ICD-10 codes for {document_id} in one Amazon Bedrock AI call")
+    
+    prompt_version = FAST_CODING_FACTS_PROMPT_VERSION if LOCAL_EXTRACTION else FAST_CODING_PROMPT_VERSION
+    # A near-duplicate's codes change the prompt, so they are part of the key
+    extra = document.get("chunk")
+    if document.get("reference_codes"):
+        extra = {"chunk": extra, "reference_codes": document["reference_codes"]}
+    cache, cache_key, cached = _cache_lookup("fast_coding", prompt_version, document, extra)
+    if cached is not None:
+        logger.info(f"⚡ Fast coding cache hit for {document_id}")
+        return cached
+    
+    try:
+        facts = extract_clinical_facts(document["content"]) if LOCAL_EXTRACTION else None
+        system, prompt = fast_coding_prompt(document, facts)
+        
+        async def extract(model: Optional[str]) -> Dict[str, Any]:
+            ai_response = await get_model_client().complete(
+                prompt,
+                max_tokens=2500,
+                temperature=0.1,
+                model=model,
+                json_response=True,
+                system=system
+            )
+            extraction = parse_model_response(ai_response, "fast_coding")
+            analysis = extraction.get("analysis", {})
+            if facts is not None:
+                analysis = merge_extracted(analysis, facts)
+            codes = {
+                "diagnosis_codes": extraction.get("codes", {}).get("diagnosis_codes", []),
+                "procedure_codes": extraction.get("codes", {}).get("procedure_codes", [])
+            }
+            diagnoses = analysis.get("diagnoses", [])
+            analysis["confidence_score"] = sum(d.get("confidence", 0) for d in diagnoses) / len(diagnoses) if diagnoses else 0
+            return {"analysis": analysis, "codes": codes}
+        
+        def escalation(result: Dict[str, Any], threshold: float) -> Optional[str]:
+            analysis = result["analysis"]
+            return (
+                analysis_escalation(analysis, threshold, partial=document.get("chunk") is not None)
+                or codes_escalation(result["codes"], threshold, bool(analysis.get("diagnoses") or analysis.get("procedures")))
+            )
+        
+        try:
+            result = await run_cascade("extraction", extract, escalation)
+            codes = result["codes"]
+            if cache is not None:
+                cache.set(cache_key, result)
+            
+            logger.info(f"✅ Fast coding produced {len(codes['diagnosis_codes'])} diagnosis codes and {len(codes['procedure_codes'])} procedure codes for {document_id}")
+            return result
+            
+        except ResponseParseError as e:
+            logger.error(f"JSON parsing failed for fast coding {document_id}: {str(e)}")
+            raise model_activity_error("AI fast coding parsing failed", e)
+            
+    except Exception as e:
+        logger.error(f"Amazon Bedrock AI fast coding failed for {document_id}: {str(e)}")
+        raise model_activity_error("AI fast coding failed", e)
 
 # ============================================================================
 # VALIDATION AND QUALITY ASSURANCE
 # ============================================================================
 
 @activity.defn
+@tracks_model_usage("validation")
 async def validate_coding_result(codes: Dict[str, List[Dict[str, Any]]], document: Dict[str, Any]) -> Dict[str, Any]:
     """Validate coding result using AI-powered quality assurance."""
     document_id = document["document_id"]
@@ -171,66 +428,104 @@ async def validate_coding_result(codes: Dict[str, List[Dict[str, Any]]], documen
     logger.info(f"🔍 Validating coding result for {document_id}")
     
     try:
-        from litellm import completion
-        
-        # Set AWS credentials from environment
-        os.environ["AWS_ACCESS_KEY_ID"] = os.getenv("AWS_ACCESS_KEY_ID", "")
-        os.environ["AWS_SECRET_ACCESS_KEY"] = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-        os.environ["AWS_REGION_NAME"] = os.getenv("AWS_REGION_NAME", "us-east-1")
-        
-        prompt = f"""
-        Validate these ICD-10 codes for accuracy and compliance. Check for:
-        1. Code accuracy and specificity
-        2. Compliance with coding guidelines
-        3. Completeness of documentation
-        4. Appropriate use of primary vs secondary codes
-        
-        ORIGINAL DOCUMENT:
-        {document.get('content', '')[:500]}
-        
-        GENERATED CODES:
-        Diagnosis Codes: {codes.get('diagnosis_codes', [])}
-        Procedure Codes: {codes.get('procedure_codes', [])}
-        
-        Respond with JSON only in this format:
-        {{
-            "is_valid": true/false,
-            "confidence_score": 0.95,
-            "compliance_score": 100,
-            "validation_checks_passed": 3,
-            "errors": [],
-            "warnings": [],
-            "recommendations": ["recommendation text"],
-            "processing_time_seconds": 1.2
-        }}
-        """
-        
-        response = completion(
-            model="bedrock/anthropic.claude-3-sonnet-20240229-v1:0",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1000,
-            temperature=0.1
-        )
+        system, prompt = validation_prompt(codes)
         
-        ai_response = response.choices[0].message.content
+        async def validate(model: Optional[str]) -> Dict[str, Any]:
+            ai_response = await get_model_client().complete(
+                prompt,
+                max_tokens=1000,
+                temperature=0.1,
+                model=model,
+                json_response=True,
+                system=system
+            )
+            return parse_model_response(ai_response, "validation")
         
         try:
-            validation = json.loads(ai_response)
+            validation = await run_cascade("validation", validate, validation_escalation)
             logger.info(f"✅ AI validation completed for {document_id} with {validation.get('compliance_score', 0)}% compliance")
             return validation
             
-        except json.JSONDecodeError as e:
+        except ResponseParseError as e:
             logger.error(f"JSON parsing failed for validation {document_id}: {str(e)}")
-            raise Exception(f"AI validation parsing failed: {str(e)}")
+            raise model_activity_error("AI validation parsing failed", e)
             
     except Exception as e:
         logger.error(f"AI validation failed for {document_id}: {str(e)}")
-        raise Exception(f"AI validation failed: {str(e)}")
+        raise model_activity_error("AI validation failed", e)
+
+@activity.defn
+async def check_codes_with_rules(codes: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Validate code format, existence, billability and primary-code rules against the local ICD-10 tables."""
+    rule_check = validate_codes_with_rules(codes, get_code_catalog())
+    logger.info(f"📏 Rule checks: {len(rule_check['errors'])} errors, {len(rule_check['warnings'])} warnings in {rule_check['elapsed_ms']} ms")
+    return rule_check
+
+def merge_validation(validation: Dict[str, Any], rule_check: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold local rule-check findings into an AI (or skipped) validation result."""
+    merged = dict(validation)
+    merged["rule_checks"] = rule_check
+    merged["errors"] = list(validation.get("errors", [])) + rule_check["errors"]
+    merged["warnings"] = list(validation.get("warnings", [])) + rule_check["warnings"]
+    merged["is_valid"] = bool(validation.get("is_valid", True)) and rule_check["is_valid"]
+    return merged
 
 # ============================================================================
 # FINAL REPORT GENERATION
 # ============================================================================
 
+def overall_code_confidence(codes: Dict[str, List[Dict[str, Any]]]) -> float:
+    """Mean confidence across all diagnosis and procedure codes."""
+    confidences = [c.get("confidence", 0) for c in codes.get("diagnosis_codes", []) + codes.get("procedure_codes", [])]
+    return sum(confidences) / len(confidences) if confidences else 0
+
+def summarize_analysis(analysis: Dict[str, Any]) -> Dict[str, int]:
+    """Count the clinical findings in an analysis."""
+    return {
+        "total_diagnoses": len(analysis.get("diagnoses", [])),
+        "total_procedures": len(analysis.get("procedures", [])),
+        "medications_found": len(analysis.get("medications", [])),
+        "vital_signs_captured": sum(1 for value in (analysis.get("vital_signs") or {}).values() if value),
+        "lab_results_found": len(analysis.get("lab_results", []))
+    }
+
+def summarize_confidence(analysis: Dict[str, Any], codes: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Confidence aggregates over the analysis findings and assigned codes."""
+    def aggregate(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        values = [item.get("confidence", 0) for item in items]
+        if not values:
+            return {"count": 0, "mean": None, "min": None, "max": None}
+        return {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 4),
+            "min": min(values),
+            "max": max(values)
+        }
+    
+    return {
+        "diagnosis_findings": aggregate(analysis.get("diagnoses", [])),
+        "procedure_findings": aggregate(analysis.get("procedures", [])),
+        "diagnosis_codes": aggregate(codes.get("diagnosis_codes", [])),
+        "procedure_codes": aggregate(codes.get("procedure_codes", [])),
+        "low_confidence_codes": [
+            c.get("code") for c in codes.get("diagnosis_codes", []) + codes.get("procedure_codes", [])
+            if c.get("confidence", 0) < REVIEW_CONFIDENCE_THRESHOLD
+        ]
+    }
+
+def compute_quality_metrics(analysis: Dict[str, Any], codes: Dict[str, List[Dict[str, Any]]], validation: Dict[str, Any]) -> Dict[str, Any]:
+    """Quality metrics derived from the analysis, codes and validation result."""
+    findings = len(analysis.get("diagnoses", [])) + len(analysis.get("procedures", []))
+    total_codes = len(codes.get("diagnosis_codes", [])) + len(codes.get("procedure_codes", []))
+    compliance_score = validation.get("compliance_score")
+    if compliance_score is None:
+        compliance_score = 100.0 if validation.get("is_valid", True) else 0.0
+    return {
+        "code_accuracy": round(overall_code_confidence(codes) * 100, 1),
+        "completeness_score": round(min(total_codes / findings, 1.0) * 100, 1) if findings else 100.0,
+        "compliance_score": float(compliance_score)
+    }
+
 @activity.defn
 async def generate_final_report(
     document: Dict[str, Any],
@@ -238,181 +533,613 @@ async def generate_final_report(
     codes: Dict[str, List[Dict[str, Any]]],
     validation: Dict[str, Any]
 ) -> Dict[str, Any]:
-    """Generate comprehensive final report using AI."""
+    """Assemble the final coding report locally from the analysis, codes and validation.
+    
+    Counts and metrics are computed here rather than by the model; the workflow
+    attaches measured per-activity timings to the returned report.
+    """
     document_id = document["document_id"]
     
     logger.info(f"📊 Generating final report for {document_id}")
     
-    try:
-        from litellm import completion
-        
-        # Set AWS credentials from environment
-        os.environ["AWS_ACCESS_KEY_ID"] = os.getenv("AWS_ACCESS_KEY_ID", "")
-        os.environ["AWS_SECRET_ACCESS_KEY"] = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-        os.environ["AWS_REGION_NAME"] = os.getenv("AWS_REGION_NAME", "us-east-1")
-        
-        prompt = f"""
-        Generate a comprehensive medical coding report. Include:
-        1. Summary of analysis
-        2. Quality metrics
-        3. Compliance assessment
-        4. Recommendations for improvement
-        
-        ANALYSIS: {analysis}
-        CODES: {codes}
-        VALIDATION: {validation}
-        
-        Respond with JSON only in this format:
-        {{
-            "analysis_summary": {{
-                "total_diagnoses": 2,
-                "total_procedures": 1,
-                "medications_found": 3,
-                "vital_signs_captured": 4
-            }},
-            "quality_metrics": {{
-                "code_accuracy": 95.0,
-                "completeness_score": 85.0,
-                "compliance_score": 100.0,
-                "processing_efficiency": 0.8
-            }},
-            "requires_review": false,
-            "ai_model": "Claude 3.5 Sonnet (Amazon Bedrock)",
-            "bedrock_used": true,
-            "temporal_features_used": ["Activity orchestration", "Error handling", "State management"]
-        }}
-        """
-        
-        response = completion(
-            model="bedrock/anthropic.claude-3-sonnet-20240229-v1:0",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1000,
-            temperature=0.1
-        )
-        
-        ai_response = response.choices[0].message.content
-        
-        try:
-            report = json.loads(ai_response)
-            
-            # Calculate overall confidence
-            diagnosis_confidences = [d.get("confidence", 0) for d in codes.get("diagnosis_codes", [])]
-            procedure_confidences = [p.get("confidence", 0) for p in codes.get("procedure_codes", [])]
-            all_confidences = diagnosis_confidences + procedure_confidences
-            overall_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0
-            
-            # Build final result
-            result = {
-                "document_id": document_id,
-                "patient_id": document.get("patient_id", f"PAT-{document_id[-8:]}"),
-                "document_type": document.get("document_type", "consultation"),
-                "diagnosis_codes": codes.get("diagnosis_codes", []),
-                "procedure_codes": codes.get("procedure_codes", []),
-                "overall_confidence": overall_confidence,
-                "total_codes": len(codes.get("diagnosis_codes", [])) + len(codes.get("procedure_codes", [])),
-                "processing_time_seconds": 4.5,
-                "processing_timestamp": datetime.now().isoformat(),
-                "validation": validation,
-                "quality_metrics": report.get("quality_metrics", {}),
-                "analysis_summary": report.get("analysis_summary", {}),
-                "requires_review": report.get("requires_review", False),
-                "ai_model": report.get("ai_model", "Claude 3.5 Sonnet (Amazon Bedrock)"),
-                "bedrock_used": report.get("bedrock_used", True),
-                "temporal_features_used": report.get("temporal_features_used", []),
-                "workflow_version": "2.0"
-            }
-            
-            logger.info(f"✅ Final report generated for {document_id}")
-            return result
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing failed for final report {document_id}: {str(e)}")
-            raise Exception(f"AI report generation parsing failed: {str(e)}")
-            
-    except Exception as e:
-        logger.error(f"AI report generation failed for {document_id}: {str(e)}")
-        raise Exception(f"AI report generation failed: {str(e)}")
+    overall_confidence = overall_code_confidence(codes)
+    
+    # Build final result
+    result = {
+        "document_id": document_id,
+        "patient_id": document.get("patient_id", f"PAT-{document_id[-8:]}"),
+        "document_type": document.get("document_type", "consultation"),
+        "diagnosis_codes": codes.get("diagnosis_codes", []),
+        "procedure_codes": codes.get("procedure_codes", []),
+        "overall_confidence": overall_confidence,
+        "confidence_summary": summarize_confidence(analysis, codes),
+        "total_codes": len(codes.get("diagnosis_codes", [])) + len(codes.get("procedure_codes", [])),
+        "processing_timestamp": datetime.now().isoformat(),
+        "validation": validation,
+        "quality_metrics": compute_quality_metrics(analysis, codes, validation),
+        "analysis_summary": summarize_analysis(analysis),
+        "requires_review": (
+            not validation.get("is_valid", True)
+            or bool(validation.get("errors"))
+            or overall_confidence < REVIEW_CONFIDENCE_THRESHOLD
+        ),
+        "ai_model": get_model_client().model,
+        "bedrock_used": True,
+        "temporal_features_used": ["Activity orchestration", "Error handling", "State management", "Workflow queries"],
+        "workflow_mode": document.get("mode", "standard"),
+        "validation_mode": document.get("validation_mode", "ai"),
+        "workflow_version": "2.0"
+    }
+    if document.get("near_duplicate"):
+        # Coded with a near-duplicate note's codes as reference
+        result["near_duplicate"] = document["near_duplicate"]
+    
+    logger.info(f"✅ Final report generated for {document_id}")
+    return result
 
 # ============================================================================
 # TEMPORAL WORKFLOWS
 # ============================================================================
 
-@workflow.defn
+# Ordered workflow steps: (step name, progress message)
+WORKFLOW_STEPS = [
+    ("analysis", "Analyzing medical document with Amazon Bedrock AI"),
+    ("coding", "Generating ICD-10 codes with Amazon Bedrock AI"),
+    ("rules", "Checking codes against ICD-10 code tables"),
+    ("validation", "Validating coding result with AI"),
+    ("report", "Generating final report"),
+]
+
+FAST_WORKFLOW_STEPS = [
+    ("extraction", "Extracting findings and ICD-10 codes with Amazon Bedrock AI"),
+    ("rules", "Checking codes against ICD-10 code tables"),
+    ("validation", "Validating low-confidence coding result with AI"),
+    ("report", "Assembling final report"),
+]
+
+@workflow.defn(name=MEDICAL_CODING_WORKFLOW)
 class MedicalCodingWorkflow:
     """Main medical coding workflow using Amazon Bedrock AI."""
     
+    def __init__(self):
+        self._status = "running"
+        self._current_step: Optional[str] = None
+        self._step_order: List[str] = []
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self._use_steps(WORKFLOW_STEPS)
+        self._partial_results: Dict[str, Any] = {}
+        self._model_usage: List[Dict[str, Any]] = []
+        self._priority = DEFAULT_PRIORITY
+    
+    def _use_steps(self, steps: List[Any]):
+        self._step_order = [name for name, _ in steps]
+        self._steps = {
+            name: {"name": name, "message": message, "status": "pending"}
+            for name, message in steps
+        }
+    
+    async def _execute(self, activity_fn, args: List[Any], timeout: timedelta, local: bool = False) -> Any:
+        """Run one activity, moving any model usage it reports into the cost breakdown."""
+        if local:
+            result = await workflow.execute_local_activity(
+                activity_fn,
+                args=args,
+                start_to_close_timeout=timeout,
+                retry_policy=RetryPolicy(maximum_attempts=3)
+            )
+        else:
+            result = await workflow.execute_activity(
+                activity_fn,
+                args=args,
+                task_queue=lane_task_queue(self._priority, ACTIVITY_TASK_QUEUE),
+                start_to_close_timeout=timeout,
+                retry_policy=RetryPolicy(maximum_attempts=3)
+            )
+        if isinstance(result, dict) and "model_usage" in result:
+            self._model_usage.append(result.pop("model_usage"))
+        return result
+    
+    async def _run_step(self, step: str, activity_fn, args: List[Any], timeout: timedelta, local: bool = False) -> Any:
+        """Execute one activity, recording its state and timing for get_progress."""
+        return await self._track_step(step, self._execute(activity_fn, args, timeout, local))
+    
+    async def _run_chunked_step(self, step: str, activity_fn, chunks: List[Dict[str, Any]], timeout: timedelta) -> List[Any]:
+        """Run an activity once per document chunk, at most the input's chunk_max_parallel at a time, as one step."""
+        # Executions started without pinned settings fall back to this worker's
+        semaphore = asyncio.Semaphore(chunks[0].get("chunk_max_parallel") or CHUNK_MAX_PARALLEL)
+        entry = self._steps[step]
+        entry["chunks"] = len(chunks)
+        entry["chunks_completed"] = 0
+        
+        async def run_chunk(chunk: Dict[str, Any]) -> Any:
+            async with semaphore:
+                result = await self._execute(activity_fn, [chunk], timeout)
+                entry["chunks_completed"] += 1
+                return result
+        
+        return await self._track_step(step, asyncio.gather(*(run_chunk(chunk) for chunk in chunks)))
+    
+    async def _track_step(self, step: str, awaitable) -> Any:
+        entry = self._steps[step]
+        self._current_step = step
+        entry["status"] = "running"
+        started = workflow.now()
+        entry["started_at"] = started.isoformat()
+        try:
+            return await awaitable
+        except Exception:
+            entry["status"] = "error"
+            self._status = "error"
+            raise
+        finally:
+            completed = workflow.now()
+            entry["completed_at"] = completed.isoformat()
+            entry["duration_seconds"] = (completed - started).total_seconds()
+            if entry["status"] == "running":
+                entry["status"] = "completed"
+    
+    async def _run_graph(self, nodes: Dict[str, Callable[[Callable[[str], Awaitable[Any]]], Awaitable[Any]]]) -> Dict[str, Any]:
+        """Run workflow steps as a dependency graph.
+        
+        Each node is an async function given ``get``; awaiting ``get(name)``
+        waits for that node's result. Every node starts at once, so a node runs
+        as soon as the nodes it awaits have finished, and nodes that do not
+        depend on each other run concurrently.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        
+        async def get(name: str) -> Any:
+            return await tasks[name]
+        
+        for name, node in nodes.items():
+            tasks[name] = asyncio.create_task(node(get))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+    
     @workflow.run
     async def run(self, document: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the complete medical coding workflow."""
         document_id = document["document_id"]
+        self._started_at = workflow.now()
+        # The lane follows the task queue the workflow was started on; activities
+        # go to the same lane's activity queue
+        self._priority = priority_for_task_queue(workflow.info().task_queue)
         
-        logger.info(f"🚀 Starting medical coding workflow for document {document_id} (Amazon Bedrock AI)")
+        logger.info(f"🚀 Starting medical coding workflow for document {document_id} (Amazon Bedrock AI, {self._priority} lane)")
         
-        # Step 1: Analyze medical document with AI
-        logger.info("Step 1: Analyzing medical document with Amazon Bedrock AI")
-        analysis = await workflow.execute_activity(
-            analyze_medical_document_with_bedrock,
-            args=[document],
-            start_to_close_timeout=timedelta(minutes=5),
-            retry_policy=RetryPolicy(maximum_attempts=3)
-        )
+        if document.get("mode") == "fast":
+            return await self._run_fast(document)
         
-        # Step 2: Generate ICD-10 codes with AI
-        logger.info("Step 2: Generating ICD-10 codes with Amazon Bedrock AI")
-        codes = await workflow.execute_activity(
-            generate_icd10_codes_with_bedrock,
-            args=[analysis, document],
-            start_to_close_timeout=timedelta(minutes=5),
-            retry_policy=RetryPolicy(maximum_attempts=3)
-        )
+        # Rule checks and AI validation both only need the codes, so they run side by
+        # side; executions started before that replay them one after the other
+        parallel = workflow.patched("parallel-checks")
         
-        # Step 3: Validate coding result with AI
-        logger.info("Step 3: Validating coding result with AI")
-        validation = await workflow.execute_activity(
-            validate_coding_result,
-            args=[codes, document],
-            start_to_close_timeout=timedelta(minutes=3),
-            retry_policy=RetryPolicy(maximum_attempts=3)
-        )
+        async def analyze(get) -> Dict[str, Any]:
+            # Step 1: Analyze medical document with AI, chunk by chunk for long documents
+            chunks = await self._chunks(document)
+            if chunks:
+                logger.info(f"Step 1: Analyzing {len(chunks)} document chunks with Amazon Bedrock AI")
+                analysis = merge_analyses(await self._run_chunked_step(
+                    "analysis", analyze_medical_document_with_bedrock, chunks, timedelta(minutes=5)
+                ))
+            else:
+                logger.info("Step 1: Analyzing medical document with Amazon Bedrock AI")
+                analysis = await self._run_step(
+                    "analysis", analyze_medical_document_with_bedrock, [document], timedelta(minutes=5)
+                )
+            self._record_analysis(analysis)
+            return analysis
         
-        # Step 4: Generate final report with AI
-        logger.info("Step 4: Generating final report with AI")
-        result = await workflow.execute_activity(
-            generate_final_report,
-            args=[document, analysis, codes, validation],
-            start_to_close_timeout=timedelta(minutes=3),
-            retry_policy=RetryPolicy(maximum_attempts=3)
-        )
+        async def code(get) -> Dict[str, List[Dict[str, Any]]]:
+            # Step 2: Generate ICD-10 codes with AI
+            analysis = await get("analysis")
+            logger.info("Step 2: Generating ICD-10 codes with Amazon Bedrock AI")
+            codes = await self._run_step(
+                "coding", generate_icd10_codes_with_bedrock, [analysis, document], timedelta(minutes=5)
+            )
+            self._record_codes(codes)
+            return codes
+        
+        async def check_rules(get) -> Optional[Dict[str, Any]]:
+            # Step 3a: Check codes against the local ICD-10 tables
+            return await self._check_rules(await get("coding"))
+        
+        async def validate(get) -> Dict[str, Any]:
+            # Step 3b: Validate with AI, unless the document asks for rule checks only
+            codes = await get("coding")
+            rule_check = None if parallel else await get("rules")
+            if document.get("validation_mode") == "rules" and (parallel or rule_check is not None):
+                logger.info("Step 3: Skipping AI validation (rule checks only)")
+                return self._skip_validation()
+            logger.info("Step 3: Validating coding result with AI")
+            return await self._run_step(
+                "validation", validate_coding_result, [codes, document], timedelta(minutes=3)
+            )
+        
+        async def report(get) -> Dict[str, Any]:
+            # Step 4: Generate final report locally (executions started before the
+            # report stopped calling the model replay it as a regular activity)
+            analysis, codes = await get("analysis"), await get("coding")
+            validation = self._merge_checks(await get("validation"), await get("rules"))
+            logger.info("Step 4: Generating final report")
+            return await self._run_step(
+                "report", generate_final_report, [document, analysis, codes, validation],
+                timedelta(seconds=30), local=workflow.patched("local-final-report")
+            )
+        
+        results = await self._run_graph({
+            "analysis": analyze,
+            "coding": code,
+            "rules": check_rules,
+            "validation": validate,
+            "report": report
+        })
         
         logger.info(f"✅ Workflow completed successfully for document {document_id}")
+        return self._finish(results["report"])
+    
+    async def _run_fast(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Fast mode: one extraction+coding call, validation only for low confidence, local report."""
+        document_id = document["document_id"]
+        self._use_steps(FAST_WORKFLOW_STEPS)
+        threshold = document.get("validation_threshold", FAST_MODE_VALIDATION_THRESHOLD)
+        
+        # Low-confidence codes are validated whatever the rule checks find, so then
+        # both run side by side; executions started before that run them in turn
+        parallel = workflow.patched("parallel-checks")
+        
+        async def extract(get) -> Dict[str, Any]:
+            # Step 1: Extract findings and codes in one model call (per chunk for long documents)
+            chunks = await self._chunks(document)
+            if chunks:
+                logger.info(f"Step 1: Extracting findings and ICD-10 codes from {len(chunks)} document chunks")
+                extractions = await self._run_chunked_step(
+                    "extraction", extract_and_code_with_bedrock, chunks, timedelta(minutes=5)
+                )
+                analysis = merge_analyses([extraction["analysis"] for extraction in extractions])
+                codes = merge_codes([extraction["codes"] for extraction in extractions])
+            else:
+                logger.info("Step 1: Extracting findings and ICD-10 codes with Amazon Bedrock AI")
+                extraction = await self._run_step(
+                    "extraction", extract_and_code_with_bedrock, [document], timedelta(minutes=5)
+                )
+                analysis, codes = extraction["analysis"], extraction["codes"]
+            self._record_analysis(analysis)
+            self._record_codes(codes)
+            return {"analysis": analysis, "codes": codes}
+        
+        async def check_rules(get) -> Optional[Dict[str, Any]]:
+            # Step 2a: Check codes locally
+            return await self._check_rules((await get("extraction"))["codes"])
+        
+        async def validate(get) -> Dict[str, Any]:
+            # Step 2b: Validate with AI only when the codes are not confident enough
+            # or break a coding rule
+            codes = (await get("extraction"))["codes"]
+            confidence = overall_code_confidence(codes)
+            if parallel and confidence < threshold:
+                rules_failed = False
+            else:
+                rule_check = await get("rules")
+                rules_failed = rule_check is not None and not rule_check["is_valid"]
+            if confidence < threshold or rules_failed:
+                logger.info(f"Step 2: Validating coding result with AI (confidence {confidence:.2f}, rule errors: {rules_failed})")
+                return await self._run_step(
+                    "validation", validate_coding_result, [codes, document], timedelta(minutes=3)
+                )
+            logger.info(f"Step 2: Skipping AI validation (confidence {confidence:.2f} >= {threshold})")
+            return self._skip_validation(confidence)
+        
+        async def report(get) -> Dict[str, Any]:
+            # Step 3: Assemble the report locally
+            extraction = await get("extraction")
+            validation = self._merge_checks(await get("validation"), await get("rules"))
+            logger.info("Step 3: Assembling final report")
+            return await self._run_step(
+                "report", generate_final_report,
+                [document, extraction["analysis"], extraction["codes"], validation], timedelta(seconds=30), local=True
+            )
+        
+        results = await self._run_graph({
+            "extraction": extract,
+            "rules": check_rules,
+            "validation": validate,
+            "report": report
+        })
+        
+        logger.info(f"✅ Fast workflow completed successfully for document {document_id}")
+        return self._finish(results["report"])
+    
+    def _record_analysis(self, analysis: Dict[str, Any]):
+        self._partial_results["analysis"] = {
+            "diagnoses": [d.get("condition") for d in analysis.get("diagnoses", [])],
+            "procedures": [p.get("procedure") for p in analysis.get("procedures", [])],
+            "medications_found": len(analysis.get("medications", [])),
+            "confidence_score": analysis.get("confidence_score", 0)
+        }
+    
+    def _record_codes(self, codes: Dict[str, List[Dict[str, Any]]]):
+        self._partial_results["codes"] = {
+            "diagnosis_codes": [c.get("code") for c in codes.get("diagnosis_codes", [])],
+            "procedure_codes": [c.get("code") for c in codes.get("procedure_codes", [])]
+        }
+    
+    def _skip_validation(self, confidence: Optional[float] = None) -> Dict[str, Any]:
+        """Validation result for a skipped AI validation step."""
+        self._steps["validation"]["status"] = "skipped"
+        validation = {"is_valid": True, "skipped": True, "errors": [], "warnings": [], "recommendations": []}
+        if confidence is not None:
+            validation["confidence_score"] = confidence
+        return validation
+    
+    def _merge_checks(self, validation: Dict[str, Any], rule_check: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fold the rule checks into the validation result and publish it as a partial result."""
+        if rule_check is not None:
+            validation = merge_validation(validation, rule_check)
+        self._partial_results["validation"] = {
+            "is_valid": validation.get("is_valid"),
+            "compliance_score": validation.get("compliance_score"),
+            "skipped": validation.get("skipped", False)
+        }
+        return validation
+    
+    async def _chunks(self, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Chunk documents for the per-chunk analysis; executions started before chunking analyze them whole."""
+        if not workflow.patched("chunked-analysis"):
+            return []
+        if "content_ref" not in document:
+            chunks = chunk_documents(document, document.get("chunk_max_chars"))
+        elif document["content_ref"]["chars"] > (document.get("chunk_max_chars") or CHUNK_MAX_CHARS):
+            # The workflow only holds a reference to an offloaded note; a local
+            # activity reads it and returns chunks that reference spans of it
+            chunks = await self._execute(plan_document_chunks, [document], timedelta(seconds=30), local=True)
+        else:
+            chunks = []
+        if chunks:
+            self._partial_results["chunks"] = [chunk["chunk"] for chunk in chunks]
+        return chunks
+    
+    async def _check_rules(self, codes: Dict[str, List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Run the local rule checks; executions started before they existed skip them."""
+        if not workflow.patched("rule-validation"):
+            self._steps["rules"]["status"] = "skipped"
+            return None
+        rule_check = await self._run_step(
+            "rules", check_codes_with_rules, [codes], timedelta(seconds=30), local=True
+        )
+        self._partial_results["rule_checks"] = {
+            "is_valid": rule_check["is_valid"],
+            "errors": rule_check["errors"]
+        }
+        return rule_check
+    
+    def _finish(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Mark the workflow completed and attach measured timings and model usage to the report."""
+        self._status = "completed"
+        self._current_step = None
+        result["activity_timings"] = {
+            name: self._steps[name]["duration_seconds"]
+            for name in self._step_order
+            if "duration_seconds" in self._steps[name]
+        }
+        result["processing_time_seconds"] = (workflow.now() - self._started_at).total_seconds()
+        result["priority"] = self._priority
+        result["queue_latency_seconds"] = (workflow.info().start_time - workflow.info().workflow_start_time).total_seconds()
+        result["cost_breakdown"] = summarize_model_usage(self._model_usage)
         return result
+    
+    @workflow.query(name=PROGRESS_QUERY)
+    def get_progress(self) -> Dict[str, Any]:
+        """Current step, per-step timings and partial results of this execution."""
+        steps = [self._steps[name] for name in self._step_order]
+        completed = sum(1 for step in steps if step["status"] in ("completed", "skipped"))
+        current = self._steps.get(self._current_step) if self._current_step else None
+        
+        if self._status == "completed":
+            message = "Processing completed successfully"
+        elif current is not None:
+            message = f"{current['message']}..."
+        else:
+            message = "Starting Amazon Bedrock AI workflow..."
+        
+        return {
+            "status": self._status,
+            "priority": self._priority,
+            "current_step": self._current_step,
+            "running_steps": [step["name"] for step in steps if step["status"] == "running"],
+            "completed_steps": completed,
+            "total_steps": len(steps),
+            "progress": int(100 * completed / len(steps)),
+            "message": message,
+            "steps": steps,
+            "partial_results": self._partial_results
+        }
+
+@workflow.defn(name=BATCH_MEDICAL_CODING_WORKFLOW)
+class BatchMedicalCodingWorkflow:
+    """Fan out MedicalCodingWorkflow children over a batch of documents with bounded parallelism."""
+    
+    def __init__(self):
+        self._batch_id = ""
+        self._documents: Dict[str, Dict[str, Any]] = {}
+    
+    @workflow.run
+    async def run(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """Code every document in the batch, at most max_parallel at a time."""
+        self._batch_id = batch["batch_id"]
+        documents = batch["documents"]
+        max_parallel = max(1, int(batch.get("max_parallel") or UNPINNED_BATCH_MAX_PARALLEL))
+        
+        for document in documents:
+            self._documents[document["document_id"]] = {
+                "status": "pending",
+                "workflow_id": f"{workflow.info().workflow_id}-{document['document_id']}"
+            }
+        
+        logger.info(f"📦 Starting batch {self._batch_id}: {len(documents)} documents, max {max_parallel} in parallel")
+        
+        semaphore = asyncio.Semaphore(max_parallel)
+        
+        # Each child runs in its document's priority lane (bulk unless urgent) and urgent
+        # documents take the batch's first free slots; executions started before lanes
+        # existed keep every child on the batch's own queue, in submission order
+        lanes = workflow.patched("priority-lanes")
+        if lanes:
+            documents = sorted(documents, key=lambda document: PRIORITY_LANES.index(document_priority(document, BATCH_PRIORITY)))
+        
+        async def code_document(document: Dict[str, Any]):
+            entry = self._documents[document["document_id"]]
+            options: Dict[str, Any] = {}
+            if lanes:
+                entry["priority"] = document_priority(document, BATCH_PRIORITY)
+                options["task_queue"] = lane_task_queue(entry["priority"])
+            async with semaphore:
+                entry["status"] = "processing"
+                try:
+                    result = await workflow.execute_child_workflow(
+                        MedicalCodingWorkflow.run,
+                        document,
+                        id=entry["workflow_id"],
+                        **options
+                    )
+                    entry["status"] = "completed"
+                    entry["total_codes"] = result.get("total_codes", 0)
+                    entry["overall_confidence"] = result.get("overall_confidence", 0)
+                except Exception as e:
+                    entry["status"] = "error"
+                    entry["error"] = str(e)
+        
+        await asyncio.gather(*(code_document(document) for document in documents))
+        
+        logger.info(f"✅ Batch {self._batch_id} finished")
+        return self.get_progress()
+    
+    @workflow.query(name=PROGRESS_QUERY)
+    def get_progress(self) -> Dict[str, Any]:
+        """Aggregate and per-document progress for this batch."""
+        counts = {"pending": 0, "processing": 0, "completed": 0, "error": 0}
+        for entry in self._documents.values():
+            counts[entry["status"]] += 1
+        return {
+            "batch_id": self._batch_id,
+            "total_documents": len(self._documents),
+            "counts": counts,
+            "documents": self._documents
+        }
 
 # ============================================================================
 # WORKER AND CLIENT SETUP
 # ============================================================================
 
-async def run_worker():
-    """Run the Temporal worker."""
-    logger.info("🚀 Starting Temporal worker for medical coding...")
+WORKFLOWS = [MedicalCodingWorkflow, BatchMedicalCodingWorkflow]
+
+# Local activities run inside the workflow worker, so every worker that polls
+# workflow tasks registers them
+LOCAL_ACTIVITIES = [generate_final_report, check_codes_with_rules, plan_document_chunks]
+
+ACTIVITIES = [
+    analyze_medical_document_with_bedrock,
+    generate_icd10_codes_with_bedrock,
+    validate_coding_result,
+    generate_final_report,
+    extract_and_code_with_bedrock,
+    check_codes_with_rules,
+    plan_document_chunks
+]
+
+def create_worker(
+    client: Client,
+    max_concurrent_activities: Optional[int] = None,
+    role: str = "all",
+    max_concurrent_workflow_tasks: Optional[int] = None,
+    graceful_shutdown_timeout: Optional[timedelta] = None,
+    priority: str = DEFAULT_PRIORITY
+) -> Worker:
+    """Worker for one role and priority lane: workflows on the lane's TASK_QUEUE,
+    activities on its ACTIVITY_TASK_QUEUE, or both.
+
+    ``role="all"`` needs both on the same queue; use ``create_workers`` when
+    ACTIVITY_TASK_QUEUE is split out. The "workflow" and "activity" roles need
+    it split out: on a shared queue a workflow worker would poll activity tasks
+    it has not registered.
+    """
+    if role not in WORKER_ROLES:
+        raise ValueError(f"Unknown worker role: {role} (expected one of {', '.join(WORKER_ROLES)})")
+    if role == "all" and ACTIVITY_TASK_QUEUE != TASK_QUEUE:
+        raise ValueError("role 'all' needs ACTIVITY_TASK_QUEUE == TASK_QUEUE; use create_workers()")
+    if role != "all" and ACTIVITY_TASK_QUEUE == TASK_QUEUE:
+        raise ValueError(f"role '{role}' needs ACTIVITY_TASK_QUEUE set to a queue other than {TASK_QUEUE}")
     
-    client = await Client.connect("localhost:7233")
+    # Activities are async and only wait on the model client, so one worker
+    # can keep many documents in flight; the model client's own limiter
+    # (MODEL_MAX_CONCURRENCY) caps concurrent Bedrock calls.
+    if max_concurrent_activities is None:
+        max_concurrent_activities = int(os.getenv("WORKER_MAX_CONCURRENT_ACTIVITIES", "100"))
+    if max_concurrent_workflow_tasks is None and os.getenv("WORKER_MAX_CONCURRENT_WORKFLOW_TASKS"):
+        max_concurrent_workflow_tasks = int(os.getenv("WORKER_MAX_CONCURRENT_WORKFLOW_TASKS"))
     
-    worker = Worker(
+    return Worker(
         client,
-        task_queue="medical-coding-task-queue",
-        workflows=[MedicalCodingWorkflow],
-        activities=[
-            analyze_medical_document_with_bedrock,
-            generate_icd10_codes_with_bedrock,
-            validate_coding_result,
-            generate_final_report
-        ]
+        task_queue=lane_task_queue(priority, ACTIVITY_TASK_QUEUE if role == "activity" else TASK_QUEUE),
+        workflows=WORKFLOWS if role != "activity" else [],
+        activities=ACTIVITIES if role != "workflow" else LOCAL_ACTIVITIES,
+        max_concurrent_activities=max_concurrent_activities,
+        max_concurrent_workflow_tasks=max_concurrent_workflow_tasks,
+        graceful_shutdown_timeout=graceful_shutdown_timeout or timedelta(0)
     )
+
+def create_workers(client: Client, role: str = "all", lanes: Optional[List[str]] = None, **options) -> List[Worker]:
+    """Workers one process runs for a role, per priority lane (default ``worker_lanes()``).
+
+    Every lane gets its own workers and slots, so a bulk backlog never holds the
+    slots urgent tasks need. "all" becomes two workers per lane when activities
+    have their own queue.
+    """
+    roles = ["workflow", "activity"] if role == "all" and ACTIVITY_TASK_QUEUE != TASK_QUEUE else [role]
+    return [
+        create_worker(client, role=worker_role, priority=lane, **options)
+        for lane in (lanes or worker_lanes())
+        for worker_role in roles
+    ]
+
+async def run_worker():
+    """Run the Temporal worker."""
+    logger.info("🚀 Starting Temporal worker for medical coding...")
     
-    logger.info("✅ Worker started successfully")
-    await worker.run()
+    client = await Client.connect(os.getenv("TEMPORAL_ADDRESS", "localhost:7233"))
+    max_concurrent_activities = int(os.getenv("WORKER_MAX_CONCURRENT_ACTIVITIES", "100"))
+    workers = create_workers(client, max_concurrent_activities=max_concurrent_activities)
+    
+    model_client = get_model_client()
+    model_client.warm_up()
+    warm_up_code_retrievers()
+    logger.info(f"✅ Worker started successfully ({', '.join(worker_lanes())} lanes, max {max_concurrent_activities} concurrent activities per lane, {model_client.max_concurrency} concurrent model calls)")
+    await asyncio.gather(*(worker.run() for worker in workers))
+
+async def preflight_check() -> bool:
+    """Make one live model call to confirm Bedrock credentials and model access."""
+    print("🔍 Testing Amazon Bedrock Integration...")
+    try:
+        await get_model_client().complete(
+            "Hello, this is a test of Amazon Bedrock integration.",
+            max_tokens=50,
+            temperature=0.1
+        )
+        
+        print("✅ Amazon Bedrock integration successful!")
+        print("✅ Using real Amazon Bedrock AI for medical coding!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Amazon Bedrock integration failed: {str(e)}")
+        return False
 
-async def main():
+async def main(preflight: bool = True):
     """Main entry point."""
     print("🏥 Temporal Medical Coding System - Production Ready")
     print("=" * 60)
@@ -426,30 +1153,20 @@ async def main():
     print("• Production-ready error handling")
     print("=" * 60)
     
-    # Test Amazon Bedrock integration
-    print("🔍 Testing Amazon Bedrock Integration...")
-    try:
-        from litellm import completion
-        os.environ["AWS_ACCESS_KEY_ID"] = os.getenv("AWS_ACCESS_KEY_ID", "")
-        os.environ["AWS_SECRET_ACCESS_KEY"] = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-        os.environ["AWS_REGION_NAME"] = os.getenv("AWS_REGION_NAME", "us-east-1")
-        
-        response = completion(
-            model="bedrock/anthropic.claude-3-sonnet-20240229-v1:0",
-            messages=[{"role": "user", "content": "Hello, this is a test of Amazon Bedrock integration."}],
-            max_tokens=50,
-            temperature=0.1
-        )
-        
-        print("✅ Amazon Bedrock integration successful!")
-        print("✅ Using real Amazon Bedrock AI for medical coding!")
-        
-    except Exception as e:
-        print(f"❌ Amazon Bedrock integration failed: {str(e)}")
+    # The live test call costs a model round trip before the worker polls;
+    # skip it with --skip-preflight or WORKER_PREFLIGHT=false
+    if preflight and not await preflight_check():
         return
     
     # Run the worker
     await run_worker()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the medical coding Temporal worker")
+    parser.add_argument("--skip-preflight", action="store_true", help="start polling without the live Bedrock test call")
+    args = parser.parse_args()
+    
+    preflight = os.getenv("WORKER_PREFLIGHT", "true").lower() in ("1", "true", "yes") and not args.skip_preflight
+    asyncio.run(main(preflight))
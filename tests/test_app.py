@@ -0,0 +1,247 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import temporal_dispatcher
+from workflow_contract import BATCH_MAX_PARALLEL
+
+
+class FakeHandle:
+    """Workflow handle answering from a fixed execution status, progress and result."""
+
+    def __init__(self, status="RUNNING", progress=None, result=None):
+        self.status = status
+        self.progress = progress or {"status": "running"}
+        self._result = result
+
+    async def describe(self):
+        return SimpleNamespace(status=SimpleNamespace(name=self.status))
+
+    async def query(self, name):
+        return self.progress
+
+    async def result(self):
+        if isinstance(self._result, Exception):
+            raise self._result
+        return self._result
+
+
+class RecordingDispatcher:
+    """Stands in for the shared dispatcher: keeps submitted jobs and runs others against fake handles."""
+
+    def __init__(self):
+        self.jobs = []
+        self.handles = {}
+        self.spawned = []
+
+    def submit(self, job, on_error=None):
+        self.jobs.append(job)
+
+    def spawn(self, coro):
+        self.spawned.append(coro)
+
+    def run(self, job, timeout=None):
+        return asyncio.run(job(SimpleNamespace(get_workflow_handle=self.handles.__getitem__)))
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    recording = RecordingDispatcher()
+    monkeypatch.setattr(temporal_dispatcher, "_dispatcher", recording)
+    return recording
+
+
+@pytest.fixture
+def client():
+    import app
+
+    return app.app.test_client()
+
+
+def submitted_parts(dispatcher):
+    (job,) = dispatcher.jobs
+    _, parts = job.args
+    return [part for _, part in parts]
+
+
+def test_batch_parts_pin_the_default_max_parallel(dispatcher, client):
+    response = client.post("/api/process-batch", json=[{"content": "Follow-up for hypertension."}] * 3)
+    assert response.status_code == 200
+    assert [part["max_parallel"] for part in submitted_parts(dispatcher)] == [BATCH_MAX_PARALLEL]
+
+
+def test_batch_parts_pin_the_requested_max_parallel(dispatcher, client):
+    response = client.post("/api/process-batch?max_parallel=3", json=[{"content": "Follow-up for hypertension."}])
+    assert response.status_code == 200
+    assert [part["max_parallel"] for part in submitted_parts(dispatcher)] == [3]
+
+
+def test_batch_rejects_an_invalid_document_option_with_its_index(dispatcher, client):
+    documents = [{"content": "Follow-up for hypertension."}, {"content": "Chest pain.", "priority": "asap"}]
+    response = client.post("/api/process-batch", json=documents)
+    assert response.status_code == 400
+    assert response.get_json()["index"] == 1
+    assert not dispatcher.jobs
+
+
+PROGRESS = {
+    "status": "running", "progress": 25, "message": "Analyzing document...", "current_step": "analysis",
+    "running_steps": ["analysis"], "steps": [], "partial_results": {}
+}
+
+
+@pytest.fixture
+def started_workflow():
+    import app
+
+    app.result_store.create("wf-status", {"status": "processing", "progress": 0, "message": "Queued", "started": True}, "DOC-1", "PAT-1")
+    yield "wf-status"
+    app.result_store.delete("wf-status")
+
+
+def test_status_of_a_running_workflow_comes_from_its_progress_query(dispatcher, client, started_workflow):
+    dispatcher.handles[started_workflow] = FakeHandle(progress=PROGRESS)
+    status = client.get(f"/api/workflow-status/{started_workflow}").get_json()
+    assert status["status"] == "processing" and status["progress"] == 25 and status["current_step"] == "analysis"
+
+
+def test_finished_workflow_is_recorded_by_any_web_process(dispatcher, client, started_workflow):
+    import app
+
+    result = {"document_id": "DOC-1", "diagnosis_codes": [{"code": "I10"}], "procedure_codes": []}
+    dispatcher.handles[started_workflow] = FakeHandle("COMPLETED", {**PROGRESS, "status": "completed"}, result)
+    status = client.get(f"/api/workflow-status/{started_workflow}").get_json()
+    assert status["status"] == "completed" and status["result"] == result
+    assert app.result_store.get(started_workflow)["result"] == result
+
+
+def test_failed_workflow_is_recorded_as_error(dispatcher, client, started_workflow):
+    dispatcher.handles[started_workflow] = FakeHandle("FAILED", {**PROGRESS, "status": "error"}, RuntimeError("activity failed"))
+    status = client.get(f"/api/workflow-status/{started_workflow}").get_json()
+    assert status["status"] == "error" and "activity failed" in status["message"]
+
+
+def test_batch_status_is_read_from_the_result_store(dispatcher, client):
+    import app
+
+    app.result_store.create_batch("BATCH-OTHER", {"status": "error", "total_documents": 2, "workflow_ids": ["part-0"], "message": "Batch submission failed: down"})
+    status = client.get("/api/batch-status/BATCH-OTHER").get_json()
+    assert status["status"] == "error" and status["total_documents"] == 2 and status["counts"]["pending"] == 2
+    assert client.get("/api/batch-status/BATCH-MISSING").status_code == 404
+
+
+COPIED_NOTE = (
+    "Follow-up visit for type 2 diabetes mellitus without complications, stable on metformin 500 mg twice daily. "
+    "Essential hypertension is controlled on amlodipine 5 mg daily with home readings near 125/80. "
+    "Patient walks daily, follows a low carbohydrate diet and reports no hypoglycemic episodes. "
+    "Retinal screening last spring was normal and the foot examination today is unremarkable. "
+    "Continue current medications and repeat hemoglobin A1c and renal panel before the next visit. "
+    "Return in six months."
+)
+PRIOR_RESULT = {
+    "document_id": "DOC-PRIOR", "patient_id": "PAT-1", "workflow_mode": "standard", "validation_mode": "ai",
+    "diagnosis_codes": [{"code": "E11.9", "description": "Type 2 diabetes mellitus without complications"}],
+    "procedure_codes": []
+}
+
+
+@pytest.fixture
+def copied_note(monkeypatch):
+    import app
+    from blob_store import BlobStore, MemoryBlobBackend
+    from near_duplicates import REUSE_THRESHOLD, MinHashLSHIndex, NearDuplicateDetector, verify_copy_forward
+
+    detector = NearDuplicateDetector(MinHashLSHIndex(), BlobStore(MemoryBlobBackend()))
+    monkeypatch.setattr(app, "near_duplicates", detector)
+    monkeypatch.setattr(app, "REUSE_THRESHOLD", REUSE_THRESHOLD, raising=False)
+    monkeypatch.setattr(app, "verify_copy_forward", verify_copy_forward, raising=False)
+    app.result_store.create(
+        "wf-prior", {"status": "completed", "progress": 100, "message": "done", "result": PRIOR_RESULT}, "DOC-PRIOR", "PAT-1"
+    )
+    signature, _ = detector.find(COPIED_NOTE)
+    detector.remember(signature, COPIED_NOTE, "wf-prior")
+    yield COPIED_NOTE.replace("six months", "four months")
+    app.result_store.delete("wf-prior")
+
+
+def test_copy_forward_note_reuses_the_earlier_result(dispatcher, client, copied_note):
+    import app
+
+    response = client.post("/api/process-document", json={"content": copied_note, "patient_id": "PAT-1"}).get_json()
+    assert response["status"] == "completed" and response["near_duplicate"]["workflow_id"] == "wf-prior"
+    assert not dispatcher.jobs
+    result = app.result_store.get(response["workflow_id"])["result"]
+    assert result["diagnosis_codes"] == PRIOR_RESULT["diagnosis_codes"] and result["document_id"] == response["document_id"]
+
+
+@pytest.mark.parametrize("options", [
+    {"patient_id": "PAT-2"},
+    {"patient_id": "PAT-1", "mode": "fast"},
+    {"patient_id": "PAT-1", "validation_mode": "rules"},
+])
+def test_copy_forward_note_for_another_patient_or_options_runs_a_workflow(dispatcher, client, copied_note, options):
+    response = client.post("/api/process-document", json={"content": copied_note, **options}).get_json()
+    assert response["status"] == "processing"
+    (job,) = dispatcher.jobs
+    _, document = job.args
+    # The earlier codes still go to the model as a reference
+    assert document["reference_codes"] == [["E11.9", "Type 2 diabetes mellitus without complications"]]
+    assert document["near_duplicate"]["workflow_id"] == "wf-prior"
+
+
+class BatchClient:
+    """Starts batch workflows as already finished: every child coded, except documents named in ``failing``."""
+
+    def __init__(self, handles, failing=()):
+        self.handles = handles
+        self.failing = failing
+
+    async def start_workflow(self, workflow, part, id, task_queue):
+        documents = {}
+        for document in part["documents"]:
+            child_id = f"{id}-{document['document_id']}"
+            if document["document_id"] in self.failing:
+                documents[document["document_id"]] = {"status": "error", "workflow_id": child_id, "error": "model timeout"}
+                continue
+            documents[document["document_id"]] = {"status": "completed", "workflow_id": child_id}
+            self.handles[child_id] = FakeHandle("COMPLETED", result={
+                "document_id": document["document_id"], "patient_id": document["patient_id"],
+                "diagnosis_codes": [{"code": "I10", "primary": True}], "procedure_codes": []
+            })
+        self.handles[id] = FakeHandle("COMPLETED", result={"batch_id": part["batch_id"], "documents": documents})
+        return self.handles[id]
+
+    def get_workflow_handle(self, workflow_id):
+        return self.handles[workflow_id]
+
+
+def test_batch_documents_reach_the_result_store_and_the_export(dispatcher, client):
+    import app
+
+    documents = [{"content": "Follow-up for hypertension.", "document_id": f"DOC-B{i}", "patient_id": "PAT-B"} for i in range(3)]
+    batch_id = client.post("/api/process-batch", json=documents).get_json()["batch_id"]
+    (job,) = dispatcher.jobs
+
+    async def run_batch():
+        await job(BatchClient(dispatcher.handles, failing={"DOC-B2"}))
+        await asyncio.gather(*dispatcher.spawned)
+
+    asyncio.run(run_batch())
+    assert app.result_store.get_batch(batch_id)["status"] == "processing"
+    child_ids = [f"batch-{batch_id}-part-0000-DOC-B{i}" for i in range(3)]
+    assert app.result_store.get(child_ids[0])["status"] == "completed"
+    assert app.result_store.get(child_ids[2])["status"] == "error"
+    assert sorted(record["document_id"] for record in app.result_store.find(patient_id="PAT-B")) == ["DOC-B0", "DOC-B1", "DOC-B2"]
+
+    rows = [json.loads(line) for line in client.get(f"/api/export?until={time.time() + 1}").data.splitlines()]
+    assert sorted((row["workflow_id"], row["document_id"], row["code"]) for row in rows if row["patient_id"] == "PAT-B") == [
+        (child_ids[0], "DOC-B0", "I10"), (child_ids[1], "DOC-B1", "I10")
+    ]
+    for child_id in child_ids:
+        app.result_store.delete(child_id)
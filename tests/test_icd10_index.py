@@ -0,0 +1,147 @@
+import os
+import threading
+
+import pytest
+
+from code_rules import validate_codes_with_rules
+from icd10_index import Icd10Catalog, Icd10Index, build_index, load_index, parse_cms_file
+
+CM_CODES = [
+    ("E11", False, "Type 2 diabetes mellitus"),
+    ("E116", False, "Type 2 diabetes mellitus with other specified complications"),
+    ("E1165", True, "Type 2 diabetes mellitus with hyperglycemia"),
+    ("E119", True, "Type 2 diabetes mellitus without complications"),
+    ("I10", True, "Essential (primary) hypertension"),
+    ("W19XXXA", True, "Unspecified fall, initial encounter"),
+]
+PCS_CODES = [("02703DZ", True, "Dilation of Coronary Artery, One Artery with Intraluminal Device, Percutaneous Approach")]
+
+
+def order_line(number, code, billable, description):
+    """One line of a CMS order file: fixed-width code, billable flag, short and long description."""
+    return f"{number:05d} {code:<7} {int(billable)} {description[:60]:<60} {description}\n"
+
+
+@pytest.fixture
+def cm_order_file(tmp_path):
+    path = tmp_path / "icd10cm_order_2025.txt"
+    path.write_text("".join(order_line(n, *entry) for n, entry in enumerate(CM_CODES, start=1)))
+    return str(path)
+
+
+@pytest.fixture
+def catalog(tmp_path, cm_order_file):
+    pcs_path = tmp_path / "pcs.idx"
+    build_index(iter(PCS_CODES), str(pcs_path), "PCS")
+    catalog = Icd10Catalog(load_index(cm_order_file, "CM"), Icd10Index(str(pcs_path)))
+    yield catalog
+    catalog.cm.close()
+    catalog.pcs.close()
+
+
+def test_parse_fixed_width_order_file(cm_order_file):
+    assert list(parse_cms_file(cm_order_file)) == CM_CODES
+
+
+def test_parse_codes_file(tmp_path):
+    path = tmp_path / "icd10cm_codes_2025.txt"
+    path.write_text("E119    Type 2 diabetes mellitus without complications\nI10     Essential (primary) hypertension\n")
+    assert list(parse_cms_file(str(path))) == [
+        ("E119", True, "Type 2 diabetes mellitus without complications"),
+        ("I10", True, "Essential (primary) hypertension"),
+    ]
+
+
+def test_flat_file_is_indexed_next_to_it(cm_order_file, catalog):
+    assert os.path.exists(f"{cm_order_file}.idx")
+    assert len(catalog.cm) == len(CM_CODES) and catalog.cm.system == "CM"
+
+
+def test_lookup_existence_billability_and_parent(catalog):
+    index = catalog.cm
+    entry = index.lookup("e11.65")
+    assert entry["code"] == "E1165" and entry["billable"] and entry["parent"] == "E116"
+    assert entry["description"] == "Type 2 diabetes mellitus with hyperglycemia"
+    assert entry["chapter_title"] == "Endocrine, nutritional and metabolic diseases"
+    assert not index.lookup("E11")["billable"]
+    assert index.lookup("E11.99") is None
+    assert "I10" in index and "I11" not in index
+    assert index.parent("E11.99") == "E119"
+    assert index.parent("I10") is None
+
+
+def test_prefix_lists_codes_in_order(catalog):
+    assert [entry["code"] for entry in catalog.cm.prefix("E11")] == ["E11", "E116", "E1165", "E119"]
+    assert [entry["code"] for entry in catalog.cm.prefix("E11", limit=2)] == ["E11", "E116"]
+    assert catalog.cm.prefix("Z") == []
+    assert catalog.pcs.lookup("02703DZ")["chapter_title"] == "Medical and Surgical"
+
+
+def test_concurrent_builds_leave_one_complete_index(tmp_path):
+    out_path = str(tmp_path / "cm.idx")
+    errors = []
+
+    def build():
+        try:
+            build_index(iter(CM_CODES * 200), out_path, "CM")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert os.listdir(tmp_path) == ["cm.idx"]
+    index = Icd10Index(out_path)
+    assert len(index) == len(CM_CODES) and index.lookup("I10")["billable"]
+    index.close()
+
+
+def codes(diagnoses, procedures=()):
+    return {
+        "diagnosis_codes": [{"code": code, "primary": primary} for code, primary in diagnoses],
+        "procedure_codes": [{"code": code, "primary": primary} for code, primary in procedures],
+    }
+
+
+def test_valid_codes_pass(catalog):
+    result = validate_codes_with_rules(codes([("E11.65", True), ("I10", False)], [("02703DZ", True)]), catalog)
+    assert result["is_valid"] and result["errors"] == [] and result["warnings"] == []
+    assert result["checks_run"] == {"format": 3, "existence": 3, "billability": 3, "primary": 1}
+
+
+def test_unknown_code_is_an_error_with_suggestions(catalog):
+    result = validate_codes_with_rules(codes([("E11.99", True)]), catalog)
+    assert not result["is_valid"]
+    assert result["errors"] == ["E11.99: does not exist in the ICD-10-CM code set"]
+    assert result["suggestions"] == {"E11.99": ["E11.9"]}
+
+
+def test_category_header_is_not_billable(catalog):
+    result = validate_codes_with_rules(codes([("E11", True)]), catalog)
+    assert result["errors"] == ["E11: category header, not billable; a more specific code is required"]
+    assert result["suggestions"] == {"E11": ["E11.65", "E11.9"]}
+
+
+def test_format_and_primary_rules(catalog):
+    result = validate_codes_with_rules(codes([("123", True), ("I10", False), ("I10", False)]), catalog)
+    assert "123: not a valid ICD-10-CM code format" in result["errors"]
+    assert "I10: duplicate diagnosis code" in result["warnings"]
+
+    assert validate_codes_with_rules(codes([("I10", False)]), catalog)["errors"] == [
+        "Exactly one primary diagnosis code is required, found 0"
+    ]
+    assert validate_codes_with_rules(codes([("W19.XXXA", True)]), catalog)["errors"] == [
+        "W19.XXXA: external cause codes cannot be the primary diagnosis"
+    ]
+    result = validate_codes_with_rules(codes([("I10", True)], [("02703DZ", True), ("02703DZ", True)]), catalog)
+    assert "2 procedure codes are marked primary; expected at most one" in result["warnings"]
+
+
+def test_without_a_catalog_only_format_and_primary_rules_run():
+    result = validate_codes_with_rules(codes([("Z99.99", True)]))
+    assert result["is_valid"] and not result["catalog_loaded"]
+    assert result["checks_run"] == {"format": 1, "existence": 0, "billability": 0, "primary": 1}
@@ -0,0 +1,155 @@
+import os
+import threading
+
+import pytest
+
+import near_duplicates
+from blob_store import BlobStore, MemoryBlobBackend
+from near_duplicates import MinHashLSHIndex, NearDuplicateDetector, get_near_duplicate_detector, set_near_duplicate_detector
+
+
+def note(number):
+    """A discharge note that shares no wording with the notes for other numbers."""
+    words = " ".join(f"w{number}x{i}" for i in range(60))
+    return f"Discharge summary {number}. {words}."
+
+
+def remember(detector, text, workflow_id):
+    signature, _ = detector.find(text)
+    detector.remember(signature, text, workflow_id)
+
+
+def file_detector(path):
+    return NearDuplicateDetector(MinHashLSHIndex(), BlobStore(MemoryBlobBackend()), str(path))
+
+
+def test_merge_adds_new_workflows_and_keeps_them_searchable():
+    texts = BlobStore(MemoryBlobBackend())
+    first, second = (NearDuplicateDetector(MinHashLSHIndex(compact_every=4), texts) for _ in range(2))
+    for i in range(6):
+        remember(first, note(i), f"wf-{i}")
+    for i in range(4, 10):
+        remember(second, note(i), f"wf-{i}")
+
+    assert first.index.merge(second.index) == 4
+    assert len(first.index) == 10
+    for i in range(10):
+        _, matches = first.find(note(i))
+        assert [match["workflow_id"] for match in matches] == [f"wf-{i}"]
+    # New inserts still land in the merged arrays
+    remember(first, note(10), "wf-10")
+    assert first.find(note(10))[1][0]["workflow_id"] == "wf-10"
+
+
+def test_merge_rejects_other_hash_parameters():
+    with pytest.raises(ValueError):
+        MinHashLSHIndex().merge(MinHashLSHIndex(seed=2))
+
+
+def test_concurrent_saves_leave_one_complete_snapshot(tmp_path):
+    detector = file_detector(tmp_path)
+    for i in range(50):
+        remember(detector, note(i), f"wf-{i}")
+    errors = []
+
+    def save():
+        try:
+            detector.index.save(detector.snapshot_path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert os.listdir(tmp_path) == [os.path.basename(detector.snapshot_path)]
+    assert len(MinHashLSHIndex.load(detector.snapshot_path)) == 50
+
+
+def test_each_web_process_snapshot_is_merged_on_load(tmp_path, monkeypatch):
+    # Two web processes that each saved their own notes; pid 4194305 (above any pid_max) is not running
+    running = file_detector(tmp_path)
+    remember(running, note(1), "wf-1")
+    running.save()
+    running_snapshot = os.path.basename(running.snapshot_path)
+    exited = file_detector(tmp_path)
+    for i in (2, 3):
+        remember(exited, note(i), f"wf-{i}")
+    exited.index.save(str(tmp_path / "index-4194305.npz"))
+    # A snapshot written before snapshots were per process
+    legacy = file_detector(tmp_path)
+    remember(legacy, note(1), "wf-1")
+    remember(legacy, note(4), "wf-4")
+    legacy.index.save(str(tmp_path / "index.npz"))
+
+    monkeypatch.setenv("NEAR_DUPLICATE_INDEX", "file")
+    monkeypatch.setenv("NEAR_DUPLICATE_INDEX_PATH", str(tmp_path))
+    monkeypatch.setattr(near_duplicates, "_detector_configured", False)
+    monkeypatch.setattr(os, "getpid", lambda: 4242)
+    try:
+        detector = get_near_duplicate_detector()
+        assert sorted(detector.index._workflow_ids) == ["wf-1", "wf-2", "wf-3", "wf-4"]
+    finally:
+        set_near_duplicate_detector(None)
+
+    # The exited process's and the legacy snapshot are folded into the new process's own
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".npz")) == [
+        running_snapshot, "index-4242.npz"
+    ]
+    assert len(MinHashLSHIndex.load(str(tmp_path / "index-4242.npz"))) == 4
+
+
+PRIOR_NOTE = (
+    "Patient is a 64 year old male seen for routine follow-up of type 2 diabetes mellitus with hyperglycemia. "
+    "Home glucose log shows fasting readings between 150 and 190 despite metformin 1000 mg twice daily. "
+    "Essential hypertension remains controlled on lisinopril 20 mg daily with clinic blood pressure 128/78. "
+    "He reports good adherence to medications and walks thirty minutes most days of the week. "
+    "Foot examination shows intact monofilament sensation and palpable pulses bilaterally. "
+    "Plan is to add empagliflozin 10 mg daily, recheck hemoglobin A1c in three months and continue lisinopril."
+)
+PRIOR_CODES = [
+    {"code": "E11.65", "evidence": "type 2 diabetes mellitus with hyperglycemia"},
+    {"code": "I10", "evidence": "essential hypertension remains controlled"},
+]
+
+
+def test_lsh_finds_copy_forward_notes_and_not_unrelated_ones():
+    detector = NearDuplicateDetector(MinHashLSHIndex(compact_every=64), BlobStore(MemoryBlobBackend()))
+    for i in range(300):
+        remember(detector, note(i), f"wf-{i}")
+
+    recalled = 0
+    for i in range(0, 300, 10):
+        _, matches = detector.find(note(i) + " Return to clinic in two weeks.")
+        recalled += bool(matches) and matches[0]["workflow_id"] == f"wf-{i}"
+    assert recalled == 30
+    assert detector.find(note(1000))[1] == []
+
+
+def test_detector_returns_the_earlier_text_for_the_diff_check():
+    detector = NearDuplicateDetector(MinHashLSHIndex(), BlobStore(MemoryBlobBackend()))
+    remember(detector, PRIOR_NOTE, "wf-prior")
+    _, (match,) = detector.find(PRIOR_NOTE.replace("thirty minutes", "forty minutes"))
+    assert match["workflow_id"] == "wf-prior" and match["similarity"] >= 0.75
+    assert detector.prior_text(match) == PRIOR_NOTE
+
+
+def test_copy_forward_with_harmless_changes_is_accepted():
+    text = PRIOR_NOTE.replace("thirty minutes", "forty minutes") + " Return to clinic in three months."
+    check = near_duplicates.verify_copy_forward(PRIOR_NOTE, text, PRIOR_CODES)
+    assert check["verified"] and check["reasons"] == []
+    assert check["added_segments"] == 2 and check["removed_segments"] == 1
+
+
+def test_copy_forward_with_a_new_finding_or_missing_evidence_is_rejected():
+    text = PRIOR_NOTE + " Assessment also notes new onset atrial fibrillation."
+    check = near_duplicates.verify_copy_forward(PRIOR_NOTE, text, PRIOR_CODES)
+    assert not check["verified"]
+    assert check["reasons"] == ["added text mentions 'Assessment': Assessment also notes new onset atrial fibrillation."]
+
+    text = PRIOR_NOTE.replace("Essential hypertension remains controlled", "Blood pressure is controlled")
+    check = near_duplicates.verify_copy_forward(PRIOR_NOTE, text, PRIOR_CODES)
+    assert check["reasons"] == ["evidence for I10 is no longer in the note"]
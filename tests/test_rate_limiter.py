@@ -0,0 +1,176 @@
+import asyncio
+import time
+
+import rate_limiter
+from rate_limiter import AdaptiveLimiter, TokenBucket, backoff_delay, is_throttling_error
+
+
+async def contend(limiter, lanes):
+    """Queue one waiter per entry of ``lanes`` behind a held slot, release it and return the grant order."""
+    order = []
+    release = asyncio.Event()
+
+    async def holder():
+        async with limiter.slot():
+            await release.wait()
+
+    async def waiter(lane):
+        async with limiter.slot(lane):
+            order.append(lane)
+            await asyncio.sleep(0)
+
+    held = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    waiters = []
+    for lane in lanes:
+        waiters.append(asyncio.create_task(waiter(lane)))
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(held, *waiters)
+    return order
+
+
+def test_slots_are_shared_by_lane_weight_under_contention():
+    limiter = AdaptiveLimiter(max_limit=1, weights={"urgent": 3.0, "bulk": 1.0})
+    order = asyncio.run(contend(limiter, ["bulk"] * 40 + ["urgent"] * 40))
+    first = order[:40]
+    assert abs(first.count("urgent") - 30) <= 1
+    # The bulk lane queued first but still gets its share, not everything or nothing
+    assert "bulk" in order[:4]
+    assert limiter.stats()["lanes"]["urgent"]["granted"] == 40
+
+
+def test_an_idle_lane_does_not_bank_unused_turns():
+    async def scenario():
+        limiter = AdaptiveLimiter(max_limit=1)
+        for _ in range(30):
+            async with limiter.slot("interactive"):
+                pass
+        return await contend(limiter, ["interactive"] * 10 + ["bulk"] * 10)
+
+    order = asyncio.run(scenario())
+    assert 4 <= order[:10].count("bulk") <= 6
+
+
+def test_throttle_halves_the_limit_once_per_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    limiter = AdaptiveLimiter(max_limit=16, min_limit=2, cooldown=5.0)
+
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    now[0] = 1004.9
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    now[0] = 1005.0
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    for _ in range(3):
+        now[0] += 5
+        limiter.on_throttle()
+    # Held at min_limit; every throttle past the cooldown still counts as a decrease
+    assert limiter.limit == 2
+    assert {key: limiter.stats()[key] for key in ("throttles", "decreases")} == {"throttles": 7, "decreases": 5}
+
+
+def test_successes_raise_the_limit_additively():
+    limiter = AdaptiveLimiter(max_limit=16, cooldown=0)
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    for _ in range(8):
+        limiter.on_success()
+    assert 8.9 < limiter.limit < 9.1
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.limit == 16
+
+
+def test_fixed_limiter_ignores_throttles():
+    limiter = AdaptiveLimiter(max_limit=4, adaptive=False, cooldown=0)
+    limiter.on_throttle()
+    assert limiter.limit == 4 and limiter.stats()["throttles"] == 1
+
+
+def test_concurrency_stays_within_a_lowered_limit():
+    async def scenario():
+        limiter = AdaptiveLimiter(max_limit=8, cooldown=0)
+        limiter.on_throttle()
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with limiter.slot("bulk"):
+                peak = max(peak, limiter.stats()["in_flight"])
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(*(call() for _ in range(40)))
+        return peak
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_cancelled_waiter_does_not_stall_the_queue():
+    async def scenario():
+        limiter = AdaptiveLimiter(max_limit=1, weights={"urgent": 8.0})
+        release = asyncio.Event()
+        granted = []
+
+        async def holder():
+            async with limiter.slot("bulk"):
+                await release.wait()
+
+        async def waiter(lane, name):
+            async with limiter.slot(lane):
+                granted.append(name)
+
+        held = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        # The cancelled waiter is first in line, both across lanes and within its lane
+        cancelled = asyncio.create_task(waiter("urgent", "cancelled"))
+        await asyncio.sleep(0)
+        same_lane = asyncio.create_task(waiter("urgent", "urgent"))
+        other_lane = asyncio.create_task(waiter("bulk", "bulk"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.wait_for(asyncio.gather(held, same_lane, other_lane), timeout=2)
+        return granted, limiter.stats()
+
+    granted, stats = asyncio.run(scenario())
+    assert granted == ["urgent", "bulk"]
+    assert stats["in_flight"] == 0 and stats["lanes"]["urgent"]["waiting"] == 0
+
+
+def test_token_bucket_paces_calls_after_the_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # Two calls ride the burst, the other five wait 1/50 s each
+    assert 0.08 <= asyncio.run(scenario()) < 0.5
+
+
+def test_disabled_token_bucket_does_not_wait():
+    async def scenario():
+        bucket = TokenBucket(rate=0)
+        started = time.monotonic()
+        for _ in range(1000):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.1
+
+
+def test_throttling_errors_and_backoff():
+    class RateLimitError(Exception):
+        pass
+
+    assert is_throttling_error(RateLimitError("slow down"))
+    assert is_throttling_error(Exception("ThrottlingException: Rate exceeded"))
+    assert not is_throttling_error(ValueError("invalid JSON"))
+    assert all(0 <= backoff_delay(attempt) <= min(20.0, 0.5 * 2 ** attempt) for attempt in range(10) for _ in range(20))
@@ -0,0 +1,23 @@
+from response_parsing import extract_json, parse_model_response
+
+
+def test_element_cut_off_mid_object_is_dropped():
+    text = (
+        '{"diagnoses": [{"condition": "Type 2 diabetes", "confidence": 0.92, "evidence": "A1c 8.1"}, '
+        '{"condition": "HT'
+    )
+    data, repaired = extract_json(text)
+    assert repaired
+    assert data == {"diagnoses": [{"condition": "Type 2 diabetes", "confidence": 0.92, "evidence": "A1c 8.1"}]}
+
+
+def test_element_cut_off_after_a_complete_field_is_dropped():
+    text = '{"diagnosis_codes": [{"code": "E11.9", "confidence": 0.9}, {"code": "I10", "confidence": 0.'
+    result = parse_model_response(text, "codes")
+    assert [code["code"] for code in result["diagnosis_codes"]] == ["E11.9"]
+
+
+def test_open_nested_object_keeps_its_complete_elements():
+    text = '{"analysis": {"diagnoses": [{"condition": "COPD"}]}, "codes": {"diagnosis_codes": [{"code": "J44.9"}, {"code": "J4'
+    data, _ = extract_json(text)
+    assert data == {"analysis": {"diagnoses": [{"condition": "COPD"}]}, "codes": {"diagnosis_codes": [{"code": "J44.9"}]}}
@@ -0,0 +1,99 @@
+import pytest
+
+from result_cache import MemoryCacheBackend, ResultCache, SQLiteCacheBackend, set_result_cache
+
+CONTENT = "Patient presents with chest pain.\nAssessment: stable angina."
+
+
+def test_key_changes_with_every_prompt_input():
+    key = ResultCache.make_key("analysis", CONTENT, "v1", "model-a", {"index": 0})
+    assert key.startswith("analysis:")
+    assert key == ResultCache.make_key("analysis", CONTENT, "v1", "model-a", {"index": 0})
+    assert key != ResultCache.make_key("icd10_codes", CONTENT, "v1", "model-a", {"index": 0})
+    assert key != ResultCache.make_key("analysis", CONTENT, "v2", "model-a", {"index": 0})
+    assert key != ResultCache.make_key("analysis", CONTENT, "v1", "model-b", {"index": 0})
+    assert key != ResultCache.make_key("analysis", CONTENT, "v1", "model-a", {"index": 1})
+    assert key != ResultCache.make_key("analysis", CONTENT, "v1", "model-a")
+    assert key != ResultCache.make_key("analysis", CONTENT + " Hypertension.", "v1", "model-a", {"index": 0})
+
+
+def test_key_ignores_whitespace_and_extra_key_order():
+    spaced = "  Patient presents with chest pain.\r\n\nAssessment:   stable angina.  "
+    assert ResultCache.make_key("analysis", CONTENT, "v1", "m") == ResultCache.make_key("analysis", spaced, "v1", "m")
+    assert ResultCache.make_key("analysis", CONTENT, "v1", "m", {"a": 1, "b": 2}) == \
+        ResultCache.make_key("analysis", CONTENT, "v1", "m", {"b": 2, "a": 1})
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCacheBackend(max_entries=3)
+    return SQLiteCacheBackend(str(tmp_path / "cache.db"), max_entries=3)
+
+
+def test_backend_round_trip_and_expiry(backend):
+    backend.set("analysis:a", {"diagnoses": [{"condition": "Angina"}]}, ttl_seconds=60)
+    backend.set("analysis:b", {"diagnoses": []}, ttl_seconds=-1)
+    assert backend.get("analysis:a") == {"diagnoses": [{"condition": "Angina"}]}
+    assert backend.get("analysis:b") is None
+    assert backend.get("analysis:missing") is None
+
+
+def test_backend_returns_copies(backend):
+    backend.set("analysis:a", {"diagnoses": []}, ttl_seconds=60)
+    backend.get("analysis:a")["diagnoses"].append("mutated")
+    assert backend.get("analysis:a") == {"diagnoses": []}
+
+
+def test_backend_evicts_least_recently_used(backend):
+    for name in "abc":
+        backend.set(f"analysis:{name}", {"name": name}, ttl_seconds=60)
+    assert backend.get("analysis:a") is not None  # a is now more recent than b
+    backend.set("analysis:d", {"name": "d"}, ttl_seconds=60)
+    if isinstance(backend, SQLiteCacheBackend):
+        backend.purge()
+    assert backend.get("analysis:b") is None
+    assert [backend.get(f"analysis:{name}")["name"] for name in "acd"] == ["a", "c", "d"]
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteCacheBackend(path).set("icd10_codes:a", {"diagnosis_codes": [{"code": "I20.9"}]}, ttl_seconds=60)
+    assert SQLiteCacheBackend(path).get("icd10_codes:a") == {"diagnosis_codes": [{"code": "I20.9"}]}
+
+
+def test_stats_count_hits_misses_and_bypasses():
+    cache = ResultCache(MemoryCacheBackend())
+    key = ResultCache.make_key("analysis", CONTENT, "v1", "m")
+    assert cache.get(key) is None
+    cache.set(key, {"diagnoses": []})
+    assert cache.get(key) == {"diagnoses": []}
+    cache.record_bypass("analysis")
+    assert cache.stats()["analysis"] == {"hits": 1, "misses": 1, "bypassed": 1, "hit_rate": 0.5}
+
+
+@pytest.fixture
+def activity_cache():
+    cache = ResultCache(MemoryCacheBackend())
+    set_result_cache(cache)
+    yield cache
+    set_result_cache(None)
+
+
+def test_bypass_cache_skips_the_lookup(activity_cache):
+    from temporal_medical_coding_demo import _cache_lookup
+
+    document = {"document_id": "DOC-1", "content": CONTENT, "bypass_cache": True}
+    assert _cache_lookup("analysis", "v1", document) == (None, None, None)
+    assert activity_cache.stats()["analysis"] == {"hits": 0, "misses": 0, "bypassed": 1, "hit_rate": 0.0}
+
+
+def test_cached_result_is_found_for_the_same_document(activity_cache):
+    from temporal_medical_coding_demo import _cache_lookup
+
+    document = {"document_id": "DOC-1", "content": CONTENT}
+    cache, key, cached = _cache_lookup("analysis", "v1", document, {"index": 0})
+    assert cache is activity_cache and cached is None
+    cache.set(key, {"diagnoses": [{"condition": "Angina"}]})
+    assert _cache_lookup("analysis", "v1", {**document, "document_id": "DOC-2"}, {"index": 0})[2] == {"diagnoses": [{"condition": "Angina"}]}
+    assert _cache_lookup("analysis", "v2", document, {"index": 0})[2] is None
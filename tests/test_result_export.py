@@ -0,0 +1,139 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import result_export
+import result_store
+from result_export import ResultExport, make_cursor, parse_cursor
+from result_store import MemoryResultStore, SQLiteResultStore
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryResultStore()
+    return SQLiteResultStore(str(tmp_path / "results.db"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The result store's clock, so records can complete at chosen (and equal) times."""
+    now = [T0]
+    monkeypatch.setattr(result_store, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def complete(store, workflow_id, codes=("I10",)):
+    result = {
+        "document_id": f"DOC-{workflow_id}", "patient_id": "PAT-1",
+        "diagnosis_codes": [{"code": code, "primary": i == 0} for i, code in enumerate(codes)], "procedure_codes": []
+    }
+    store.create(workflow_id, {"status": "completed", "progress": 100, "message": "done", "result": result}, f"DOC-{workflow_id}", "PAT-1")
+
+
+def exported(export):
+    return [(row["workflow_id"], row["code"]) for row in export]
+
+
+def test_cursor_round_trips():
+    updated_at = time.time()
+    assert parse_cursor(make_cursor(updated_at, "wf-1")) == (updated_at, "wf-1")
+    # Only the first separator splits, so workflow ids may contain one
+    assert parse_cursor(make_cursor(T0 + 0.1, "web|DOC-1")) == (T0 + 0.1, "web|DOC-1")
+    for cursor in ("", "wf-1", "yesterday|wf-1"):
+        with pytest.raises(ValueError):
+            parse_cursor(cursor)
+
+
+def test_iter_completed_pages_through_equal_timestamps(store, clock):
+    expected = []
+    for step in range(8):
+        clock[0] = T0 + step
+        # Three records share each timestamp, so pages end inside a group of ties
+        for name in "cab":
+            complete(store, f"wf-{step}-{name}")
+            expected.append((T0 + step, f"wf-{step}-{name}"))
+        store.create(f"wf-{step}-queued", {"status": "processing", "progress": 0, "message": "Queued"})
+    expected.sort()
+
+    def keys(records):
+        return [(record["updated_at"], record["workflow_id"]) for record in records]
+
+    assert keys(store.iter_completed(page_size=4)) == expected
+    assert keys(store.iter_completed(after=expected[10], page_size=4)) == expected[11:]
+    assert len(list(store.iter_completed(until=T0 + 2, page_size=4))) == 6
+
+
+def test_cursor_and_since(store, clock):
+    for step, name in enumerate("abcd"):
+        clock[0] = T0 + step
+        complete(store, f"wf-{name}")
+    cursor_b = make_cursor(T0 + 1, "wf-b")
+
+    assert exported(ResultExport(store, cursor=cursor_b)) == [("wf-c", "I10"), ("wf-d", "I10")]
+    # ``since`` includes records completed at exactly that time
+    assert exported(ResultExport(store, since=T0 + 1)) == [("wf-b", "I10"), ("wf-c", "I10"), ("wf-d", "I10")]
+    # Whichever of the two is later wins
+    assert exported(ResultExport(store, cursor=cursor_b, since=T0 + 3)) == [("wf-d", "I10")]
+    assert exported(ResultExport(store, cursor=make_cursor(T0 + 2, "wf-c"), since=T0)) == [("wf-d", "I10")]
+    assert exported(ResultExport(store, since=T0, until=T0 + 2)) == [("wf-a", "I10"), ("wf-b", "I10")]
+
+
+def test_recent_results_wait_for_the_settle_window(store, monkeypatch):
+    monkeypatch.setattr(result_export, "EXPORT_SETTLE_SECONDS", 0.2)
+    complete(store, "wf-recent")
+    export = ResultExport(store)
+    assert exported(export) == [] and export.cursor is None
+
+    time.sleep(0.25)
+    export = ResultExport(store)
+    assert exported(export) == [("wf-recent", "I10")]
+    assert export.cursor == make_cursor(store.get("wf-recent")["updated_at"], "wf-recent")
+
+
+def test_resumed_exports_have_no_gaps_or_duplicates(store, clock):
+    clock[0] = T0
+    store.create("wf-late", {"status": "processing", "progress": 0, "message": "Queued"})
+    for step in range(6):
+        clock[0] = T0 + step
+        complete(store, f"wf-{step}-x", codes=("E11.9", "I10"))
+        complete(store, f"wf-{step}-y", codes=())
+    first = ResultExport(store, until=T0 + 4)
+    rows = exported(first)
+    assert first.records == 8 and first.rows == 8
+    # The cursor follows the last record read, even one without codes
+    assert first.cursor == make_cursor(T0 + 3, "wf-3-y")
+
+    # More results complete, including one started before the first export
+    for step in range(6, 9):
+        clock[0] = T0 + step
+        complete(store, f"wf-{step}-x", codes=("E11.9", "I10"))
+    store.update("wf-late", status="completed", progress=100, result={"diagnosis_codes": [{"code": "J45.909"}]})
+
+    second = ResultExport(store, cursor=first.cursor, until=T0 + 100)
+    rows += exported(second)
+    third = ResultExport(store, cursor=second.cursor, until=T0 + 100)
+    assert exported(third) == [] and third.cursor == second.cursor
+
+    expected = [(f"wf-{step}-x", code) for step in range(9) for code in ("E11.9", "I10")] + [("wf-late", "J45.909")]
+    assert rows == expected
+
+
+def test_export_endpoint_resumes_from_the_last_row_cursor(store, clock, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "result_store", store)
+    for step in range(4):
+        clock[0] = T0 + step
+        complete(store, f"wf-{step}")
+    client = app.app.test_client()
+
+    first = [json.loads(line) for line in client.get(f"/api/export?until={T0 + 2}").data.splitlines()]
+    assert [row["workflow_id"] for row in first] == ["wf-0", "wf-1"]
+    second = [json.loads(line) for line in client.get(f"/api/export?cursor={first[-1]['cursor']}&until={T0 + 9}").data.splitlines()]
+    assert [row["workflow_id"] for row in second] == ["wf-2", "wf-3"]
+    assert client.get("/api/export?cursor=not-a-cursor").status_code == 400
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from result_store import MemoryResultStore, SQLiteResultStore
+
+
+PROCESSING = {"status": "processing", "progress": 0, "message": "Queued", "result": None}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**options):
+        if request.param == "memory":
+            return MemoryResultStore(**options)
+        return SQLiteResultStore(str(tmp_path / "results.db"), **options)
+    return make
+
+
+def test_record_round_trip(make_store):
+    store = make_store()
+    store.create("wf-1", PROCESSING, document_id="DOC-1", patient_id="PAT-1")
+    store.update("wf-1", status="completed", progress=100, result={"diagnosis_codes": [{"code": "I10"}]})
+
+    record = store.get("wf-1")
+    assert record["status"] == "completed" and record["progress"] == 100
+    assert record["result"] == {"diagnosis_codes": [{"code": "I10"}]}
+    assert record["document_id"] == "DOC-1" and record["patient_id"] == "PAT-1"
+    assert "wf-1" in store and "wf-2" not in store
+
+    store.delete("wf-1")
+    assert store.get("wf-1") is None
+
+
+def test_least_recently_updated_records_are_evicted(make_store):
+    store = make_store(max_entries=3)
+    for i in range(5):
+        store.create(f"wf-{i}", PROCESSING, document_id=f"DOC-{i}")
+        time.sleep(0.001)
+    store.update("wf-2", progress=50)
+    store.create("wf-5", PROCESSING, document_id="DOC-5")
+    if isinstance(store, SQLiteResultStore):
+        store.purge()
+
+    assert [workflow_id for workflow_id in ("wf-0", "wf-1", "wf-2", "wf-3", "wf-4", "wf-5") if workflow_id in store] == ["wf-2", "wf-4", "wf-5"]
+
+
+def test_records_expire_after_the_ttl(make_store):
+    store = make_store(ttl_seconds=0.05)
+    store.create("wf-1", PROCESSING, document_id="DOC-1")
+    assert store.get("wf-1") is not None
+    time.sleep(0.1)
+    assert store.get("wf-1") is None
+    assert store.find(document_id="DOC-1") == []
+
+
+def test_memory_store_stays_bounded():
+    store = MemoryResultStore(max_entries=100)
+    for i in range(1000):
+        store.create(f"wf-{i}", PROCESSING, document_id=f"DOC-{i}")
+    assert len(store._records) == 100
+
+
+def test_find_by_document_and_patient(make_store):
+    store = make_store()
+    store.create("wf-1", PROCESSING, document_id="DOC-1", patient_id="PAT-1")
+    time.sleep(0.001)
+    store.create("wf-2", PROCESSING, document_id="DOC-2", patient_id="PAT-1")
+    time.sleep(0.001)
+    store.create("wf-3", PROCESSING, document_id="DOC-1", patient_id="PAT-2")
+
+    assert [record["workflow_id"] for record in store.find(document_id="DOC-1")] == ["wf-3", "wf-1"]
+    assert [record["workflow_id"] for record in store.find(patient_id="PAT-1")] == ["wf-2", "wf-1"]
+    assert [record["workflow_id"] for record in store.find(document_id="DOC-1", patient_id="PAT-1")] == ["wf-1"]
+    assert len(store.find(patient_id="PAT-1", limit=1)) == 1
+
+
+def test_batch_records(make_store):
+    store = make_store()
+    store.create_batch("BATCH-1", {"status": "submitting", "total_documents": 3, "workflow_ids": ["part-0", "part-1"]})
+    store.update_batch("BATCH-1", status="processing")
+
+    batch = store.get_batch("BATCH-1")
+    assert batch["status"] == "processing" and batch["message"] is None
+    assert batch["total_documents"] == 3 and batch["workflow_ids"] == ["part-0", "part-1"]
+    assert batch["created_at"] <= batch["updated_at"]
+    assert store.get_batch("BATCH-2") is None
+
+    store.delete_batch("BATCH-1")
+    assert store.get_batch("BATCH-1") is None
+
+
+def test_batch_records_expire_and_are_evicted(make_store):
+    store = make_store(max_entries=2, ttl_seconds=0.2)
+    for i in range(3):
+        store.create_batch(f"BATCH-{i}", {"status": "processing", "total_documents": 1, "workflow_ids": [f"part-{i}"]})
+        time.sleep(0.001)
+    if isinstance(store, SQLiteResultStore):
+        store.purge()
+    assert [store.get_batch(f"BATCH-{i}") is not None for i in range(3)] == [False, True, True]
+    time.sleep(0.25)
+    assert store.get_batch("BATCH-2") is None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "results.db")
+    writer, reader = SQLiteResultStore(path), SQLiteResultStore(path)
+
+    writer.create("wf-1", PROCESSING, document_id="DOC-1", patient_id="PAT-1")
+    writer.create_batch("BATCH-1", {"status": "submitting", "total_documents": 1, "workflow_ids": ["part-0"]})
+    assert reader.get("wf-1")["status"] == "processing"
+    assert reader.get_batch("BATCH-1")["workflow_ids"] == ["part-0"]
+
+    # A status answered by another process sees the watcher's completed result
+    writer.update("wf-1", status="completed", progress=100, result={"diagnosis_codes": [{"code": "E11.9"}]})
+    assert reader.get("wf-1")["result"] == {"diagnosis_codes": [{"code": "E11.9"}]}
+    assert [record["workflow_id"] for record in reader.find(patient_id="PAT-1")] == ["wf-1"]
+
+
+def test_sqlite_store_rejects_unknown_fields(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / "results.db"))
+    with pytest.raises(ValueError):
+        store.update("wf-1", colour="red")
+    with pytest.raises(ValueError):
+        store.update_batch("BATCH-1", colour="red")
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+import temporal_dispatcher
+from temporal_dispatcher import TemporalDispatcher
+
+
+def unreachable_dispatcher() -> TemporalDispatcher:
+    dispatcher = TemporalDispatcher(target="unreachable:7233", concurrency=2)
+
+    async def get_client():
+        raise ConnectionError("Temporal is unreachable")
+
+    dispatcher.get_client = get_client
+    return dispatcher
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def failing_dispatcher(monkeypatch):
+    dispatcher = unreachable_dispatcher()
+    monkeypatch.setattr(temporal_dispatcher, "_dispatcher", dispatcher)
+    yield dispatcher
+    dispatcher.stop()
+
+
+def test_connection_failure_is_passed_to_on_error():
+    dispatcher = unreachable_dispatcher()
+    ran = threading.Event()
+    errors = []
+
+    async def job(client):
+        ran.set()
+
+    try:
+        dispatcher.submit(job, on_error=errors.append)
+        wait_for(lambda: dispatcher.stats()["failed"] == 1)
+    finally:
+        dispatcher.stop()
+
+    assert not ran.is_set()
+    assert len(errors) == 1 and isinstance(errors[0], ConnectionError)
+    assert dispatcher.stats()["in_flight"] == 0
+
+
+def test_unstartable_workflow_is_marked_as_error(failing_dispatcher):
+    import app
+
+    response = app.app.test_client().post("/api/process-document", json={"content": "Follow-up for hypertension."})
+    workflow_id = response.get_json()["workflow_id"]
+
+    wait_for(lambda: app.result_store.get(workflow_id)["status"] == "error")
+    assert "Temporal is unreachable" in app.result_store.get(workflow_id)["message"]
+
+
+def test_unstartable_batch_is_marked_as_error(failing_dispatcher):
+    import app
+
+    response = app.app.test_client().post("/api/process-batch", json=[{"content": "Follow-up for hypertension."}])
+    batch_id = response.get_json()["batch_id"]
+
+    wait_for(lambda: app.result_store.get_batch(batch_id)["status"] == "error")
+    assert "Temporal is unreachable" in app.result_store.get_batch(batch_id)["message"]
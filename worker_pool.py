@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Temporal Worker Pool
+Runs the medical coding worker as several processes on one host, optionally
+split into separate workflow and activity pools, with restart on crash,
+graceful shutdown and an HTTP health endpoint
+
+Usage:
+    python worker_pool.py --processes 4
+    ACTIVITY_TASK_QUEUE=medical-coding-activities python worker_pool.py --workflow-processes 1 --activity-processes 6 --health-port 8081
+    python worker_pool.py --processes 2 --lanes urgent
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from workflow_contract import ACTIVITY_TASK_QUEUE, PRIORITY_LANES, TASK_QUEUE
+
+logger = logging.getLogger(__name__)
+
+# Seconds between status reports from each worker process; a process that misses
+# three reports in a row is reported unhealthy
+HEALTH_REPORT_INTERVAL = 5.0
+
+# Delay before restarting a crashed worker process, doubling per consecutive crash
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+
+# ============================================================================
+# WORKER PROCESS
+# ============================================================================
+
+def _run_process(index: int, role: str, options: Dict[str, Any], status_queue):
+    """Entry point of one worker process."""
+    # The pool forwards Ctrl-C as SIGTERM; ignore the terminal's SIGINT so
+    # every process shuts down the same graceful way
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [{role}-{index}] %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_serve(index, role, options, status_queue))
+
+async def _serve(index: int, role: str, options: Dict[str, Any], status_queue):
+    from temporalio.client import Client
+    from code_retrieval import warm_up_code_retrievers
+    from model_client import get_model_client
+    from model_metrics import get_model_metrics
+    from temporal_medical_coding_demo import create_workers
+
+    client = await Client.connect(options["temporal_address"])
+    workers = create_workers(
+        client,
+        role,
+        lanes=options.get("lanes"),
+        max_concurrent_activities=options["max_concurrent_activities"],
+        max_concurrent_workflow_tasks=options["max_concurrent_workflow_tasks"],
+        graceful_shutdown_timeout=timedelta(seconds=options["shutdown_grace_seconds"])
+    )
+
+    if role != "workflow":
+        get_model_client().warm_up()
+        warm_up_code_retrievers()
+
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+
+    def report(state: str):
+        status = {"index": index, "pid": os.getpid(), "role": role, "state": state, "reported_at": time.time()}
+        if role != "workflow":
+            status["model_client"] = get_model_client().limiter.stats()
+            metrics = get_model_metrics().stats()
+            status["model_calls"] = metrics["total"]["calls"]
+            status["queue_latency"] = metrics["queues"]
+        status_queue.put(status)
+
+    runs = [asyncio.create_task(worker.run()) for worker in workers]
+    logger.info(f"✅ Worker process {index} polling as {role} (pid {os.getpid()})")
+    while not stopping.is_set():
+        report("running")
+        done, _ = await asyncio.wait(runs, timeout=HEALTH_REPORT_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+        for run in done:
+            # A worker stopped on its own: surface the error so the pool restarts this process
+            run.result()
+            raise RuntimeError("Temporal worker exited unexpectedly")
+
+    logger.info(f"🛑 Worker process {index} draining in-flight tasks")
+    report("stopping")
+    await asyncio.gather(*(worker.shutdown() for worker in workers))
+    await asyncio.gather(*runs, return_exceptions=True)
+    report("stopped")
+
+# ============================================================================
+# SUPERVISOR
+# ============================================================================
+
+class WorkerPool:
+    """Starts, watches and stops the worker processes of one host.
+
+    ``roles`` holds one entry per process ("all", "workflow" or "activity").
+    Processes are spawned rather than forked, so none inherits the parent's
+    gRPC or event loop state. A process that exits while the pool is running
+    is restarted after a growing delay.
+    """
+
+    def __init__(self, roles: List[str], options: Dict[str, Any]):
+        self.roles = roles
+        self.options = options
+        self._context = multiprocessing.get_context("spawn")
+        self._status_queue = self._context.Queue()
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * len(roles)
+        self._state: List[Dict[str, Any]] = [
+            {"index": index, "role": role, "restarts": 0, "state": "starting", "pid": None, "last_exit_code": None}
+            for index, role in enumerate(roles)
+        ]
+        self._restart_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+        self.started_at = time.time()
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=_run_process,
+            args=(index, self.roles[index], self.options, self._status_queue),
+            name=f"medical-coding-{self.roles[index]}-{index}",
+            daemon=False
+        )
+        process.start()
+        self._processes[index] = process
+        with self._lock:
+            self._state[index].update({"pid": process.pid, "state": "starting", "started_at": time.time()})
+
+    def start(self):
+        for index in range(len(self.roles)):
+            self._spawn(index)
+        logger.info(f"🚀 Worker pool started: {len(self.roles)} processes ({', '.join(self.roles)})")
+
+    def run(self):
+        """Supervise until SIGTERM/SIGINT, then shut every process down gracefully."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.request_stop())
+        self.start()
+        while not self._stopping:
+            self._drain_status(timeout=1.0)
+            self._restart_exited()
+        self.stop()
+
+    def request_stop(self):
+        self._stopping = True
+
+    def _drain_status(self, timeout: float):
+        try:
+            status = self._status_queue.get(timeout=timeout)
+            while True:
+                with self._lock:
+                    self._state[status["index"]].update(status)
+                status = self._status_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _restart_exited(self):
+        now = time.time()
+        for index, process in enumerate(self._processes):
+            if process is None or process.is_alive():
+                continue
+            with self._lock:
+                state = self._state[index]
+                if index not in self._restart_at:
+                    # Back off only while the process keeps crashing soon after starting
+                    crashed_fast = now - state.get("started_at", 0) < MAX_RESTART_DELAY
+                    delay = min(MAX_RESTART_DELAY, state.get("restart_delay", RESTART_DELAY / 2) * 2) if crashed_fast else RESTART_DELAY
+                    state.update({"state": "exited", "last_exit_code": process.exitcode, "restart_delay": delay})
+                    self._restart_at[index] = now + delay
+                    logger.error(f"💥 Worker process {index} ({self.roles[index]}) exited with code {process.exitcode}; restarting in {delay:.0f}s")
+                if now < self._restart_at[index]:
+                    continue
+                del self._restart_at[index]
+                state["restarts"] += 1
+            self._spawn(index)
+
+    def stop(self):
+        """SIGTERM every process, wait for in-flight tasks to drain, then kill stragglers."""
+        self._stopping = True
+        logger.info("🛑 Stopping worker pool...")
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        deadline = time.time() + self.options["shutdown_grace_seconds"] + 10
+        for process in self._processes:
+            if process is not None:
+                process.join(max(0.0, deadline - time.time()))
+                if process.is_alive():
+                    logger.warning(f"⚠️ Worker process {process.pid} did not stop in time, killing it")
+                    process.kill()
+                    process.join()
+        self._drain_status(timeout=0.1)
+        logger.info("✅ Worker pool stopped")
+
+    def health(self) -> Dict[str, Any]:
+        """Per-process state; healthy when every process is alive and reported recently."""
+        now = time.time()
+        with self._lock:
+            processes = [dict(state) for state in self._state]
+        for state, process in zip(processes, self._processes):
+            state["alive"] = process is not None and process.is_alive()
+            reported_at = state.get("reported_at")
+            state["seconds_since_report"] = round(now - reported_at, 1) if reported_at else None
+            state["healthy"] = (
+                state["alive"]
+                and state["state"] == "running"
+                and now - reported_at < 3 * HEALTH_REPORT_INTERVAL
+            )
+        healthy = all(state["healthy"] for state in processes)
+        return {
+            "status": "stopping" if self._stopping else "ok" if healthy else "degraded",
+            "healthy": healthy and not self._stopping,
+            "uptime_seconds": round(now - self.started_at, 1),
+            "processes": processes
+        }
+
+    def serve_health(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Answer GET /health with the pool's health as JSON (HTTP 503 when unhealthy)."""
+        pool = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/health", "/"):
+                    self.send_error(404)
+                    return
+                health = pool.health()
+                body = json.dumps(health).encode()
+                self.send_response(200 if health["healthy"] else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="worker-pool-health", daemon=True).start()
+        logger.info(f"🩺 Worker pool health on http://{host}:{port}/health")
+        return server
+
+
+def pool_roles(processes: int, workflow_processes: int, activity_processes: int) -> List[str]:
+    """One role per process: a split pool when either split count is set, otherwise "all" everywhere.
+
+    A split pool needs ACTIVITY_TASK_QUEUE set apart from TASK_QUEUE, or its
+    workflow processes would poll activity tasks they cannot run.
+    """
+    if workflow_processes or activity_processes:
+        if ACTIVITY_TASK_QUEUE == TASK_QUEUE:
+            raise ValueError("--workflow-processes/--activity-processes need ACTIVITY_TASK_QUEUE set to its own queue")
+        return ["workflow"] * workflow_processes + ["activity"] * activity_processes
+    return ["all"] * processes
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=int(os.getenv("WORKER_PROCESSES", "0")) or os.cpu_count() or 1,
+                        help="worker processes polling workflows and activities (default: WORKER_PROCESSES or CPU count)")
+    parser.add_argument("--workflow-processes", type=int, default=int(os.getenv("WORKER_WORKFLOW_PROCESSES", "0")),
+                        help="processes polling only workflow tasks (with --activity-processes, replaces --processes)")
+    parser.add_argument("--activity-processes", type=int, default=int(os.getenv("WORKER_ACTIVITY_PROCESSES", "0")),
+                        help="processes polling only activity tasks")
+    parser.add_argument("--max-concurrent-activities", type=int, default=int(os.getenv("WORKER_MAX_CONCURRENT_ACTIVITIES", "100")),
+                        help="activity slots per process")
+    parser.add_argument("--max-concurrent-workflow-tasks", type=int, default=_optional_int(os.getenv("WORKER_MAX_CONCURRENT_WORKFLOW_TASKS")),
+                        help="workflow task slots per process (default: the SDK's)")
+    parser.add_argument("--lanes", default=os.getenv("WORKER_LANES"),
+                        help="comma-separated priority lanes every process polls (default: all lanes)")
+    parser.add_argument("--temporal-address", default=os.getenv("TEMPORAL_ADDRESS", "localhost:7233"))
+    parser.add_argument("--shutdown-grace", type=float, default=float(os.getenv("WORKER_SHUTDOWN_GRACE_SECONDS", "30")),
+                        help="seconds in-flight activities get to finish on shutdown")
+    parser.add_argument("--health-port", type=int, default=int(os.getenv("WORKER_HEALTH_PORT", "0")),
+                        help="serve GET /health on this port (0 disables)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [pool] %(levelname)s %(name)s: %(message)s")
+    try:
+        roles = pool_roles(args.processes, args.workflow_processes, args.activity_processes)
+    except ValueError as e:
+        parser.error(str(e))
+    if not roles:
+        parser.error("no worker processes to start")
+    lanes = [lane.strip() for lane in args.lanes.split(",") if lane.strip()] if args.lanes else None
+    if lanes and not set(lanes) <= set(PRIORITY_LANES):
+        parser.error(f"--lanes must name lanes from {', '.join(PRIORITY_LANES)}")
+
+    pool = WorkerPool(roles, {
+        "temporal_address": args.temporal_address,
+        "lanes": lanes,
+        "max_concurrent_activities": args.max_concurrent_activities,
+        "max_concurrent_workflow_tasks": args.max_concurrent_workflow_tasks,
+        "shutdown_grace_seconds": args.shutdown_grace
+    })
+    if args.health_port:
+        pool.serve_health(args.health_port)
+    pool.run()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Medical Coding Workflow Contract
+Task queues, priority lanes, workflow and query names, and request options shared by the
+worker and the web tier. Importing this does not pull in the workflow code,
+the model client or any other worker-only dependency.
+"""
+
+import os
+from typing import Any, Dict
+
+TASK_QUEUE = "medical-coding-task-queue"
+
+# Queue the workflows schedule their (non-local) activities on. Set the same value on
+# workflow and activity workers to run them as separate pools; defaults to TASK_QUEUE
+ACTIVITY_TASK_QUEUE = os.getenv("ACTIVITY_TASK_QUEUE", TASK_QUEUE)
+
+# Child workflows one batch workflow runs at once unless the request sets ?max_parallel=.
+# The web tier pins the value in every batch input, so workflow code never reads it
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "50"))
+
+# Workflow type and query names, for starting and querying workflows by name
+MEDICAL_CODING_WORKFLOW = "MedicalCodingWorkflow"
+BATCH_MEDICAL_CODING_WORKFLOW = "BatchMedicalCodingWorkflow"
+PROGRESS_QUERY = "get_progress"
+
+# Workflow modes: "standard" runs analysis, coding, validation and report as separate
+# model calls; "fast" extracts findings and codes in one call and validates only
+# when the overall confidence is below the threshold
+WORKFLOW_MODES = ("standard", "fast")
+
+# Validation modes: "ai" runs the local rule checks alongside AI validation;
+# "rules" relies on the local rule checks alone
+VALIDATION_MODES = ("ai", "rules")
+
+# Priority lanes, most urgent first. Each lane has its own workflow and activity
+# task queues and its own worker slots, so urgent documents never queue behind a
+# bulk backlog; model calls are shared between lanes by LANE_WEIGHTS
+PRIORITY_LANES = ("urgent", "interactive", "bulk")
+DEFAULT_PRIORITY = "interactive"
+BATCH_PRIORITY = "bulk"
+
+# Document types coded in the urgent lane unless the request names a priority
+URGENT_DOCUMENT_TYPES = frozenset(
+    name.strip() for name in os.getenv("URGENT_DOCUMENT_TYPES", "emergency_note,emergency_consultation").split(",") if name.strip()
+)
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    weights = {}
+    for item in value.split(","):
+        lane, _, weight = item.partition("=")
+        if lane.strip() and weight.strip():
+            weights[lane.strip()] = float(weight)
+    return weights
+
+# Relative share of the model client's concurrency each lane gets while lanes
+# compete for it; a lane with nothing waiting leaves its share to the others
+LANE_WEIGHTS = {**{"urgent": 8.0, "interactive": 4.0, "bulk": 1.0}, **_parse_weights(os.getenv("PRIORITY_LANE_WEIGHTS", ""))}
+
+def document_priority(document: Dict[str, Any], default: str = DEFAULT_PRIORITY) -> str:
+    """Lane for a document: its explicit "priority", urgent for urgent document types, else ``default``."""
+    priority = document.get("priority")
+    if priority in PRIORITY_LANES:
+        return priority
+    if document.get("document_type") in URGENT_DOCUMENT_TYPES:
+        return "urgent"
+    return default
+
+def lane_task_queue(priority: str, task_queue: str = TASK_QUEUE) -> str:
+    """Task queue of a lane; the default lane keeps the unsuffixed queue, as before lanes existed."""
+    return task_queue if priority == DEFAULT_PRIORITY else f"{task_queue}-{priority}"
+
+def priority_for_task_queue(task_queue: str) -> str:
+    """Lane a workflow or activity task queue belongs to (the default lane for unknown queues)."""
+    for priority in PRIORITY_LANES:
+        if task_queue in (lane_task_queue(priority), lane_task_queue(priority, ACTIVITY_TASK_QUEUE)):
+            return priority
+    return DEFAULT_PRIORITY